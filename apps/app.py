@@ -1,8 +1,4 @@
-import srsly
-from pathlib import Path
-import json
-
-from nbllm import Chat
+from nbllm import Chat, TranscriptWriter
 from nbllm.tools import FileTool, TodoTools
 from nbllm.prompts import marimo_prompt
 from nbllm import ui
@@ -50,5 +46,5 @@ Chat(
         "/role": set_role,
         "/debug_prompt": debug_reason,
     },
-    history_callback=lambda x: srsly.write_jsonl(Path("logs.json"), x, append=True, append_new_line=False)
+    history_callback=TranscriptWriter("logs.jsonl")
 ).run()
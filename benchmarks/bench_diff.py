@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Benchmark the diff shown before a file edit.
+
+Compares `show_diff`, which diffs only the lines around each replaced
+occurrence and prints the diff in one write, with the way
+`replace_in_file` used to do it: `difflib.unified_diff` over the whole
+file and one `ui.print` with Rich markup per diff line. Output goes to a
+truecolor console that writes to /dev/null.
+
+Usage:
+    python benchmarks/bench_diff.py
+    python benchmarks/bench_diff.py --lines 200000 --repeat 3
+"""
+
+import argparse
+import contextlib
+import difflib
+import os
+import re
+import time
+from unittest.mock import patch
+
+from rich.console import Console
+
+from nbllm import ui
+from nbllm.tools.editing import replace_all, show_diff
+
+
+def legacy_show_diff(original, new, name):
+    """The diff of `replace_in_file` before the diff was bounded, for comparison."""
+    diff_lines = list(difflib.unified_diff(
+        original.splitlines(keepends=True),
+        new.splitlines(keepends=True),
+        fromfile=f"{name} (before)",
+        tofile=f"{name} (after)",
+        n=3
+    ))
+    line_num_old = 0
+    line_num_new = 0
+    for line in diff_lines:
+        if line.startswith('---') or line.startswith('+++'):
+            ui.print(f"[dim]{line.rstrip()}[/dim]")
+        elif line.startswith('@@'):
+            match = re.search(r'-(\d+)(?:,\d+)? \+(\d+)(?:,\d+)?', line)
+            if match:
+                line_num_old = int(match.group(1))
+                line_num_new = int(match.group(2))
+            ui.print(f"[cyan]{line.rstrip()}[/cyan]")
+        elif line.startswith('-'):
+            ui.print(f"[on red][white]{line_num_old:4d} {line.rstrip()}[/white][/on red]")
+            line_num_old += 1
+        elif line.startswith('+'):
+            ui.print(f"[on green][white]{line_num_new:4d} {line.rstrip()}[/white][/on green]")
+            line_num_new += 1
+        elif line.startswith(' '):
+            ui.print(f"[dim]{line_num_old:4d}[/dim] {line.rstrip()}")
+            line_num_old += 1
+            line_num_new += 1
+    return bool(diff_lines)
+
+
+def make_file(lines):
+    """A Python-like file of `lines` lines, with `counter` on every 50th line."""
+    return "".join(
+        f"    counter += {i}  # step {i}\n" if i % 50 == 0 else f"    value_{i} = compute({i}, {i * 7})\n"
+        for i in range(lines)
+    )
+
+
+def time_case(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--lines", type=int, default=50_000, help="Lines of the edited file")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    original = make_file(args.lines)
+    middle = args.lines // 2 + 1
+    cases = [
+        ("one line", f"value_{middle} = ", f"renamed_{middle} = "),
+        (f"{args.lines // 50:,} lines", "counter +=", "total +="),
+    ]
+
+    devnull = open(os.devnull, "w")
+    console = Console(file=devnull, force_terminal=True, color_system="truecolor", width=120)
+    print(f"{'change':<14} {'legacy':>10} {'bounded':>10} {'speedup':>9}")
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(patch.object(ui, "_console", console))
+        # Collapsed diffs are not expanded
+        stack.enter_context(patch.object(ui, "confirm", return_value=False))
+        for label, old, new in cases:
+            content, spans = replace_all(original, old, new)
+            legacy = time_case(lambda: legacy_show_diff(original, content, "bench.py"), args.repeat)
+            bounded = time_case(lambda: show_diff(original, content, spans, "bench.py"), args.repeat)
+            print(f"{label:<14} {legacy * 1000:>8.1f}ms {bounded * 1000:>8.1f}ms {legacy / bounded:>8.1f}x")
+    devnull.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Benchmark mode switch latency against conversation length.
+
+Mode switches transfer the existing responses into the new mode's
+conversation, so the latency should stay flat as the history grows and no
+model calls should be made.
+
+Usage:
+    python benchmarks/bench_mode_switch.py
+"""
+
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_model import FakeModel
+from nbllm import Chat
+
+
+HISTORY_SIZES = [0, 10, 100, 1000]
+SWITCHES = 50
+
+
+def build_chat(model, turns):
+    """Create a Chat with `turns` completed exchanges in its history."""
+    with patch("llm.get_model", return_value=model):
+        chat = Chat(
+            tools={"development": [], "review": [], "planning": []},
+            mode_switch_messages={"review": "You are now in review mode."},
+            initial_mode="development",
+            show_banner=False,
+        )
+    for i in range(turns):
+        chat.conversation.prompt(f"message {i}").text()
+    return chat
+
+
+def main():
+    print(f"{'turns':>6} {'per switch':>12} {'model calls':>12}")
+    for turns in HISTORY_SIZES:
+        model = FakeModel(reply="A short reply from the fake model.")
+        chat = build_chat(model, turns)
+        calls_before = model.calls
+
+        start = time.perf_counter()
+        for _ in range(SWITCHES):
+            chat.switch_to_next_mode()
+        elapsed = (time.perf_counter() - start) / SWITCHES
+
+        assert len(chat.conversation.responses) == turns
+        print(f"{turns:>6} {elapsed * 1e6:>10.1f}us {model.calls - calls_before:>12}")
+
+
+if __name__ == "__main__":
+    main()
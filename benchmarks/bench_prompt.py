@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Benchmark the time from the end of a reply to the next usable prompt.
+
+Runs `Chat.run` with the fake model for a number of turns. Each turn
+measures the time from the last streamed chunk to the first render of the
+next prompt; the next line is typed only once the prompt is on screen.
+Prompts render to a 120x40 xterm writing to /dev/null.
+
+`--rebuild` builds a new prompt session for every turn, the way `ui.input`
+used to, for comparison.
+
+Usage:
+    python benchmarks/bench_prompt.py
+    python benchmarks/bench_prompt.py --turns 200 --rebuild
+"""
+
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from prompt_toolkit import PromptSession
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.data_structures import Size
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output.vt100 import Vt100_Output
+
+from fake_model import FakeModel
+from nbllm import Chat, ui
+
+
+def run_turns(turns, rebuild):
+    """Run a chat for `turns` prompts and return the latency of each prompt in seconds."""
+    model = FakeModel(reply="A short reply from the fake model.\n" * 5, chunk_size=8)
+    with patch("llm.get_model", return_value=model):
+        chat = Chat(tools={"plan": [], "build": []}, initial_mode="plan", show_banner=False)
+    chat._shown_completion_hint = True
+
+    latencies = []
+    lines = iter([f"message {i}" for i in range(turns)])
+    original_prompt = PromptSession.prompt
+    original_get_session = ui.InputSession._get_session
+
+    def prompt(session, *args, **kwargs):
+        def on_first_render(app):
+            app.after_render -= on_first_render
+            if model.finished_at is not None:
+                latencies.append(time.perf_counter() - model.finished_at)
+            # Type the next line only now that the prompt is usable
+            pipe.send_text(next(lines, "/quit") + "\r")
+
+        kwargs["pre_run"] = lambda: session.app.after_render.add_handler(on_first_render)
+        return original_prompt(session, *args, **kwargs)
+
+    def rebuilt_session(input_session):
+        input_session._session = None
+        return original_get_session(input_session)
+
+    devnull = open(os.devnull, "w")
+    output = Vt100_Output(devnull, get_size=lambda: Size(rows=40, columns=120), term="xterm-256color")
+    with contextlib.ExitStack() as stack:
+        pipe = stack.enter_context(create_pipe_input())
+        stack.enter_context(create_app_session(input=pipe, output=output))
+        stack.enter_context(contextlib.redirect_stdout(devnull))
+        original_file, ui._console.file = ui._console.file, devnull
+        stack.callback(setattr, ui._console, "file", original_file)
+        stack.enter_context(patch.object(PromptSession, "prompt", prompt))
+        if rebuild:
+            stack.enter_context(patch.object(ui.InputSession, "_get_session", rebuilt_session))
+        chat.run()
+    devnull.close()
+    assert model.calls == turns
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=100, help="Prompts per run")
+    parser.add_argument("--rebuild", action="store_true", help="Build a new prompt session every turn")
+    args = parser.parse_args(argv)
+
+    latencies = sorted(run_turns(args.turns, args.rebuild))
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{'session':<10} {'turns':>6} {'median':>10} {'p95':>10} {'max':>10}")
+    print(f"{'rebuilt' if args.rebuild else 'reused':<10} {len(latencies):>6} "
+          f"{statistics.median(latencies) * 1000:>8.2f}ms {p95 * 1000:>8.2f}ms {latencies[-1] * 1000:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Benchmark the streaming renderer and the Chat.run loop with a fake model.
+
+Two scenarios are measured for every combination of chunk size, reply
+length and model speed:
+
+- render: `ui.start_streaming` / `stream_chunk` / `end_streaming` fed directly
+- chat: one full turn of `Chat.run`, from the prompt to the finished reply
+
+Each result reports render throughput (characters per second of wall and CPU
+time), time to the first visible character and peak Python memory. Output
+goes to a terminal-like console writing to /dev/null, so ANSI styling is
+included but nothing is shown.
+
+Usage:
+    python benchmarks/bench_streaming.py
+    python benchmarks/bench_streaming.py --lengths 1000,100000 --chunk-sizes 1,16 --tps 0,200
+    python benchmarks/bench_streaming.py --output new.json --compare old.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from rich.console import Console
+
+from fake_model import FakeModel, make_reply
+from nbllm import Chat, ui
+
+
+class TimedSink:
+    """Discard written text, remembering when the first visible character arrived."""
+
+    def __init__(self):
+        self.devnull = open(os.devnull, "w")
+        self.armed_at = None
+        self.first_visible = None
+
+    def arm(self):
+        """Start waiting for the first visible character."""
+        self.armed_at = time.perf_counter()
+        self.first_visible = None
+
+    def write(self, text):
+        if self.armed_at is not None and self.first_visible is None and text.strip():
+            self.first_visible = time.perf_counter()
+        return self.devnull.write(text)
+
+    def flush(self):
+        self.devnull.flush()
+
+    def isatty(self):
+        return False
+
+    @property
+    def time_to_first(self):
+        if self.first_visible is None:
+            return None
+        return self.first_visible - self.armed_at
+
+
+@contextlib.contextmanager
+def terminal_console(sink, width=100):
+    """Point `ui` at a truecolor console writing to `sink`."""
+    original = ui._console.file, ui._console.width, ui._console._force_terminal, ui._console._color_system
+    terminal = Console(file=sink, width=width, force_terminal=True, color_system="truecolor")
+    ui._console.file = sink
+    ui._console.width = width
+    ui._console._force_terminal = True
+    ui._console._color_system = terminal._color_system
+    try:
+        yield
+    finally:
+        ui._console.file, ui._console.width, ui._console._force_terminal, ui._console._color_system = original
+
+
+@contextlib.contextmanager
+def measure(trace_memory=False):
+    """Measure wall time and CPU time of a block, or its peak traced memory.
+
+    Tracing slows Python down considerably, so timings of traced runs are not
+    comparable to untraced ones.
+    """
+    stats = {"peak_kib": None}
+    if trace_memory:
+        tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield stats
+    finally:
+        stats["wall_s"] = time.perf_counter() - wall
+        stats["cpu_s"] = time.process_time() - cpu
+        if trace_memory:
+            stats["peak_kib"] = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+
+
+def bench_render(reply, chunk_size, tokens_per_second, markdown, trace_memory=False):
+    """Feed the reply straight into the streaming functions."""
+    model = FakeModel(reply=reply, chunk_size=chunk_size, tokens_per_second=tokens_per_second)
+    sink = TimedSink()
+    with terminal_console(sink), measure(trace_memory) as stats:
+        sink.arm()
+        ui.start_streaming(ui.LEFT_PADDING, markdown=markdown)
+        for chunk in model.execute(None, True, None, None):
+            ui.stream_chunk(chunk, ui.LEFT_PADDING)
+        ui.end_streaming(ui.LEFT_PADDING)
+    stats["first_char_ms"] = sink.time_to_first * 1000 if sink.time_to_first is not None else None
+    return stats
+
+
+def bench_chat(reply, chunk_size, tokens_per_second, markdown, trace_memory=False):
+    """Run one turn of Chat.run, from the submitted prompt to the finished reply."""
+    model = FakeModel(reply=reply, chunk_size=chunk_size, tokens_per_second=tokens_per_second)
+    with patch("llm.get_model", return_value=model):
+        chat = Chat(show_banner=False, markdown=markdown)
+    chat._shown_completion_hint = True
+
+    sink = TimedSink()
+    inputs = iter(["Tell me something"])
+
+    def fake_input(*args, **kwargs):
+        try:
+            text = next(inputs)
+        except StopIteration:
+            raise KeyboardInterrupt
+        sink.arm()
+        return text
+
+    with terminal_console(sink), contextlib.redirect_stdout(sink), patch.object(ui, "input", fake_input):
+        with measure(trace_memory) as stats:
+            chat.run()
+    assert model.calls == 1
+    stats["first_char_ms"] = sink.time_to_first * 1000 if sink.time_to_first is not None else None
+    return stats
+
+
+SCENARIOS = {"render": bench_render, "chat": bench_chat}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", default="render,chat", help="Comma separated: render, chat")
+    parser.add_argument("--chunk-sizes", type=int_list, default=[1, 4, 16], help="Characters per chunk")
+    parser.add_argument("--lengths", type=int_list, default=[1_000, 10_000, 100_000], help="Reply lengths")
+    parser.add_argument("--tps", type=int_list, default=[0], help="Chunks per second, 0 = unthrottled")
+    parser.add_argument("--markdown", action="store_true", help="Stream in Markdown mode")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case, the fastest is kept")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    return parser.parse_args(argv)
+
+
+def run_cases(args):
+    results = []
+    for scenario in args.scenarios.split(","):
+        for length in args.lengths:
+            reply = make_reply(length)
+            for chunk_size in args.chunk_sizes:
+                for tps in args.tps:
+                    bench = SCENARIOS[scenario]
+                    runs = [bench(reply, chunk_size, tps or None, args.markdown) for _ in range(args.repeat)]
+                    best = min(runs, key=lambda run: run["cpu_s"])
+                    traced = bench(reply, chunk_size, tps or None, args.markdown, trace_memory=True)
+                    result = {
+                        "scenario": scenario,
+                        "length": length,
+                        "chunk_size": chunk_size,
+                        "tps": tps,
+                        "markdown": args.markdown,
+                        "wall_s": round(best["wall_s"], 6),
+                        "cpu_s": round(best["cpu_s"], 6),
+                        "chars_per_s": round(length / best["wall_s"]),
+                        "chars_per_cpu_s": round(length / best["cpu_s"]) if best["cpu_s"] else None,
+                        "first_char_ms": round(best["first_char_ms"], 3) if best["first_char_ms"] is not None else None,
+                        "peak_kib": round(traced["peak_kib"], 1),
+                    }
+                    results.append(result)
+                    print_result(result)
+    return results
+
+
+def case_key(result):
+    return (result["scenario"], result["length"], result["chunk_size"], result["tps"], result["markdown"])
+
+
+def print_header():
+    print(f"{'scenario':<8} {'length':>8} {'chunk':>6} {'tps':>5} {'chars/s':>12} {'chars/cpu-s':>12} "
+          f"{'first char':>11} {'peak':>10}")
+
+
+def print_result(result, baseline=None):
+    first = f"{result['first_char_ms']:.2f}ms" if result["first_char_ms"] is not None else "-"
+    line = (f"{result['scenario']:<8} {result['length']:>8} {result['chunk_size']:>6} {result['tps']:>5} "
+            f"{result['chars_per_s']:>12,} {result['chars_per_cpu_s'] or 0:>12,} {first:>11} "
+            f"{result['peak_kib']:>8.1f}KiB")
+    if baseline and baseline.get("chars_per_cpu_s") and result["chars_per_cpu_s"]:
+        line += f"  x{result['chars_per_cpu_s'] / baseline['chars_per_cpu_s']:.2f} vs baseline"
+    print(line)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print_header()
+    results = run_cases(args)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {case_key(result): result for result in json.load(f)["results"]}
+        print(f"\nCompared to {args.compare}:")
+        print_header()
+        for result in results:
+            print_result(result, baseline.get(case_key(result)))
+
+    if args.output:
+        data = {
+            "meta": {
+                "commit": git_commit(),
+                "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
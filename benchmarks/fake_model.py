@@ -0,0 +1,65 @@
+"""Deterministic fake LLM model for benchmarks - no network, no API keys."""
+
+import time
+from typing import Optional
+
+import llm
+
+
+_WORDS = (
+    "the model streams tokens to the terminal while the renderer wraps words "
+    "at the right margin and keeps the left padding intact for every line"
+).split()
+
+
+def make_reply(length: int, line_length: int = 400) -> str:
+    """Build a deterministic reply of exactly `length` characters.
+
+    Words are taken from a fixed list; a newline ends each paragraph of about
+    `line_length` characters so that wrapping and newlines are both exercised.
+    """
+    parts = []
+    size = 0
+    index = 0
+    since_newline = 0
+    while size < length:
+        word = _WORDS[index % len(_WORDS)]
+        index += 1
+        separator = "\n" if since_newline > line_length else " "
+        since_newline = 0 if separator == "\n" else since_newline + len(word) + 1
+        parts.append(word + separator)
+        size += len(word) + 1
+    return "".join(parts)[:length]
+
+
+class FakeModel(llm.Model):
+    """A model that always streams the same reply.
+
+    Args:
+        reply: Text returned for every prompt
+        chunk_size: Number of characters per streamed chunk
+        tokens_per_second: Chunks streamed per second (None streams as fast as possible)
+    """
+
+    model_id = "nbllm-fake"
+    can_stream = True
+    supports_tools = True
+
+    def __init__(self, reply: str = "ok", chunk_size: int = 4, tokens_per_second: Optional[float] = None):
+        self.reply = reply
+        self.chunk_size = chunk_size
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+        self.finished_at = None  # perf_counter() when the last reply finished streaming
+
+    def execute(self, prompt, stream, response, conversation):
+        self.calls += 1
+        delay = 1 / self.tokens_per_second if self.tokens_per_second else 0
+        next_chunk = time.perf_counter()
+        for start in range(0, len(self.reply), self.chunk_size):
+            if delay:
+                # Sleep until the chunk is due so the rate doesn't drift
+                next_chunk += delay
+                time.sleep(max(0, next_chunk - time.perf_counter()))
+            yield self.reply[start:start + self.chunk_size]
+        self.finished_at = time.perf_counter()
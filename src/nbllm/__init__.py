@@ -1,13 +1,34 @@
 """nbllm - An AI-powered coding assistant for editing files with interactive confirmations."""
 
-import importlib.metadata
+import importlib
 
-from .__main__ import chat, Chat
+# Public names and the modules defining them, imported on first access so that
+# `import nbllm` stays fast
+_LAZY_ATTRIBUTES = {
+    "chat": ".__main__",
+    "Chat": ".__main__",
+    "AsyncChat": ".async_chat",
+    "PromptHistory": ".history",
+    "SessionStore": ".sessions",
+    "StreamRenderer": ".streaming",
+    "TranscriptWriter": ".transcript",
+}
 
-# Get version dynamically from package metadata
-try:
-    __version__ = importlib.metadata.version("nbllm")
-except:
-    __version__ = "unknown"
 
-__all__ = ["chat", "Chat", "__version__"]
\ No newline at end of file
+def __getattr__(name: str):
+    if name == "__version__":
+        from .version import get_version
+        return get_version()
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_LAZY_ATTRIBUTES, "__version__"])
+
+
+__all__ = ["chat", "Chat", "AsyncChat", "PromptHistory", "SessionStore", "StreamRenderer", "TranscriptWriter", "__version__"]
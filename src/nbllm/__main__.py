@@ -1,6 +1,7 @@
 from pathlib import Path
-from typing import Optional, Callable, Union
+from typing import TYPE_CHECKING, Optional, Callable, Union
 import json
+import time
 import uuid
 
 import llm
@@ -9,12 +10,20 @@ from dotenv import load_dotenv
 from rich.console import Console
 from rich.spinner import Spinner
 from rich.live import Live
+from rich.markup import escape
 from rich.prompt import Prompt
 from rich.columns import Columns
 from rich.text import Text
 
 from . import config
 from . import ui
+from .mode_switch import BackgroundModeSwitch
+from .sessions import SessionStore
+from .tool_scheduler import ToolScheduler
+from .transcript import response_record
+
+if TYPE_CHECKING:
+    from .history import PromptHistory
 
 
 load_dotenv(".env")
@@ -129,6 +138,9 @@ def dispatch_slash_command(command, user_commands, model, tools, conversation):
 class Chat:
     """Chat session manager with support for configurable modes."""
     
+    # Response class used to rebuild stored sessions
+    _response_class = llm.Response
+    
     def __init__(
         self,
         debug: bool = False,
@@ -141,6 +153,13 @@ class Chat:
         first_message: Optional[str] = None,
         show_banner: bool = True,
         initial_mode: Optional[str] = None,
+        max_tool_workers: int = 4,
+        session_store: Optional[SessionStore] = None,
+        session_id: Optional[str] = None,
+        save_session: bool = True,
+        markdown: bool = False,
+        prompt_history: Optional["PromptHistory"] = None,
+        repo_map_tokens: int = 0,
     ):
         """Initialize chat session.
         
@@ -155,6 +174,15 @@ class Chat:
             first_message: Initial message to display
             show_banner: Whether to show banner
             initial_mode: Initial mode (None = no modes)
+            max_tool_workers: Tool calls from one response that may run in parallel
+            session_store: Store saving every response as it happens
+            session_id: Stored session to resume (requires session_store)
+            save_session: Save new responses to session_store; if False, the store
+                is only read to resume `session_id`
+            markdown: Render replies as Markdown while they stream
+            prompt_history: History of submitted prompts (default: in memory only)
+            repo_map_tokens: Add a map of the source files of the working directory, in
+                about this many tokens, to the system prompt (0: no map)
         """
         self.debug = debug
         self.model_name = model_name
@@ -163,9 +191,19 @@ class Chat:
         self.history_callback = history_callback
         self.first_message = first_message
         self.show_banner = show_banner
+        self.markdown = markdown
         self.current_mode = initial_mode
         self.mode_switch_messages = mode_switch_messages or {}
-        self.conversation_history = []
+        self._pending_mode_message = None
+        self._mode_switch = BackgroundModeSwitch(self._apply_mode, lambda: self.current_mode)
+        self.tool_scheduler = ToolScheduler(max_workers=max_tool_workers)
+        # One prompt session for the whole chat, so prompts are not rebuilt every turn
+        self._input_session = ui.InputSession(prompt_history)
+        self._recorded_responses = 0
+        self.session_store = session_store
+        self.save_session = save_session
+        self.session_id = None
+        self._saved_responses = 0
         
         # Parse tools configuration
         if isinstance(tools, dict):
@@ -174,11 +212,56 @@ class Chat:
         else:
             self.mode_tools = {"default": tools or []}
             self.available_modes = []
+        self.read_cache = self._share_tool_state("read_cache")
+        self.edit_journal = self._share_tool_state("journal")
+        
+        stored_session = None
+        if session_id is not None and session_store is not None:
+            stored_session = session_store.get_session(session_id)
+            if stored_session is None:
+                ui.print(f"[red]Unknown session '{session_id}'[/red]")
+                raise typer.Exit(1)
+            if stored_session["mode"] in self.available_modes:
+                self.current_mode = stored_session["mode"]
+            if self.system_prompt is None:
+                self.system_prompt = stored_session["system_prompt"]
+        if repo_map_tokens:
+            self._add_repo_map(repo_map_tokens)
         
         # Initialize model and conversation
         self.model = None
         self.conversation = None
         self._initialize_model()
+        if stored_session is not None:
+            self._restore_session(stored_session["id"])
+    
+    def _share_tool_state(self, attribute: str):
+        """Give all file tools the `attribute` (read cache, edit journal) of the first one, so the chat has one.
+        
+        Returns:
+            The shared object, or None without file tools
+        """
+        file_tools = [tool for tools in self.mode_tools.values() for tool in tools if hasattr(tool, attribute)]
+        for tool in file_tools[1:]:
+            setattr(tool, attribute, getattr(file_tools[0], attribute))
+        return getattr(file_tools[0], attribute) if file_tools else None
+    
+    def _add_repo_map(self, max_tokens: int):
+        """Append a map of the file tools' working directory (or the current one) to the system prompt.
+        
+        A map already in the prompt, e.g. of a resumed session, is replaced. File
+        tools of the same directory share the map, so their `repo_map` reuses it.
+        """
+        from .tools.repo_map import MAP_TITLE, RepoMap
+        file_systems = [tool for tools in self.mode_tools.values() for tool in tools if hasattr(tool, "_repo_map")]
+        repo_map = RepoMap(file_systems[0].working_directory if file_systems else Path.cwd())
+        for tool in file_systems:
+            if tool.working_directory == repo_map.root:
+                tool._repo_map = repo_map
+        prompt = self.system_prompt or ""
+        prompt = "" if prompt.startswith(MAP_TITLE) else prompt.split("\n\n" + MAP_TITLE)[0]
+        text = repo_map.render(max_tokens)
+        self.system_prompt = f"{prompt}\n\n{text}" if prompt else text
     
     def _initialize_model(self):
         """Initialize the LLM model and conversation."""
@@ -191,6 +274,45 @@ class Chat:
         current_tools = self._get_current_tools()
         self.conversation = self.model.conversation(tools=current_tools)
     
+    def _restore_session(self, session_id: str):
+        """Rebuild the conversation from a stored session without calling the model."""
+        self.conversation.responses = [
+            self._response_class.from_dict(data, model=self.model)
+            for data in self.session_store.load_responses(session_id)
+        ]
+        self.session_id = session_id
+        # Stored responses are neither saved nor passed to history_callback again
+        self._saved_responses = self._recorded_responses = len(self.conversation.responses)
+    
+    def _save_new_responses(self):
+        """Save the responses added since the last call to the session store."""
+        if self.session_store is None or not self.save_session:
+            return
+        if self.session_id is None:
+            self.session_id = self.session_store.create_session(
+                model=self.model_name, mode=self.current_mode, system_prompt=self.system_prompt
+            )
+        responses = self.conversation.responses
+        for seq in range(self._saved_responses, len(responses)):
+            self.session_store.save_response(self.session_id, seq, responses[seq], mode=self.current_mode)
+        self._saved_responses = len(responses)
+    
+    def _save_tool_results(self, tool_results: list):
+        """Save tool results for the last saved response to the session store."""
+        if self.session_store is not None and self.save_session and self.session_id is not None:
+            self.session_store.save_tool_results(self.session_id, self._saved_responses - 1, tool_results)
+    
+    def _transfer_conversation(self):
+        """Move the conversation state into a new conversation for the current mode.
+        
+        The existing responses (prompts, replies and tool results) are handed over
+        as-is, so the next turn sees the same history with the new tool set and no
+        model calls are made during the switch.
+        """
+        responses = list(self.conversation.responses)
+        self.conversation = self.model.conversation(tools=self._get_current_tools())
+        self.conversation.responses = responses
+    
     def _get_current_tools(self):
         """Get tools for current mode."""
         if self.current_mode is None:
@@ -205,6 +327,24 @@ class Chat:
         """Return list of available modes."""
         return self.available_modes.copy() if self._is_modes_enabled() else []
     
+    def _apply_mode(self, new_mode: str):
+        """Activate a mode by transferring the conversation to its tool set.
+        
+        The mode switch message (if configured) is not sent on its own; it is
+        queued and delivered together with the next user message.
+        """
+        self.current_mode = new_mode
+        self._transfer_conversation()
+        self._pending_mode_message = self.mode_switch_messages.get(new_mode)
+    
+    def _with_mode_message(self, text: str) -> str:
+        """Prefix a pending mode switch message to the outgoing prompt."""
+        message = self._pending_mode_message
+        if not message:
+            return text
+        self._pending_mode_message = None
+        return f"{message}\n\n{text}"
+    
     def switch_to_next_mode(self) -> str:
         """Switch to the next mode in the list (for keyboard shortcut)."""
         if not self._is_modes_enabled() or len(self.available_modes) <= 1:
@@ -214,32 +354,42 @@ class Chat:
         next_index = (current_index + 1) % len(self.available_modes)
         next_mode = self.available_modes[next_index]
         
-        # Save conversation history before switching
-        self.conversation_history = [msg.response_json for msg in self.conversation.responses]
-        
         # Switch mode silently (no UI feedback here, handled by input function)
-        old_mode = self.current_mode
-        self.current_mode = next_mode
-        self._initialize_model()
+        self._apply_mode(next_mode)
+        return next_mode
+    
+    def request_next_mode(self, on_done: Optional[Callable] = None) -> Optional[str]:
+        """Queue a switch to the next mode in the background (for keyboard shortcut).
         
-        # Send mode switch message if configured
-        if next_mode in self.mode_switch_messages:
-            switch_message = self.mode_switch_messages[next_mode]
-            for _ in self.conversation.chain(switch_message, system=self.system_prompt):
-                pass  # Consume the response silently
-        
-        # Replay conversation history
-        for msg in self.conversation_history:
-            if msg.get("role") == "user":
-                content = msg.get("content", [])
-                if content and isinstance(content, list) and content[0].get("type") == "text":
-                    text = content[0].get("text", "")
-                    if text:  # Only replay non-empty user messages
-                        for _ in self.conversation.chain(text, system=self.system_prompt):
-                            pass  # Consume responses silently
+        Returns the mode that will be active once the switch finishes, or None
+        if there is no other mode. Repeated requests cycle from the pending
+        target and are merged into one switch. `on_done` is called once the
+        switch finished.
+        """
+        if not self._is_modes_enabled() or len(self.available_modes) <= 1:
+            return None
         
+        current_index = self.available_modes.index(self._mode_switch.target)
+        next_mode = self.available_modes[(current_index + 1) % len(self.available_modes)]
+        self._mode_switch.request(next_mode, on_done=on_done)
         return next_mode
     
+    def _wait_for_mode_switch(self):
+        """Wait for a background mode switch before handling the next input."""
+        try:
+            self._mode_switch.wait()
+        except Exception as e:
+            ui.print(f"[red]Error switching mode: {e}[/red]")
+            ui.print("")
+    
+    def _prompt_text(self) -> str:
+        """Return the prompt, showing the target mode while a switch is pending."""
+        if not self._is_modes_enabled():
+            return "> "
+        if self._mode_switch.pending:
+            return f"[{self._mode_switch.target} switching…] > "
+        return f"[{self.current_mode}] > "
+    
     def switch_mode(self, new_mode: str):
         """Switch to a different mode."""
         if not self._is_modes_enabled():
@@ -255,45 +405,18 @@ class Chat:
             ui.print(f"[dim]Already in {new_mode} mode[/dim]")
             return True
         
-        # Save conversation history
-        self.conversation_history = [msg.response_json for msg in self.conversation.responses]
-        
-        # Switch mode and reinitialize
         old_mode = self.current_mode
-        self.current_mode = new_mode
-        self._initialize_model()
-        
-        # Send mode switch message if configured
-        if new_mode in self.mode_switch_messages:
-            switch_message = self.mode_switch_messages[new_mode]
-            # Send the switch message to establish new mode context
-            for _ in self.conversation.chain(switch_message, system=self.system_prompt):
-                pass  # Consume the response silently
-        
-        # Replay conversation history
-        for msg in self.conversation_history:
-            if msg.get("role") == "user":
-                content = msg.get("content", [])
-                if content and isinstance(content, list) and content[0].get("type") == "text":
-                    text = content[0].get("text", "")
-                    if text:  # Only replay non-empty user messages
-                        for _ in self.conversation.chain(text, system=self.system_prompt):
-                            pass  # Consume responses silently
+        self._apply_mode(new_mode)
         
         ui.print(f"[green]Switched from {old_mode} to {new_mode} mode[/green]")
         ui.print("")
         return True
 
-    def run(self):
-        """Main chat loop."""
+    def _start_session(self):
+        """Set debug mode and show the banner and welcome messages."""
         # Set debug mode globally
         config.DEBUG_MODE = self.debug
         
-        # Initialize user slash commands
-        user_commands = self.slash_commands.copy()
-        
-        console = Console()
-
         # Show the banner
         if self.show_banner:
             ui.show_banner()
@@ -306,105 +429,187 @@ class Chat:
             ui.print("[magenta]Debug mode enabled[/magenta]")
             ui.print("")
         
-        history = []
+        if self.session_id is not None:
+            ui.print(f"[dim]Resumed session {self.session_id} ({len(self.conversation.responses)} responses)[/dim]")
+            ui.print("")
+    
+    def _end_session(self):
+        """Report the file reads saved (in debug mode) and tell the user how to resume the saved session."""
+        if self.read_cache is not None and self.read_cache.unchanged:
+            ui.tool_debug(f"Read cache: {self.read_cache.summary()}")
+        if self.session_id is not None and self.save_session:
+            ui.print(f"[dim]Session saved, resume with: nbllm --resume {self.session_id}[/dim]")
+    
+    def _get_builtin_commands(self) -> list:
+        """Return the built-in slash commands available in this session."""
+        builtin_commands = ["/quit", "/help", "/tools", "/debug"]
+        if self._is_modes_enabled():
+            builtin_commands.extend(["/mode", "/modes"])
+        if self.edit_journal is not None:
+            builtin_commands.extend(["/undo", "/redo", "/history"])
+        return builtin_commands
+    
+    def _show_completion_hint(self):
+        """Show the completion hint on the first prompt."""
+        if not hasattr(self, '_shown_completion_hint'):
+            tip_text = "[dim]Tips: TAB for completions • @file.py for file paths • ↑/↓ for history • Ctrl+R to search history • Ctrl+U to clear"
+            if self._is_modes_enabled() and len(self.available_modes) > 1:
+                tip_text += " • Shift+TAB to switch modes"
+            tip_text += "[/dim]"
+            ui.print(tip_text)
+            self._shown_completion_hint = True
+    
+    def _get_input_options(self, user_commands) -> dict:
+        """Return keyword arguments for `ui.input` (completions and mode switching)."""
+        # Define available commands for completion (builtin + user commands + mode commands)
+        completions = self._get_builtin_commands() + list(user_commands.keys())
+        
+        # Prepare mode switching for keyboard shortcut (runs in the background)
+        return {
+            "completions": completions,
+            "mode_switcher_callback": self.request_next_mode if self._is_modes_enabled() else None,
+            "available_modes": self.get_available_modes() if self._is_modes_enabled() else None,
+            "session": self._input_session,
+        }
+    
+    def _handle_input(self, out: str, user_commands) -> str:
+        """Resolve slash commands in user input.
+        
+        Returns COMMAND_QUIT, COMMAND_HANDLED, or the text to send to the LLM.
+        """
+        # Make sure a Shift+TAB switch has finished before acting on the input
+        self._wait_for_mode_switch()
+        
+        # Handle slash commands (only if it's a known command)
+        if out.startswith("/"):
+            # Parse command and arguments
+            parts = out.split(None, 1)  # Split at most once to preserve spaces in args
+            command = parts[0] if parts else out
+            args = parts[1] if len(parts) > 1 else ""
+            
+            # Check if it's a known command
+            if command in self._get_builtin_commands() or command in user_commands:
+                result, self.conversation = self._dispatch_slash_command(command, args, user_commands)
+                if result in (COMMAND_QUIT, COMMAND_HANDLED):
+                    return result
+                # Command returned text for LLM
+                out = result
+            # If it starts with / but isn't a known command, treat as regular text
+        
+        # Skip empty input
+        if not out.strip():
+            return COMMAND_HANDLED
+        return out
+    
+    def _chain(self, text: str):
+        """Stream a prompt and any follow-up tool-result turns, like `conversation.chain`.
+        
+        The tool calls requested in one response are executed by the tool
+        scheduler, which runs independent calls concurrently.
+        """
+        response = self.conversation.prompt(text, system=self.system_prompt)
+        count = 0
+        last_char = ""
+        while response is not None:
+            count += 1
+            first_chunk = True
+            for chunk in response:
+                if not chunk:
+                    continue
+                # Keep separate rounds of the chain from running into each other
+                if first_chunk and last_char and not last_char.isspace() and not chunk[0].isspace():
+                    yield " "
+                first_chunk = False
+                last_char = chunk[-1]
+                yield chunk
+            self._save_new_responses()
+            
+            if not response.tool_calls():
+                break
+            if self.conversation.chain_limit and count >= self.conversation.chain_limit:
+                raise ValueError(f"Chain limit of {self.conversation.chain_limit} exceeded.")
+            tool_results = self.tool_scheduler.run(response)
+            self._save_tool_results(tool_results)
+            # Attachments returned by tools (e.g. screenshots) go along, as in llm's ChainResponse
+            attachments = [attachment for result in tool_results for attachment in result.attachments]
+            response = self.conversation.prompt(tool_results=tool_results, attachments=attachments, system=self.system_prompt)
+    
+    def _make_spinner(self):
+        """Create a padded "Thinking..." spinner shown until the first chunk arrives."""
+        spinner_text = Text("Thinking...", style="dim")
+        return Columns([Text(" " * ui.LEFT_PADDING), Spinner("dots"), spinner_text], expand=False)
+    
+    def _user_history_record(self, text: str) -> dict:
+        """Build the history record for a user message."""
+        new_id = str(uuid.uuid4()).replace("-", "")[:24]
+        return {"id": f"msg_{new_id}", "role": "user", "content": [{"text": text, "type": "text"}]}
+    
+    def _new_responses(self) -> list:
+        """Return the responses added since the last call."""
+        responses = self.conversation.responses
+        new_responses = responses[self._recorded_responses:]
+        self._recorded_responses = len(responses)
+        return new_responses
+    
+    def _response_history_records(self) -> list:
+        """Build history records for the responses added since the last call."""
+        return [response_record(response) for response in self._new_responses()]
+
+    def run(self):
+        """Main chat loop."""
+        # Initialize user slash commands
+        user_commands = self.slash_commands.copy()
+        
+        console = Console()
+
+        self._start_session()
+        
         try:
             while True:
-                # Define available commands for completion (builtin + user commands + mode commands)
-                builtin_commands = ["/quit", "/help", "/tools", "/debug"]
-                if self._is_modes_enabled():
-                    builtin_commands.extend(["/mode", "/modes"])
-                
-                user_command_names = list(user_commands.keys())
-                completions = builtin_commands + user_command_names
-                
-                # Show completion hint on first prompt
-                if not hasattr(self, '_shown_completion_hint'):
-                    tip_text = "[dim]Tips: TAB for completions • @file.py for file paths • ↑/↓ for history • Ctrl+U to clear"
-                    if self._is_modes_enabled() and len(self.available_modes) > 1:
-                        tip_text += " • Shift+TAB to switch modes"
-                    tip_text += "[/dim]"
-                    ui.print(tip_text)
-                    self._shown_completion_hint = True
-                
-                # Create mode-aware prompt
-                if self._is_modes_enabled():
-                    prompt = f"[{self.current_mode}] > "
-                else:
-                    prompt = "> "
-                
-                # Prepare mode switching for keyboard shortcut
-                mode_switcher = self.switch_to_next_mode if self._is_modes_enabled() else None
-                available_modes = self.get_available_modes() if self._is_modes_enabled() else None
+                self._show_completion_hint()
                 
-                out = ui.input(
-                    prompt, 
-                    completions=completions,
-                    mode_switcher_callback=mode_switcher,
-                    available_modes=available_modes
-                ).strip()
-                
-                # Handle slash commands (only if it's a known command)
-                if out.startswith("/"):
-                    # Parse command and arguments
-                    parts = out.split(None, 1)  # Split at most once to preserve spaces in args
-                    command = parts[0] if parts else out
-                    args = parts[1] if len(parts) > 1 else ""
-                    
-                    # Check if it's a known command
-                    if command in builtin_commands or command in user_commands:
-                        result, self.conversation = self._dispatch_slash_command(command, args, user_commands)
-                        
-                        if result == COMMAND_QUIT:
-                            break
-                        elif result == COMMAND_HANDLED:
-                            continue
-                        else:
-                            # Command returned text for LLM
-                            out = result
-                    # If it starts with / but isn't a known command, treat as regular text
+                out = ui.input(self._prompt_text, **self._get_input_options(user_commands)).strip()
                 
-                # Skip empty input
-                if not out.strip():
+                out = self._handle_input(out, user_commands)
+                if out == COMMAND_QUIT:
+                    break
+                elif out == COMMAND_HANDLED:
                     continue
                 
                 # Show spinner while getting initial response
-                # Create a padded spinner
-                spinner_text = Text("Thinking...", style="dim")
-                padded_spinner = Columns([Text(" " * ui.LEFT_PADDING), Spinner("dots"), spinner_text], expand=False)
-                response_started = False
+                renderer = None
 
-                with Live(padded_spinner, console=console, refresh_per_second=10, transient=True) as live:
+                # The history records exactly what the model is sent
+                out = self._with_mode_message(out)
+                with Live(self._make_spinner(), console=console, refresh_per_second=10, transient=True) as live:
                     if self.history_callback:
-                        new_id = str(uuid.uuid4()).replace("-", "")[:24]
-                        self.history_callback([{"id": f"msg_{new_id}", "role": "user", "content": [{"text": out, "type": "text"}]}])
-                    for chunk in self.conversation.chain(out, system=self.system_prompt):
-                        if not response_started:
+                        self.history_callback([self._user_history_record(out)])
+                    for chunk in self._chain(out):
+                        if renderer is None:
                             # First chunk received, clear and stop the spinner so it disappears
                             try:
                                 live.update(Text(""), refresh=True)
                             except Exception:
                                 pass
                             live.stop()
-                            response_started = True
-                            # Initialize streaming state
-                            ui.start_streaming(ui.LEFT_PADDING)
+                            # Each reply streams through a renderer of its own
+                            renderer = ui.stream_renderer(ui.LEFT_PADDING, markdown=self.markdown)
                         
                         # Stream each chunk as it arrives
-                        ui.stream_chunk(chunk, ui.LEFT_PADDING)
+                        renderer.feed(chunk)
                     
                     # Finish streaming and print any remaining text
-                    if response_started:
-                        ui.end_streaming(ui.LEFT_PADDING)
-                    ids = set([e["id"] for e in history])
-                    new_responses = [e for e in self.conversation.responses if e.response_json["id"] not in ids]
+                    if renderer is not None:
+                        renderer.end()
                     if self.history_callback:
-                        self.history_callback([e.response_json for e in new_responses])
+                        self.history_callback(self._response_history_records())
 
                 ui.print("")  # Add extra newline after bot response
         except KeyboardInterrupt:
             ui.print("")  # Add newlines
             ui.print("[cyan]Thanks for using nbllm. Goodbye![/cyan]")
             ui.print("")  # Add final newline
+        self._end_session()
     
     def _dispatch_slash_command(self, command, args, user_commands):
         """Dispatch slash command to appropriate handler."""
@@ -420,6 +625,10 @@ class Chat:
             return self._handle_mode_command(args), self.conversation
         elif command == "/modes":
             return self._handle_modes_command(), self.conversation
+        elif command in ("/undo", "/redo"):
+            return self._handle_undo_command(redo=command == "/redo"), self.conversation
+        elif command == "/history":
+            return self._handle_history_command(), self.conversation
         elif command in user_commands:
             return handle_user_command(command, user_commands[command]), self.conversation
         else:
@@ -442,6 +651,11 @@ class Chat:
             if len(self.available_modes) > 1:
                 ui.print("  [dim]Shift+TAB - Quick switch to next mode[/dim]")
         
+        if self.edit_journal is not None:
+            ui.print("  /undo   - Undo the last file edit")
+            ui.print("  /redo   - Redo the last undone file edit")
+            ui.print("  /history - List the file edits of this session")
+        
         if user_commands:
             ui.print("")
             ui.print("[cyan]Custom commands:[/cyan]")
@@ -511,6 +725,44 @@ class Chat:
         self.switch_mode(target_mode)
         return COMMAND_HANDLED
     
+    def _handle_undo_command(self, redo: bool = False):
+        """Handle /undo and /redo: revert or reapply the last file edit of the session."""
+        from .tools.editing import EditError
+        
+        try:
+            entry = self.edit_journal.redo() if redo else self.edit_journal.undo()
+        except EditError as e:
+            ui.print(f"[red]Cannot {'redo' if redo else 'undo'}: {escape(str(e))}[/red]")
+            ui.print("")
+            return COMMAND_HANDLED
+        removed, added = entry.lines_changed()
+        if redo:
+            ui.print(f"[green]Redid {entry.description} of {escape(str(entry.path))} (-{removed} +{added} lines)[/green]")
+        else:
+            ui.print(f"[green]Undid {entry.description} of {escape(str(entry.path))} (-{added} +{removed} lines)[/green]")
+        ui.print("")
+        return COMMAND_HANDLED
+    
+    def _handle_history_command(self):
+        """Handle /history: list the file edits that can be undone and redone."""
+        done, undone = self.edit_journal.history()
+        if not done and not undone:
+            ui.print("[dim]No file edits in this session[/dim]")
+            ui.print("")
+            return COMMAND_HANDLED
+        
+        ui.print("[cyan]File edits (newest last):[/cyan]")
+        for entry in done:
+            removed, added = entry.lines_changed()
+            ui.print(f"  {time.strftime('%H:%M:%S', time.localtime(entry.time))} {entry.description} "
+                     f"{escape(str(entry.path))} (-{removed} +{added} lines)")
+        for entry in reversed(undone):
+            removed, added = entry.lines_changed()
+            ui.print(f"  [dim]{time.strftime('%H:%M:%S', time.localtime(entry.time))} {entry.description} "
+                     f"{escape(str(entry.path))} (-{removed} +{added} lines, undone)[/dim]")
+        ui.print("")
+        return COMMAND_HANDLED
+    
     def _handle_modes_command(self):
         """Handle /modes command."""
         if not self._is_modes_enabled():
@@ -537,6 +789,12 @@ def chat(
     history_callback: Optional[Callable] = None,
     first_message: Optional[str] = None,
     show_banner: bool = True,
+    session_store: Optional[SessionStore] = None,
+    session_id: Optional[str] = None,
+    save_session: bool = True,
+    markdown: bool = False,
+    prompt_history: Optional["PromptHistory"] = None,
+    repo_map_tokens: int = 0,
 ):
     """Run the nbllm chat assistant."""
     chat_instance = Chat(
@@ -548,13 +806,124 @@ def chat(
         history_callback=history_callback,
         first_message=first_message,
         show_banner=show_banner,
+        session_store=session_store,
+        session_id=session_id,
+        save_session=save_session,
+        markdown=markdown,
+        prompt_history=prompt_history,
+        repo_map_tokens=repo_map_tokens,
     )
     chat_instance.run()
 
 
+app = typer.Typer(add_completion=False, help="Run the nbllm chat assistant.")
+
+
+@app.callback(invoke_without_command=True)
+def cli(
+    ctx: typer.Context,
+    debug: bool = typer.Option(False, "--debug", "-d", help="Enable debug mode to see LLM interactions"),
+    model_name: Optional[str] = typer.Option(None, "--model", "-m", help="LLM model to use (default: anthropic/claude-3-5-sonnet-20240620)"),
+    system_prompt: Optional[str] = typer.Option(None, "--system", "-s", help="System prompt for the assistant"),
+    resume: Optional[str] = typer.Option(None, "--resume", "-r", help="Resume a saved session by id (or id prefix)"),
+    list_sessions: bool = typer.Option(False, "--list-sessions", help="List saved sessions (filtered by --model) and exit"),
+    save: bool = typer.Option(True, "--save/--no-save", help="Save the conversation so it can be resumed"),
+    sessions_db: Optional[Path] = typer.Option(None, "--sessions-db", help="Session database (default: ~/.nbllm/sessions.db)"),
+    markdown: bool = typer.Option(False, "--markdown", help="Render replies as Markdown while they stream"),
+    history: str = typer.Option("shared", "--history", help="Prompt history: shared (~/.nbllm), project (./.nbllm) or off"),
+    repo_map: int = typer.Option(0, "--repo-map", metavar="TOKENS", help="Add a map of the source files here, in about TOKENS tokens, to the system prompt"),
+):
+    """Run the nbllm chat assistant."""
+    if ctx.invoked_subcommand is not None:
+        return
+    
+    if history not in ("shared", "project", "off"):
+        raise typer.BadParameter("must be 'shared', 'project' or 'off'", param_hint="--history")
+    from .history import PromptHistory
+    prompt_history = None
+    if history == "shared":
+        prompt_history = PromptHistory.shared()
+    elif history == "project":
+        prompt_history = PromptHistory.for_project()
+    
+    store = SessionStore(sessions_db) if save or resume or list_sessions else None
+    if list_sessions:
+        show_sessions(store.list_sessions(model=model_name))
+        return
+    
+    session_id = None
+    if resume:
+        session = store.get_session(resume)
+        if session is None:
+            ui.print(f"[red]Unknown session '{resume}'[/red]")
+            raise typer.Exit(1)
+        session_id = session["id"]
+        model_name = model_name or session["model"]
+    
+    chat(
+        debug=debug,
+        model_name=model_name or "anthropic/claude-3-5-sonnet-20240620",
+        system_prompt=system_prompt,
+        session_store=store,
+        session_id=session_id,
+        # With --no-save, a resumed session is only read
+        save_session=save,
+        markdown=markdown,
+        prompt_history=prompt_history,
+        repo_map_tokens=repo_map,
+    )
+
+
+def show_sessions(sessions: list):
+    """Print saved sessions, most recent first."""
+    if not sessions:
+        ui.print("[dim]No saved sessions[/dim]")
+        return
+    for session in sessions:
+        updated = session["updated_at"][:16].replace("T", " ")
+        mode = f" [{session['mode']}]" if session["mode"] else ""
+        title = escape(session["title"].splitlines()[0][:60]) if session["title"] else ""
+        ui.print(f"[cyan]{session['id']}[/cyan]  [dim]{updated}  {session['model']}{escape(mode)}  {session['turns']} responses[/dim]  {title}")
+
+
+@app.command()
+def batch(
+    input_path: Path = typer.Argument(..., help="JSONL file with one prompt object per line"),
+    output_path: Path = typer.Option(Path("results.jsonl"), "--output", "-o", help="JSONL file results are appended to"),
+    model_name: str = typer.Option("anthropic/claude-3-5-sonnet-20240620", "--model", "-m", help="LLM model to use"),
+    system_prompt: Optional[str] = typer.Option(None, "--system", "-s", help="Default system prompt"),
+    tools: str = typer.Option("", "--tools", "-t", help="Default comma separated tool sets, e.g. filesystem,todo"),
+    modes_path: Optional[Path] = typer.Option(None, "--modes", help="JSON file mapping mode names to lists of tool sets"),
+    workers: int = typer.Option(4, "--workers", "-w", help="Number of prompts to run in parallel"),
+    confirm: str = typer.Option("deny", "--confirm", help="Answer to tool confirmations: allow or deny"),
+    resume: bool = typer.Option(True, "--resume/--no-resume", help="Skip prompts already answered in the output file"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Show tool output"),
+):
+    """Answer a JSONL file of prompts as independent conversations."""
+    from .batch import run_batch
+    
+    if confirm not in ("allow", "deny"):
+        raise typer.BadParameter("must be 'allow' or 'deny'", param_hint="--confirm")
+    
+    stats = run_batch(
+        input_path,
+        output_path,
+        model_name=model_name,
+        system_prompt=system_prompt,
+        default_tools=[name.strip() for name in tools.split(",") if name.strip()],
+        modes=json.loads(modes_path.read_text()) if modes_path else None,
+        workers=workers,
+        confirm_policy=confirm == "allow",
+        resume=resume,
+        verbose=verbose,
+    )
+    ui.print(f"[green]{stats['completed']} completed[/green], [red]{stats['failed']} failed[/red], "
+             f"[dim]{stats['skipped']} skipped[/dim] → {output_path}")
+
+
 def main():
     """Main entry point for the nbllm CLI."""
-    typer.run(chat)
+    app()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,269 @@
+"""Asyncio chat session built on llm's async models."""
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import dataclasses
+import functools
+import inspect
+
+import llm
+import typer
+from rich.console import Console
+from rich.live import Live
+from rich.text import Text
+
+from . import ui
+from .__main__ import Chat, COMMAND_QUIT, COMMAND_HANDLED
+from .tool_scheduler import needs_serial_execution
+from .transcript import response_record
+
+
+# Marker put on the render queue once the model has finished streaming
+_END_OF_STREAM = object()
+
+
+class AsyncChat(Chat):
+    """Chat session driven by llm's async model and conversation APIs.
+
+    Takes the same arguments as `Chat`. `run()` blocks like `Chat.run()`, so
+    switching only needs a different import; `await arun()` lets one event loop
+    host several independent sessions. Tokens are rendered from a queue while the
+    model keeps streaming, tool calls run on the event loop with synchronous tools
+    in worker threads, and `history_callback` (sync or async) is persisted in the
+    background, one batch of records after the other.
+    """
+
+    _response_class = llm.AsyncResponse
+
+    def __init__(self, *args, **kwargs):
+        """Initialize chat session; takes the same arguments as `Chat`."""
+        super().__init__(*args, **kwargs)
+        self._console = Console()
+        self._persist_tasks = set()
+        # The latest persist task; each one waits for the one before
+        self._last_persist = None
+        # Toolboxes whose prepare_async() has run
+        self._prepared_toolboxes = set()
+        # Interactive and thread-bound tools (e.g. a browser) always run on this thread
+        self._serial_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nbllm-tools")
+
+    def _initialize_model(self):
+        """Initialize the async LLM model and conversation."""
+        try:
+            self.model = llm.get_async_model(self.model_name)
+        except Exception as e:
+            ui.print(f"[red]Error loading async model '{self.model_name}': {e}[/red]")
+            raise typer.Exit(1)
+
+        current_tools = self._get_current_tools()
+        self.conversation = self.model.conversation(tools=current_tools)
+
+    async def _chain(self, text: str):
+        """Stream a prompt and any follow-up tool-result turns, like `conversation.chain`.
+
+        Tool calls are executed by the tool scheduler on the event loop, with
+        synchronous tools in worker threads so that blocking tools (file
+        access, confirmations, subprocesses) do not stall it.
+        """
+        # AsyncConversation.prompt does not fall back to the conversation tools
+        tools = self.conversation.tools
+        response = self.conversation.prompt(text, system=self.system_prompt, tools=tools)
+        count = 0
+        last_char = ""
+        while response is not None:
+            count += 1
+            first_chunk = True
+            async for chunk in response:
+                if not chunk:
+                    continue
+                # Keep separate rounds of the chain from running into each other
+                if first_chunk and last_char and not last_char.isspace() and not chunk[0].isspace():
+                    yield " "
+                first_chunk = False
+                last_char = chunk[-1]
+                yield chunk
+            self._save_new_responses()
+
+            if not await response.tool_calls():
+                break
+            if self.conversation.chain_limit and count >= self.conversation.chain_limit:
+                raise ValueError(f"Chain limit of {self.conversation.chain_limit} exceeded.")
+            tool_results = await self._run_tool_calls(response, await response.tool_calls())
+            self._save_tool_results(tool_results)
+            attachments = [attachment for result in tool_results for attachment in result.attachments]
+            response = self.conversation.prompt(
+                tool_results=tool_results, attachments=attachments, system=self.system_prompt, tools=tools
+            )
+
+    async def _run_tool_calls(self, response, tool_calls):
+        """Execute the tool calls of an async response on the running event loop."""
+        tools = response.prompt.tools
+        toolboxes = {tool.name: self._toolbox_of(tool) for tool in tools}
+        # Prepare each toolbox once, before its first calls run concurrently
+        for toolbox in toolboxes.values():
+            if toolbox is not None and toolbox not in self._prepared_toolboxes:
+                self._prepared_toolboxes.add(toolbox)
+                await toolbox.prepare_async()
+        off_loop = [self._off_loop(tool) for tool in tools]
+
+        async def execute(call):
+            results = await response.execute_tool_calls(
+                tool_calls_list=[call],
+                tools=off_loop,
+                before_call=response.before_call,
+                after_call=response.after_call,
+            )
+            # The wrapper hides the toolbox from llm, so set it on the result here
+            return dataclasses.replace(results[0], instance=toolboxes.get(call.name))
+
+        return await self.tool_scheduler.run_calls_async(tool_calls, tools, execute)
+
+    @staticmethod
+    def _toolbox_of(tool):
+        """The toolbox a tool is a method of, or None for a plain function."""
+        instance = getattr(getattr(tool, "implementation", None), "__self__", None)
+        return instance if isinstance(instance, llm.Toolbox) else None
+
+    def _off_loop(self, tool):
+        """A copy of a tool whose implementation is a plain function, with synchronous code in a worker thread.
+
+        The copy is not a bound method, so llm does not prepare its toolbox
+        again; `_run_tool_calls` already did.
+        """
+        implementation = getattr(tool, "implementation", None)
+        if implementation is None:
+            return tool
+        if inspect.iscoroutinefunction(implementation):
+
+            @functools.wraps(implementation)
+            async def run(**arguments):
+                return await implementation(**arguments)
+
+        else:
+            executor = self._serial_executor if needs_serial_execution(tool) else None
+
+            @functools.wraps(implementation)
+            async def run(**arguments):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(executor, functools.partial(implementation, **arguments))
+
+        return dataclasses.replace(tool, implementation=run)
+
+    async def _persist(self, records, previous):
+        """Pass history records to `history_callback` once the `previous` task passed its records.
+
+        A failing callback is reported on the terminal, and later records are still passed on.
+        """
+        if previous is not None and not previous.done():
+            await asyncio.wait([previous])
+        try:
+            if inspect.iscoroutinefunction(self.history_callback):
+                await self.history_callback(records)
+            else:
+                await asyncio.to_thread(self.history_callback, records)
+        except Exception as e:
+            ui.print(f"[red]Error saving the conversation history: {e}[/red]")
+
+    def _schedule_persist(self, records):
+        """Start persisting records in the background, after the records scheduled before."""
+        if self.history_callback and records:
+            task = asyncio.create_task(self._persist(records, self._last_persist))
+            self._last_persist = task
+            self._persist_tasks.add(task)
+            task.add_done_callback(self._persist_tasks.discard)
+
+    async def _render(self, queue: asyncio.Queue, live: Live):
+        """Render chunks from the queue as they arrive."""
+        renderer = None
+        while True:
+            chunk = await queue.get()
+            if chunk is _END_OF_STREAM:
+                break
+            if renderer is None:
+                # First chunk received, clear and stop the spinner so it disappears
+                try:
+                    live.update(Text(""), refresh=True)
+                except Exception:
+                    pass
+                live.stop()
+                renderer = ui.stream_renderer(ui.LEFT_PADDING, markdown=self.markdown)
+
+            # Render everything that queued up since the last chunk in one go
+            chunks = [chunk]
+            while not queue.empty():
+                chunk = queue.get_nowait()
+                if chunk is _END_OF_STREAM:
+                    queue.put_nowait(chunk)
+                    break
+                chunks.append(chunk)
+            renderer.feed("".join(chunks))
+
+        # Finish streaming and print any remaining text
+        if renderer is not None:
+            renderer.end()
+
+    async def send(self, text: str) -> None:
+        """Send one message to the model, streaming the reply to the terminal."""
+        queue = asyncio.Queue()
+        # The history records exactly what the model is sent
+        text = self._with_mode_message(text)
+        self._schedule_persist([self._user_history_record(text)])
+
+        with Live(self._make_spinner(), console=self._console, refresh_per_second=10, transient=True) as live:
+            renderer = asyncio.create_task(self._render(queue, live))
+            try:
+                async for chunk in self._chain(text):
+                    queue.put_nowait(chunk)
+            finally:
+                queue.put_nowait(_END_OF_STREAM)
+                await renderer
+
+        if self.history_callback:
+            self._schedule_persist(await self._response_history_records_async())
+
+    async def _response_history_records_async(self) -> list:
+        """Build history records for the responses added since the last call."""
+        # The text of an async response has to be awaited
+        return [response_record(response, await response.text()) for response in self._new_responses()]
+
+    async def arun(self):
+        """Main chat loop as a coroutine."""
+        # Initialize user slash commands
+        user_commands = self.slash_commands.copy()
+
+        self._start_session()
+
+        try:
+            while True:
+                self._show_completion_hint()
+
+                out = (await ui.input_async(self._prompt_text, **self._get_input_options(user_commands))).strip()
+
+                out = await asyncio.to_thread(self._handle_input, out, user_commands)
+                if out == COMMAND_QUIT:
+                    break
+                elif out == COMMAND_HANDLED:
+                    continue
+
+                await self.send(out)
+                ui.print("")  # Add extra newline after bot response
+        except (KeyboardInterrupt, asyncio.CancelledError) as e:
+            # Under asyncio.run, Ctrl+C while streaming cancels this task instead
+            ui.print("")  # Add newlines
+            ui.print("[cyan]Thanks for using nbllm. Goodbye![/cyan]")
+            ui.print("")  # Add final newline
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            # Let pending history writes finish before returning
+            if self._persist_tasks:
+                await asyncio.gather(*self._persist_tasks)
+            self._end_session()
+
+    def run(self):
+        """Main chat loop (blocking), a drop-in replacement for `Chat.run`."""
+        try:
+            asyncio.run(self.arun())
+        except KeyboardInterrupt:
+            # Raised by asyncio.run after Ctrl+C cancelled `arun`, which said goodbye
+            pass
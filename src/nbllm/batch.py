@@ -0,0 +1,200 @@
+"""Headless batch runner: answer a JSONL file of prompts without the REPL."""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+import json
+import threading
+import time
+
+from . import ui
+from .__main__ import Chat
+from . import tools
+from .tools.command import GitTool, NpmTool, PythonTool, run_command
+
+
+# Tool set names usable in batch files, mapped to factories creating fresh tools
+# (tools are looked up on use, so unused ones are never imported)
+TOOL_FACTORIES: Dict[str, Callable] = {
+    "filesystem": lambda: tools.FileSystem(),
+    "todo": lambda: tools.TodoTools(),
+    "web": lambda: tools.WebFetchTool(),
+    "browser": lambda: tools.PlaywrightTool(headless=True),
+    "git": GitTool,
+    "npm": NpmTool,
+    "python": PythonTool,
+    "command": lambda: run_command,
+}
+
+
+def make_tools(names: List[str]) -> list:
+    """Create fresh tool instances for a list of tool set names."""
+    unknown = [name for name in names if name not in TOOL_FACTORIES]
+    if unknown:
+        raise ValueError(f"Unknown tools: {', '.join(unknown)} (available: {', '.join(TOOL_FACTORIES)})")
+    return [TOOL_FACTORIES[name]() for name in names]
+
+
+def _completed_ids(output_path: Path) -> set:
+    """Return the ids already answered in an existing output file.
+
+    A trailing partial line left behind by a crash is cut off so that new
+    results are appended on a fresh line.
+    """
+    if not output_path.exists():
+        return set()
+
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+
+    done = set()
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("error") is None:
+            done.add(record["id"])
+    return done
+
+
+def _parse_record(line: str) -> dict:
+    """Parse one input line into a batch record, raising ValueError if it is not one."""
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError(f"expected an object, got {type(record).__name__}")
+    if not isinstance(record.get("prompt"), str):
+        raise ValueError('"prompt" must be a string')
+    if not isinstance(record.get("id", ""), (str, int)):
+        raise ValueError('"id" must be a string or a number')
+    return record
+
+
+def run_prompt(record: dict, model_name: str, system_prompt: Optional[str] = None,
+               default_tools: Optional[List[str]] = None, modes: Optional[dict] = None,
+               mode_switch_messages: Optional[dict] = None) -> dict:
+    """Run one batch record as an independent conversation and return its result.
+
+    Args:
+        record: Batch record with "prompt" and optional "id", "mode", "system" and "tools"
+        model_name: LLM model to use
+        system_prompt: Default system prompt when the record has none
+        default_tools: Default tool set names when the record has none
+        modes: Dict of {mode: [tool set names]} for records that select a mode
+        mode_switch_messages: Dict of {mode: message} prefixed to the prompt of that mode
+    """
+    mode = record.get("mode")
+    if mode is not None:
+        if not modes or mode not in modes:
+            raise ValueError(f"Unknown mode: {mode}")
+        tool_names = record.get("tools", modes[mode])
+    else:
+        tool_names = record.get("tools", default_tools or [])
+
+    chat = Chat(
+        model_name=model_name,
+        system_prompt=record.get("system", system_prompt),
+        tools=make_tools(tool_names),
+        show_banner=False,
+    )
+    prompt = record["prompt"]
+    if mode is not None and mode_switch_messages and mode in mode_switch_messages:
+        prompt = f"{mode_switch_messages[mode]}\n\n{prompt}"
+
+    text = "".join(chat._chain(prompt))
+    responses = chat.conversation.responses
+    return {
+        "response": text,
+        "tool_calls": [
+            {"name": call.name, "arguments": call.arguments}
+            for response in responses
+            for call in response.tool_calls()
+        ],
+        "turns": len(responses),
+    }
+
+
+def run_batch(
+    input_path: Union[str, Path],
+    output_path: Union[str, Path],
+    model_name: str = "anthropic/claude-3-5-sonnet-20240620",
+    system_prompt: Optional[str] = None,
+    default_tools: Optional[List[str]] = None,
+    modes: Optional[dict] = None,
+    mode_switch_messages: Optional[dict] = None,
+    workers: int = 4,
+    confirm_policy: Union[bool, Callable[[str], bool]] = False,
+    resume: bool = True,
+    verbose: bool = False,
+) -> dict:
+    """Answer every prompt in a JSONL file and stream the results to a JSONL file.
+
+    Each input line is an object with a "prompt" and optional "id", "mode",
+    "system" and "tools" (a list of tool set names from `TOOL_FACTORIES`). Prompts
+    run as independent conversations on a pool of `workers` threads; results are
+    appended to `output_path` as they finish. With `resume`, prompts whose id
+    already has a successful result in `output_path` are skipped, so a crashed
+    run can simply be restarted. A line that is not a valid record gets an
+    error result, and the other prompts still run.
+
+    Tools that ask for confirmation get their answer from `confirm_policy`
+    instead of the terminal. Returns counts of completed, failed and skipped prompts.
+    """
+    input_path = Path(input_path)
+    output_path = Path(output_path)
+
+    done = _completed_ids(output_path) if resume else set()
+    if not resume and output_path.exists():
+        output_path.unlink()
+
+    # (record, error) pairs; invalid lines keep their error and are not run
+    records = []
+    skipped = 0
+    with open(input_path, encoding="utf-8") as f:
+        lines = [(number, line) for number, line in enumerate(f, 1) if line.strip()]
+    for index, (number, line) in enumerate(lines):
+        try:
+            record, error = _parse_record(line), None
+        except ValueError as e:
+            record, error = {}, f"{type(e).__name__}: line {number}: {e}"
+        record.setdefault("id", f"prompt-{index}")
+        if record["id"] in done:
+            skipped += 1
+        else:
+            records.append((record, error))
+
+    stats = {"completed": 0, "failed": 0, "skipped": skipped}
+    lock = threading.Lock()
+
+    def work(item):
+        record, error = item
+        start = time.perf_counter()
+        result = {"id": record["id"], "prompt": record.get("prompt"), "mode": record.get("mode"), "model": model_name}
+        if error is None:
+            try:
+                result.update(run_prompt(record, model_name, system_prompt, default_tools, modes, mode_switch_messages))
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+        result["error"] = error
+        result["duration"] = round(time.perf_counter() - start, 3)
+
+        line = json.dumps(result, ensure_ascii=False, default=str)
+        with lock:
+            out.write(line + "\n")
+            out.flush()
+            stats["failed" if result["error"] else "completed"] += 1
+
+    ui.set_confirm_policy(confirm_policy)
+    ui.set_quiet(not verbose)
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                # Consume the iterator so worker exceptions surface here
+                list(pool.map(work, records))
+    finally:
+        ui.set_confirm_policy(None)
+        ui.set_quiet(False)
+    return stats
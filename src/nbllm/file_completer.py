@@ -1,18 +1,33 @@
 """File path completion for @ references in nbllm."""
 
-import os
 from pathlib import Path
-from typing import Iterable, List
+from typing import AsyncGenerator, Iterable, List, Optional
+import itertools
+import time
 
-from prompt_toolkit.completion import Completer, Completion
+from prompt_toolkit.completion import Completer, Completion, ThreadedCompleter
 from prompt_toolkit.document import Document
 
+from .file_index import FileIndex
+
 
 class FilePathCompleter(Completer):
-    """Completer for file paths after @ symbol."""
+    """Completer for file paths after @ symbol.
+
+    The text after @ is matched fuzzily against every file of the tree, so
+    `@chatcls` finds `tests/test_chat_class.py`. Files come from a
+    `FileIndex` that is kept up to date in the background. Each search gets
+    `time_budget` seconds and stops as soon as a newer one starts.
+    """
     
-    def __init__(self, base_path: str = "."):
+    def __init__(self, base_path: str = ".", index: Optional[FileIndex] = None,
+                 time_budget: float = 0.05, limit: int = 50):
         self.base_path = Path(base_path).resolve()
+        self.index = index if index is not None else FileIndex(self.base_path)
+        self.time_budget = time_budget
+        self.limit = limit
+        self._searches = itertools.count()
+        self._current_search = -1
     
     def get_completions(self, document: Document, complete_event) -> Iterable[Completion]:
         """Generate file path completions after @ symbol."""
@@ -27,86 +42,22 @@ class FilePathCompleter(Completer):
         path_part = text[at_pos + 1:]
         
         # If there's a space after @, we're not completing a path anymore
-        if ' ' in path_part and not path_part.endswith(' '):
+        if ' ' in path_part:
             return
         
-        # Remove any trailing space
-        path_part = path_part.rstrip()
-        
-        try:
-            # Resolve the path relative to base_path
-            if path_part:
-                search_path = self.base_path / path_part
-                if search_path.is_file():
-                    # If it's already a complete file, no more completions
-                    return
-                elif search_path.is_dir():
-                    # Complete contents of directory
-                    search_dir = search_path
-                    prefix = path_part + "/"
-                else:
-                    # Partial path - complete from parent directory
-                    search_dir = search_path.parent
-                    prefix = str(search_path.parent.relative_to(self.base_path))
-                    if prefix != ".":
-                        prefix += "/"
-                    else:
-                        prefix = ""
-            else:
-                # Just @ - complete from base directory
-                search_dir = self.base_path
-                prefix = ""
-            
-            if not search_dir.exists():
-                return
-            
-            # Get all files and directories in the search directory
-            items = []
-            try:
-                for item in search_dir.iterdir():
-                    if item.name.startswith('.'):
-                        continue  # Skip hidden files
-                    
-                    relative_path = item.relative_to(self.base_path)
-                    completion_text = str(relative_path)
-                    
-                    # Only include items that start with our current path part
-                    if path_part and not completion_text.startswith(path_part):
-                        continue
-                    
-                    # Calculate what to insert (the part after what's already typed)
-                    if path_part:
-                        insert_text = completion_text[len(path_part):]
-                    else:
-                        insert_text = completion_text
-                    
-                    # Add / for directories
-                    display_text = completion_text
-                    if item.is_dir():
-                        display_text += "/"
-                        if not insert_text.endswith("/"):
-                            insert_text += "/"
-                    
-                    items.append((insert_text, display_text))
-                
-                # Sort items (directories first, then files)
-                items.sort(key=lambda x: (not x[1].endswith("/"), x[1].lower()))
-                
-                # Yield completions
-                for insert_text, display_text in items:
-                    yield Completion(
-                        text=insert_text,
-                        display=display_text,
-                        start_position=0
-                    )
-                    
-            except PermissionError:
-                # Skip directories we can't read
-                pass
-                
-        except (OSError, ValueError):
-            # Handle invalid paths gracefully
-            pass
+        # A newer search makes this one stop early
+        search = next(self._searches)
+        self._current_search = search
+        deadline = time.perf_counter() + self.time_budget
+        paths = self.index.start().search(
+            path_part, self.limit, deadline, cancelled=lambda: self._current_search != search
+        )
+        for path in paths:
+            yield Completion(
+                text=path,
+                display=path,
+                start_position=-len(path_part)
+            )
 
 
 class CombinedCompleter(Completer):
@@ -115,6 +66,9 @@ class CombinedCompleter(Completer):
     def __init__(self, commands: List[str], base_path: str = "."):
         self.commands = commands
         self.file_completer = FilePathCompleter(base_path)
+        self._threaded_file_completer = ThreadedCompleter(self.file_completer)
+        # Index the files while the user is still typing the first words
+        self.file_completer.index.start()
     
     def get_completions(self, document: Document, complete_event) -> Iterable[Completion]:
         """Generate completions for commands or file paths."""
@@ -136,8 +90,17 @@ class CombinedCompleter(Completer):
                             display=command,
                             start_position=0
                         )
+    
+    async def get_completions_async(self, document: Document, complete_event) -> AsyncGenerator[Completion, None]:
+        """Search file paths in a thread, so typing is never blocked by a search."""
+        if '@' in document.text_before_cursor:
+            async for completion in self._threaded_file_completer.get_completions_async(document, complete_event):
+                yield completion
+        else:
+            for completion in self.get_completions(document, complete_event):
+                yield completion
 
 
 def create_completer(commands: List[str], base_path: str = "."):
     """Create a combined completer for commands and file paths."""
-    return CombinedCompleter(commands, base_path)
\ No newline at end of file
+    return CombinedCompleter(commands, base_path)
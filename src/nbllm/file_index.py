@@ -0,0 +1,302 @@
+"""Index of the files in a directory tree, for fuzzy `@` completion."""
+
+from bisect import bisect_right
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+import heapq
+import os
+import threading
+import time
+
+from .fuzzy import search_text, subsequence_pattern
+from .gitignore import GitIgnore
+
+
+# Separates paths in the text searched by `FileIndex.search`
+_SEPARATOR = "\n"
+
+# Characters after which a path segment or word starts
+_BOUNDARIES = frozenset("/\\_-. ")
+
+# Number of candidates scored between two checks of the deadline
+_CHECK_EVERY = 64
+
+# Characters of the search text scanned by one regex call
+_CHUNK = 1 << 18
+
+
+class _Directory(NamedTuple):
+    """A scanned directory: its mtime, the mtime of its `.gitignore` and the names it holds."""
+
+    mtime: int
+    ignore_mtime: Optional[int]
+    files: Tuple[str, ...]
+    subdirs: Tuple[str, ...]
+
+
+def _is_boundary(path: str, position: int) -> bool:
+    """Whether a segment or word of `path` starts at `position`."""
+    return position == 0 or path[position - 1] in _BOUNDARIES or (
+        path[position].isupper() and path[position - 1].islower()
+    )
+
+
+def _score(query: str, path: str) -> int:
+    """Score how well `path` matches the lowercase `query`; higher is better.
+
+    Each character of the query continues the previous match if it can,
+    else takes the first occurrence starting a segment or word, else the
+    first occurrence, always leaving room for the rest of the query.
+    Matches at the start of a segment or word, runs of consecutive
+    characters and matches in the file name score extra.
+    """
+    lowered = path.lower()
+    # Last position of each character that still leaves room for the rest
+    latest = [0] * len(query)
+    end = len(lowered)
+    for k in range(len(query) - 1, -1, -1):
+        end = lowered.rfind(query[k], 0, end)
+        if end < 0:
+            return -1
+        latest[k] = end
+    name_start = path.rfind("/") + 1
+    score = 0
+    previous = -1
+    for k, char in enumerate(query):
+        if lowered.startswith(char, previous + 1):
+            position = previous + 1
+        else:
+            position = candidate = lowered.find(char, previous + 1, latest[k] + 1)
+            while candidate != -1 and not _is_boundary(path, candidate):
+                candidate = lowered.find(char, candidate + 1, latest[k] + 1)
+            if candidate != -1:
+                position = candidate
+        score += 1
+        if _is_boundary(path, position):
+            score += 8
+        if k and position == previous + 1:
+            score += 4
+        if position >= name_start:
+            score += 2
+        previous = position
+    return score
+
+
+class FileIndex:
+    """Relative paths of the files below a directory, for fuzzy completion.
+
+    A background thread lists the tree with `os.scandir`, leaving out what
+    `.gitignore` files exclude. A search wakes it to list the tree again if
+    the last listing is more than `refresh_interval` seconds old, so an idle
+    index does no work. A refresh only reads the directories whose mtime, or
+    the mtime of their `.gitignore`, changed; the others keep their entries.
+
+    Args:
+        root: Directory to index
+        refresh_interval: Minimum seconds between two refreshes
+        include_hidden: Whether to index files and directories starting with "."
+        max_files: Stop listing the tree after this many files
+    """
+
+    def __init__(self, root: Union[str, Path] = ".", refresh_interval: float = 2.0,
+                 include_hidden: bool = False, max_files: int = 200_000):
+        self.root = Path(root)
+        self.refresh_interval = refresh_interval
+        self.include_hidden = include_hidden
+        self.max_files = max_files
+        self.truncated = False
+        self._ignore = GitIgnore(self.root)
+        self._directories: Dict[str, _Directory] = {}
+        # Paths shallowest first, their lowercase search text and where each path starts in it
+        self._snapshot: Tuple[List[str], str, List[int]] = ([], "", [])
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at: Optional[float] = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._wanted = threading.Event()
+        self._thread = None
+
+    def __len__(self) -> int:
+        return len(self._snapshot[0])
+
+    @property
+    def paths(self) -> List[str]:
+        """All indexed paths, shallowest first."""
+        return list(self._snapshot[0])
+
+    @property
+    def ready(self) -> bool:
+        """Whether the tree has been listed at least once."""
+        return self._ready.is_set()
+
+    def start(self) -> "FileIndex":
+        """Start listing the tree in a background thread, if not started yet."""
+        if self._thread is None:
+            self._stop.clear()
+            self._wanted.clear()
+            self._thread = threading.Thread(target=self._run, name="nbllm-file-index", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        self._wanted.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the tree has been listed once; return whether it has."""
+        return self._ready.wait(timeout)
+
+    def refresh(self) -> bool:
+        """List the directories that changed since the last refresh.
+
+        Returns:
+            Whether any path was added or removed
+        """
+        with self._refresh_lock:
+            self._refreshed_at = time.monotonic()
+            changed = self._refresh()
+            self._ready.set()
+            return changed
+
+    def search(self, query: str, limit: int = 50, deadline: Optional[float] = None,
+               cancelled: Optional[Callable[[], bool]] = None) -> List[str]:
+        """Return the paths fuzzily matching `query`, best first.
+
+        A path matches if it contains the characters of `query` in order,
+        ignoring case. The regex engine finds the matching paths in one
+        string holding all of them; only those are scored. Paths are visited
+        shallowest first, and the search stops early with the best paths
+        found so far once `deadline` (a `time.perf_counter` value) passes or
+        `cancelled` returns True.
+
+        Args:
+            query: Characters to look for
+            limit: Maximum number of paths to return
+            deadline: Time by which to return
+            cancelled: Called now and then; return True to stop searching
+        """
+        if not self.ready and deadline is not None:
+            self.wait(max(0.0, deadline - time.perf_counter()))
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            # This search uses the current listing; the next one sees the changes
+            self._wanted.set()
+        paths, haystack, starts = self._snapshot
+        if not query:
+            return paths[:limit]
+        query = query.lower()
+        pattern = subsequence_pattern(query, _SEPARATOR)
+        best = []  # Heap of (score, -length, -order, path), worst first
+        position = 0
+        visited = 0
+        size = len(haystack)
+        while position < size:
+            # Search a chunk at a time, so the deadline is checked even when
+            # nothing matches; chunks end between two paths
+            chunk_end = haystack.find(_SEPARATOR, min(position + _CHUNK, size))
+            if chunk_end == -1:
+                chunk_end = size
+            match = pattern.search(haystack, position, chunk_end)
+            if match is None:
+                position = chunk_end + 1
+                visited += _CHECK_EVERY
+            else:
+                entry = bisect_right(starts, match.start()) - 1
+                path = paths[entry]
+                item = (_score(query, path), -len(path), -entry, path)
+                if len(best) < limit:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+                # Continue after the path that matched, so it is scored once
+                position = starts[entry] + len(path) + 1
+                visited += 1
+            if visited >= _CHECK_EVERY:
+                visited = 0
+                if (deadline is not None and time.perf_counter() > deadline) or (
+                    cancelled is not None and cancelled()
+                ):
+                    break
+        return [item[-1] for item in sorted(best, reverse=True)]
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except OSError:
+                self._ready.set()
+            self._wanted.wait()
+            self._wanted.clear()
+
+    def _refresh(self) -> bool:
+        directories = {}
+        changed = False
+        files = 0
+        self.truncated = False
+        # (directory, whether an ignore file above it changed)
+        stack = [("", False)]
+        while stack:
+            directory, ignore_changed = stack.pop()
+            full = os.path.join(self.root, directory)
+            try:
+                mtime = os.stat(full).st_mtime_ns
+            except OSError:
+                changed = True
+                continue
+            try:
+                ignore_mtime = os.stat(os.path.join(full, ".gitignore")).st_mtime_ns
+            except OSError:
+                ignore_mtime = None
+            known = self._directories.get(directory)
+            if known is not None and known.ignore_mtime != ignore_mtime:
+                ignore_changed = True
+            if ignore_changed:
+                self._ignore.invalidate(directory)
+            if known is None or ignore_changed or known.mtime != mtime:
+                known = self._scan(directory, full, mtime, ignore_mtime)
+                changed = True
+            directories[directory] = known
+            files += len(known.files)
+            if files >= self.max_files:
+                self.truncated = True
+                break
+            prefix = directory + "/" if directory else ""
+            stack.extend((prefix + name, ignore_changed) for name in reversed(known.subdirs))
+        if changed or directories.keys() != self._directories.keys():
+            self._directories = directories
+            self._publish()
+            return True
+        return False
+
+    def _scan(self, directory: str, full: str, mtime: int, ignore_mtime: Optional[int]) -> _Directory:
+        files, subdirs = [], []
+        prefix = directory + "/" if directory else ""
+        try:
+            with os.scandir(full) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if not self.include_hidden and name.startswith("."):
+                        continue
+                    try:
+                        # Symlinked directories are not followed, to avoid cycles
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if self._ignore.ignored(prefix + name, is_dir):
+                        continue
+                    (subdirs if is_dir else files).append(name)
+        except OSError:
+            pass
+        return _Directory(mtime, ignore_mtime, tuple(sorted(files)), tuple(sorted(subdirs)))
+
+    def _publish(self) -> None:
+        """Build the search text from the listed directories and swap it in."""
+        paths = []
+        for directory, listing in self._directories.items():
+            prefix = directory + "/" if directory else ""
+            paths.extend(prefix + name for name in listing.files)
+        paths.sort(key=lambda path: (path.count("/"), path))
+        self._snapshot = (paths, *search_text(paths, _SEPARATOR))
@@ -0,0 +1,39 @@
+"""Fuzzy matching of a query against many texts joined into one search text."""
+
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+import re
+
+
+@lru_cache(maxsize=64)
+def subsequence_pattern(query: str, separator: str) -> "re.Pattern":
+    """Regex finding the characters of `query` in order within one text.
+
+    Args:
+        query: Characters to look for
+        separator: Character between two texts, which a match never spans
+    """
+    # Skip to the first occurrence of the next wanted character, which leaves
+    # the most room for the rest of the query; the skipped run cannot hold
+    # that character, so backtracking into it fails at once
+    return re.compile(re.escape(query[0]) + "".join(
+        f"[^{re.escape(char)}{re.escape(separator)}]*{re.escape(char)}" for char in query[1:]
+    ))
+
+
+def search_text(texts: Sequence[str], separator: str) -> Tuple[str, List[int]]:
+    """Join the lowercase forms of `texts`, and list where each of them starts.
+
+    Args:
+        texts: Texts to search
+        separator: Character to put between two texts
+    """
+    # Keep texts whose lowercase form has another length as they are,
+    # so positions in the search text map back to texts
+    lowered = [text.lower() if len(text.lower()) == len(text) else text for text in texts]
+    starts = []
+    position = 0
+    for text in texts:
+        starts.append(position)
+        position += len(text) + 1
+    return separator.join(lowered), starts
@@ -0,0 +1,257 @@
+"""Matching of paths against `.gitignore` files."""
+
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import os
+import re
+
+
+# Ignored in every tree, on top of its ignore files
+DEFAULT_PATTERNS = (".git/",)
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob to a regular expression for `fullmatch`."""
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i) and i + 2 == n and (i == 0 or pattern[i - 1] == "/"):
+            parts.append(".*")
+            i += 2
+        elif char == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif char == "?":
+            parts.append("[^/]")
+            i += 1
+        elif char == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                parts.append(re.escape(char))
+                i += 1
+                continue
+            body = pattern[i + 1:end]
+            if body[0] in "!^":
+                body = "^" + body[1:]
+            parts.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end + 1
+        elif char == "\\" and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(char))
+            i += 1
+    return "".join(parts)
+
+
+def _parse(line: str) -> Optional[Tuple[bool, bool, str]]:
+    """Parse one line of an ignore file into (negated, directories only, regex)."""
+    line = line.rstrip("\n\r")
+    # Trailing spaces are dropped unless escaped
+    stripped = line.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(line):
+        stripped += " "
+    line = stripped
+    if not line or line.startswith("#"):
+        return None
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:]
+    directories_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    return negated, directories_only, _glob_to_regex(line)
+
+
+def _glob_to_regex(pattern: str) -> str:
+    # A slash anywhere but at the end anchors the pattern to the base directory
+    regex = _translate(pattern.lstrip("/"))
+    return regex if "/" in pattern else "(?:.*/)?" + regex
+
+
+def glob_regex(pattern: str) -> "re.Pattern":
+    """Compile a glob for `fullmatch` against relative paths, with the rules of `.gitignore`.
+
+    `*` and `?` stay within one directory and `**` spans any number of them.
+    A pattern without "/" matches names at any depth (`*.py`); one with "/"
+    matches from the root (`src/**/*.py`).
+    """
+    return re.compile(_glob_to_regex(pattern.rstrip("/")))
+
+
+class IgnoreRules:
+    """The patterns of one ignore file, for paths below the directory holding it.
+
+    Consecutive patterns of the same kind are combined into one regex, and
+    the groups are tried from the last to the first, since later patterns
+    override earlier ones.
+
+    Args:
+        lines: Lines of the ignore file
+        base: Directory of the ignore file relative to the tree root ("" for the root)
+    """
+
+    __slots__ = ("base", "_groups")
+
+    def __init__(self, lines: Iterable[str], base: str = ""):
+        self.base = base + "/" if base else ""
+        groups: List[Tuple[bool, bool, List[str]]] = []
+        for line in lines:
+            parsed = _parse(line)
+            if parsed is None:
+                continue
+            negated, directories_only, regex = parsed
+            if groups and groups[-1][:2] == (negated, directories_only):
+                groups[-1][2].append(regex)
+            else:
+                groups.append((negated, directories_only, [regex]))
+        self._groups = [
+            (negated, directories_only, re.compile("|".join(regexes)))
+            for negated, directories_only, regexes in reversed(groups)
+        ]
+
+    def __bool__(self) -> bool:
+        return bool(self._groups)
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], base: str = "") -> "IgnoreRules":
+        """Read an ignore file; a missing or unreadable file has no patterns."""
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                return cls(f, base)
+        except OSError:
+            return cls((), base)
+
+    def match(self, path: str, is_dir: bool = False) -> Optional[bool]:
+        """Return True if `path` is ignored, False if re-included by a `!` pattern, None if no pattern matches.
+
+        Args:
+            path: Path relative to the tree root, with "/" separators, below `base`
+            is_dir: Whether the path is a directory
+        """
+        relative = path[len(self.base):]
+        for negated, directories_only, regex in self._groups:
+            if directories_only and not is_dir:
+                continue
+            if regex.fullmatch(relative):
+                return not negated
+        return None
+
+
+class GitIgnore:
+    """Ignore rules of a directory tree.
+
+    Reads `.gitignore` in every directory, `.git/info/exclude` and a list of
+    extra patterns, following git: the deepest matching pattern wins, and
+    nothing below an ignored directory is included again. Rules are read
+    once per directory and cached until `invalidate` is called.
+
+    Args:
+        root: Root of the tree
+        patterns: Extra patterns, applied before all ignore files
+    """
+
+    def __init__(self, root: Union[str, Path] = ".", patterns: Iterable[str] = DEFAULT_PATTERNS):
+        self.root = Path(root)
+        base = [IgnoreRules(patterns), IgnoreRules.from_file(self.root / ".git" / "info" / "exclude")]
+        self._base_rules = tuple(rules for rules in base if rules)
+        self._rules: Dict[str, Tuple[IgnoreRules, ...]] = {}
+
+    def rules(self, directory: str = "") -> Tuple[IgnoreRules, ...]:
+        """Return the rules that apply to entries of `directory`, outermost first."""
+        cached = self._rules.get(directory)
+        if cached is not None:
+            return cached
+        if directory:
+            parent = directory.rpartition("/")[0]
+            inherited = self.rules(parent)
+        else:
+            inherited = self._base_rules
+        own = IgnoreRules.from_file(os.path.join(self.root, directory, ".gitignore"), directory)
+        rules = inherited + (own,) if own else inherited
+        self._rules[directory] = rules
+        return rules
+
+    def ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Whether `path` is ignored, given that its parent directory is not.
+
+        This is the check to use while walking the tree top-down and not
+        descending into ignored directories.
+
+        Args:
+            path: Path relative to the root, with "/" separators
+            is_dir: Whether the path is a directory
+        """
+        for rules in reversed(self.rules(path.rpartition("/")[0])):
+            result = rules.match(path, is_dir)
+            if result is not None:
+                return result
+        return False
+
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Whether `path` or one of its parent directories is ignored."""
+        parts = path.split("/")
+        for depth in range(1, len(parts)):
+            if self.ignored("/".join(parts[:depth]), True):
+                return True
+        return self.ignored(path, is_dir)
+
+    def invalidate(self, directory: Optional[str] = None) -> None:
+        """Forget the cached rules of `directory` and below it, or of all directories."""
+        if directory is None:
+            self._rules.clear()
+            return
+        prefix = directory + "/" if directory else ""
+        for cached in [d for d in self._rules if d == directory or d.startswith(prefix)]:
+            del self._rules[cached]
+
+
+def walk(root: Union[str, Path], ignore: Optional[GitIgnore] = None, include_hidden: bool = False,
+         start: str = "") -> Iterator[Tuple[str, List[os.DirEntry], List[os.DirEntry]]]:
+    """Walk a tree top-down with `os.scandir`, leaving out ignored entries.
+
+    Like `os.walk`, yields (directory, subdirectories, files) for every
+    directory; here the directory is relative to `root` with "/" separators
+    ("" for the root) and the others are `os.DirEntry` lists sorted by name,
+    whose cached stat data saves a system call per entry. Remove entries
+    from the subdirectory list to skip them. Symlinked directories are
+    listed as files and not followed.
+
+    Args:
+        root: Root of the tree
+        ignore: Ignore rules (default: those of the tree)
+        include_hidden: Whether to include entries starting with "."
+        start: Directory below `root` to walk, relative to it
+    """
+    if ignore is None:
+        ignore = GitIgnore(root)
+    stack = [start.strip("/")]
+    while stack:
+        directory = stack.pop()
+        prefix = directory + "/" if directory else ""
+        subdirectories, files = [], []
+        try:
+            with os.scandir(os.path.join(root, directory)) as entries:
+                for entry in entries:
+                    if not include_hidden and entry.name.startswith("."):
+                        continue
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if ignore.ignored(prefix + entry.name, is_dir):
+                        continue
+                    (subdirectories if is_dir else files).append(entry)
+        except OSError:
+            continue
+        subdirectories.sort(key=lambda entry: entry.name)
+        files.sort(key=lambda entry: entry.name)
+        yield directory, subdirectories, files
+        stack.extend(prefix + entry.name for entry in reversed(subdirectories))
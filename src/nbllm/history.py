@@ -0,0 +1,282 @@
+"""Prompt history kept on disk, with a prefix index for auto-suggestions."""
+
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+import json
+import os
+import threading
+
+from prompt_toolkit.auto_suggest import AutoSuggest, Suggestion
+from prompt_toolkit.completion import Completer, Completion
+from prompt_toolkit.history import History
+
+from .fuzzy import search_text, subsequence_pattern
+
+
+# History shared by all nbllm apps
+SHARED_PATH = Path.home() / ".nbllm" / "history.jsonl"
+
+# Sorts after every character that can follow a prefix
+_MAX_CHAR = "\U0010ffff"
+
+# Separates entries in the text searched by `PromptHistory.search`
+_SEPARATOR = "\0"
+
+
+class _PrefixIndex:
+    """Distinct entries sorted by text, to find the newest one with a prefix.
+
+    The recency of each entry is kept next to it, plus the highest recency of
+    every block of `BLOCK` entries. A lookup bisects to the range of entries
+    with the prefix and takes the maximum over at most two partial blocks and
+    the block maxima in between.
+    """
+
+    BLOCK = 128
+
+    __slots__ = ("_texts", "_seqs", "_block_max")
+
+    def __init__(self, entries: Iterable = ()):
+        pairs = sorted(entries)
+        self._texts = [text for text, _ in pairs]
+        self._seqs = [seq for _, seq in pairs]
+        self._block_max = None
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def set(self, text: str, seq: int) -> None:
+        """Add an entry or update its recency."""
+        i = bisect_left(self._texts, text)
+        if i < len(self._texts) and self._texts[i] == text:
+            self._seqs[i] = seq
+        else:
+            self._texts.insert(i, text)
+            self._seqs.insert(i, seq)
+        self._block_max = None
+
+    def remove(self, text: str) -> None:
+        i = bisect_left(self._texts, text)
+        if i < len(self._texts) and self._texts[i] == text:
+            del self._texts[i]
+            del self._seqs[i]
+            self._block_max = None
+
+    def newest(self, prefix: str) -> Optional[int]:
+        """Return the highest recency among entries starting with `prefix`, or None."""
+        texts, seqs, block = self._texts, self._seqs, self.BLOCK
+        lo = bisect_left(texts, prefix)
+        hi = bisect_left(texts, prefix + _MAX_CHAR, lo)
+        if lo == hi:
+            return None
+        # Blocks lying completely inside the range
+        first, last = -(-lo // block), hi // block
+        if first >= last:
+            return max(seqs[lo:hi])
+        if self._block_max is None:
+            self._block_max = [max(seqs[i:i + block]) for i in range(0, len(seqs), block)]
+        best = max(self._block_max[first:last])
+        if lo < first * block:
+            best = max(best, max(seqs[lo:first * block]))
+        if last * block < hi:
+            best = max(best, max(seqs[last * block:hi]))
+        return best
+
+
+class PromptHistory(History):
+    """Prompt history stored as one JSON string per line, oldest first.
+
+    A repeated prompt moves to the front instead of being stored twice, and
+    only the newest `max_entries` distinct prompts are kept. The file is
+    appended to and rewritten once it holds twice as many lines. Entries are
+    loaded on first use.
+
+    Args:
+        path: File to keep the history in (None keeps it in memory only)
+        max_entries: Number of distinct prompts to keep
+    """
+
+    def __init__(self, path: Union[str, Path, None] = None, max_entries: int = 10_000):
+        super().__init__()
+        self.path = Path(path).expanduser() if path is not None else None
+        self.max_entries = max_entries
+        self._entries = {}       # Text -> recency, oldest first
+        self._by_seq = {}        # Recency -> text
+        self._seq = 0
+        self._index = _PrefixIndex()
+        self._haystack = None    # Entries newest first and their search text, for `search`
+        self._lines_on_disk = 0
+        self._lock = threading.RLock()
+        self._entries_loaded = False
+
+    @classmethod
+    def shared(cls, max_entries: int = 10_000) -> "PromptHistory":
+        """History shared by all nbllm apps of the current user."""
+        return cls(SHARED_PATH, max_entries)
+
+    @classmethod
+    def for_project(cls, root: Union[str, Path] = ".", max_entries: int = 10_000) -> "PromptHistory":
+        """History kept in the `.nbllm` folder of a project."""
+        return cls(Path(root) / ".nbllm" / "history.jsonl", max_entries)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._entries)
+
+    async def load(self):
+        """Yield all entries, newest first (called by prompt_toolkit before each prompt)."""
+        for item in self.load_history_strings():
+            yield item
+
+    def get_strings(self) -> List[str]:
+        """Return all entries, oldest first."""
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._entries)
+
+    def load_history_strings(self) -> List[str]:
+        with self._lock:
+            self._ensure_loaded()
+            return list(reversed(self._entries))
+
+    def append_string(self, string: str) -> None:
+        """Add a prompt as the newest entry."""
+        with self._lock:
+            self._ensure_loaded()
+            self._add(string)
+            self._trim()
+            self._index.set(string, self._entries[string])
+            self.store_string(string)
+
+    def store_string(self, string: str) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(string, ensure_ascii=False) + "\n")
+        self._lines_on_disk += 1
+        if self._lines_on_disk > 2 * self.max_entries:
+            self._compact()
+
+    def suggest(self, prefix: str) -> Optional[str]:
+        """Return the newest entry starting with `prefix`, or None."""
+        with self._lock:
+            self._ensure_loaded()
+            seq = self._index.newest(prefix)
+            return self._by_seq[seq] if seq is not None else None
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """Return entries containing the characters of `query` in order, newest first.
+
+        Matching ignores case. All entries are searched as one lowercased
+        string, so a search of the whole history runs in the regex engine.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if self._haystack is None:
+                newest_first = list(reversed(self._entries))
+                self._haystack = (newest_first, *search_text(newest_first, _SEPARATOR))
+            entries, haystack, starts = self._haystack
+
+        if not query:
+            return entries[:limit]
+        pattern = subsequence_pattern(query.lower(), _SEPARATOR)
+        results = []
+        position = 0
+        while len(results) < limit:
+            match = pattern.search(haystack, position)
+            if match is None:
+                break
+            # Continue after the entry that matched, so it is listed once
+            entry = bisect_right(starts, match.start()) - 1
+            results.append(entries[entry])
+            position = starts[entry + 1] if entry + 1 < len(starts) else len(haystack)
+        return results
+
+    def _add(self, text: str) -> None:
+        old_seq = self._entries.pop(text, None)
+        if old_seq is not None:
+            del self._by_seq[old_seq]
+        self._seq += 1
+        self._entries[text] = self._seq
+        self._by_seq[self._seq] = text
+        self._haystack = None
+
+    def _trim(self) -> None:
+        """Drop the oldest entries beyond `max_entries`."""
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            del self._by_seq[self._entries.pop(oldest)]
+            self._index.remove(oldest)
+
+    def _ensure_loaded(self) -> None:
+        if self._entries_loaded:
+            return
+        self._entries_loaded = True
+        for text in self._read():
+            self._add(text)
+            self._lines_on_disk += 1
+        self._trim()
+        # Build the index in one go instead of inserting entry by entry
+        self._index = _PrefixIndex(self._entries.items())
+
+    def _read(self) -> List[str]:
+        """Read all entries from the file, skipping damaged lines."""
+        if self.path is None or not self.path.exists():
+            return []
+        texts = []
+        with open(self.path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    text = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(text, str):
+                    texts.append(text)
+        return texts
+
+    def _compact(self) -> None:
+        """Rewrite the file with its distinct newest entries.
+
+        The file is read again so that prompts appended by other nbllm
+        processes sharing it are kept.
+        """
+        entries = list(dict.fromkeys(reversed(self._read())))[:self.max_entries]
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            for text in reversed(entries):
+                f.write(json.dumps(text, ensure_ascii=False) + "\n")
+        os.replace(temporary, self.path)
+        self._lines_on_disk = len(entries)
+
+
+class HistoryAutoSuggest(AutoSuggest):
+    """Suggest the newest history entry that starts with the current line."""
+
+    def __init__(self, history: PromptHistory):
+        self.history = history
+
+    def get_suggestion(self, buffer, document) -> Optional[Suggestion]:
+        # Consider only the last line, and only when it is not empty
+        text = document.text.rsplit("\n", 1)[-1]
+        if text.strip():
+            entry = self.history.suggest(text)
+            if entry is not None:
+                return Suggestion(entry[len(text):].split("\n", 1)[0])
+        return None
+
+
+class HistorySearchCompleter(Completer):
+    """Complete the whole input with history entries fuzzily matching it."""
+
+    def __init__(self, history: PromptHistory, limit: int = 20):
+        self.history = history
+        self.limit = limit
+
+    def get_completions(self, document, complete_event) -> Iterable[Completion]:
+        query = document.text
+        for entry in self.history.search(query, self.limit):
+            yield Completion(entry, start_position=-len(document.text_before_cursor),
+                             display=entry.replace("\n", " ↵ "))
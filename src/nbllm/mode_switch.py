@@ -0,0 +1,83 @@
+"""Background mode switching for the Shift+Tab shortcut."""
+
+import threading
+import time
+from typing import Callable, Optional
+
+
+class BackgroundModeSwitch:
+    """Run mode switches on a worker thread, merging rapid requests.
+
+    Each call to `request` only records the target mode. A single worker thread
+    waits a short moment for further requests and then applies the latest target,
+    so pressing Shift+Tab several times in a row results in one switch.
+    """
+
+    def __init__(self, apply: Callable[[str], None], get_current: Callable[[], str], delay: float = 0.15):
+        """Create a background switcher.
+
+        Args:
+            apply: Function that performs the switch to a given mode
+            get_current: Function returning the currently active mode
+            delay: Seconds to wait for further requests before switching
+        """
+        self._apply = apply
+        self._get_current = get_current
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._target = None
+        self._thread = None
+        self._callbacks = []
+        self._error = None
+
+    @property
+    def pending(self) -> bool:
+        """Whether a switch is queued or in progress."""
+        return self._thread is not None
+
+    @property
+    def target(self) -> Optional[str]:
+        """The mode that will be active once pending switches finish."""
+        with self._lock:
+            return self._target if self._thread is not None else self._get_current()
+
+    def request(self, mode: str, on_done: Optional[Callable[[], None]] = None) -> None:
+        """Queue a switch to `mode`, replacing any earlier queued target."""
+        with self._lock:
+            self._target = mode
+            if on_done is not None and on_done not in self._callbacks:
+                self._callbacks.append(on_done)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="nbllm-mode-switch", daemon=True)
+                self._thread.start()
+
+    def wait(self) -> None:
+        """Block until pending switches are applied; re-raise a failed switch."""
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _run(self):
+        """Worker loop: apply the latest target until no new requests arrive."""
+        while True:
+            time.sleep(self.delay)
+            with self._lock:
+                mode = self._target
+            if mode != self._get_current():
+                try:
+                    self._apply(mode)
+                except Exception as e:
+                    self._error = e
+            with self._lock:
+                if self._target == mode or self._error is not None:
+                    callbacks, self._callbacks = self._callbacks, []
+                    self._thread = None
+                    break
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass  # The prompt may already be gone
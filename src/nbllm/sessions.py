@@ -0,0 +1,222 @@
+"""SQLite session store: every response is saved as it happens and can be resumed."""
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Union
+import json
+import sqlite3
+import threading
+import uuid
+
+
+# Default database used by the `nbllm` command
+DEFAULT_PATH = Path.home() / ".nbllm" / "sessions.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    model TEXT,
+    mode TEXT,
+    system_prompt TEXT,
+    title TEXT,
+    turns INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+CREATE INDEX IF NOT EXISTS sessions_created_at ON sessions (created_at);
+CREATE INDEX IF NOT EXISTS sessions_mode ON sessions (mode, updated_at);
+CREATE INDEX IF NOT EXISTS sessions_model ON sessions (model, updated_at);
+
+CREATE TABLE IF NOT EXISTS responses (
+    session_id TEXT NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    response_id TEXT,
+    created_at TEXT NOT NULL,
+    mode TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS tool_events (
+    session_id TEXT NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    tool_call_id TEXT,
+    name TEXT,
+    payload TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tool_events_session ON tool_events (session_id, seq);
+CREATE INDEX IF NOT EXISTS tool_events_name ON tool_events (name);
+"""
+
+_SESSION_COLUMNS = "id, created_at, updated_at, model, mode, system_prompt, title, turns"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _timestamp(value: Union[str, datetime, None]) -> Optional[str]:
+    """Normalize a date filter to the ISO format stored in the database."""
+    if value is None or isinstance(value, str):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+class SessionStore:
+    """Conversations saved to an indexed SQLite database.
+
+    Each finished response is stored as `Response.to_dict()` together with its
+    tool calls, and tool results are stored as soon as the tools return, so a
+    crash loses at most the response that was streaming. Sessions are indexed by
+    date, mode and model to keep listing and lookups fast with many sessions.
+
+    Args:
+        path: Database file, created if needed (defaults to ~/.nbllm/sessions.db)
+    """
+
+    def __init__(self, path: Union[str, Path, None] = None):
+        self.path = Path(path) if path is not None else DEFAULT_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        # WAL keeps writes cheap and lets other processes list sessions meanwhile
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("PRAGMA foreign_keys = ON")
+        with self._db:
+            self._db.executescript(_SCHEMA)
+
+    def create_session(self, model: Optional[str] = None, mode: Optional[str] = None,
+                       system_prompt: Optional[str] = None, session_id: Optional[str] = None) -> str:
+        """Create a new session and return its id."""
+        session_id = session_id or uuid.uuid4().hex[:16]
+        now = _now()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO sessions (id, created_at, updated_at, model, mode, system_prompt) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, now, now, model, mode, system_prompt),
+            )
+        return session_id
+
+    def get_session(self, session_id: str) -> Optional[dict]:
+        """Return a session by id or unique id prefix, or None if there is no match."""
+        with self._lock:
+            row = self._db.execute(f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None and session_id:
+                # Range scan on the primary key instead of LIKE, which can't use it
+                rows = self._db.execute(
+                    f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE id >= ? AND id < ? LIMIT 2",
+                    (session_id, session_id + "\uffff"),
+                ).fetchall()
+                row = rows[0] if len(rows) == 1 else None
+        return dict(row) if row is not None else None
+
+    def list_sessions(self, limit: Optional[int] = 20, mode: Optional[str] = None, model: Optional[str] = None,
+                      since: Union[str, datetime, None] = None, until: Union[str, datetime, None] = None) -> List[dict]:
+        """Return sessions, most recently updated first.
+
+        Args:
+            limit: Maximum number of sessions (None for all)
+            mode: Only sessions last used in this mode
+            model: Only sessions using this model
+            since: Only sessions updated at or after this time
+            until: Only sessions updated before this time
+        """
+        conditions, params = [], []
+        for column, value in (("mode", mode), ("model", model)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("updated_at >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            conditions.append("updated_at < ?")
+            params.append(_timestamp(until))
+
+        query = f"SELECT {_SESSION_COLUMNS} FROM sessions"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY updated_at DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._db.execute(query, params)]
+
+    def save_response(self, session_id: str, seq: int, response, mode: Optional[str] = None) -> None:
+        """Store a finished response and the tool calls it requested.
+
+        Args:
+            session_id: Session the response belongs to
+            seq: Position of the response in the conversation
+            response: Finished `llm` response (sync or async)
+            mode: Mode the response was generated in
+        """
+        data = response.to_dict()
+        now = _now()
+        tool_calls = [
+            (session_id, seq, "call", part.get("tool_call_id"), part["name"], json.dumps(part.get("arguments"), default=str), now)
+            for message in data.get("messages", [])
+            for part in message.get("parts", [])
+            if part.get("type") == "tool_call"
+        ]
+        title = (response.prompt.prompt or "")[:200] or None
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (session_id, seq, response_id, created_at, mode, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, seq, response.id, now, mode, json.dumps(data, default=str)),
+            )
+            self._db.executemany(
+                "INSERT INTO tool_events (session_id, seq, kind, tool_call_id, name, payload, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                tool_calls,
+            )
+            self._db.execute(
+                "UPDATE sessions SET updated_at = ?, mode = ?, turns = MAX(turns, ?), title = COALESCE(title, ?) WHERE id = ?",
+                (now, mode, seq + 1, title, session_id),
+            )
+
+    def save_tool_results(self, session_id: str, seq: int, tool_results: list) -> None:
+        """Store the results of the tool calls requested by response `seq`."""
+        now = _now()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO tool_events (session_id, seq, kind, tool_call_id, name, payload, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (session_id, seq, "result", result.tool_call_id, result.name, str(result.output), now)
+                    for result in tool_results
+                ],
+            )
+
+    def load_responses(self, session_id: str) -> List[dict]:
+        """Return the stored `Response.to_dict()` payloads of a session in order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM responses WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def tool_events(self, session_id: str) -> List[dict]:
+        """Return the tool calls and results of a session in order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, kind, tool_call_id, name, payload, created_at FROM tool_events "
+                "WHERE session_id = ? ORDER BY seq, rowid", (session_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete_session(self, session_id: str) -> None:
+        """Delete a session with its responses and tool events."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,426 @@
+"""Renderers for text streamed by the model.
+
+A `StreamRenderer` writes one stream to one console. It keeps its own
+position, word buffer and pending output, so any number of renderers can
+stream at the same time, e.g. an assistant reply next to a tool's output.
+"""
+
+from functools import lru_cache
+from typing import IO, List, Optional, Union
+import re
+import threading
+import time
+import weakref
+
+from rich.console import Console, RenderHook
+from rich.segment import Segment, Segments
+from rich.text import Text
+
+# rich.markdown, rich.syntax and rich.live take long to import, so only the
+# Markdown renderer imports them, on first use
+
+# Minimum time between two writes of streamed text to the terminal
+STREAM_FRAME_INTERVAL = 1 / 60
+
+# Streamed Markdown switches to plain streaming beyond this many characters
+MARKDOWN_STREAM_LIMIT = 50_000
+
+# Theme for highlighted code blocks, as in rich's Markdown
+CODE_THEME = "monokai"
+
+# Streamed chunks are split into newlines, blanks and runs of other characters
+_TOKENS = re.compile(r"\n|[ \t]|[^\n \t]+")
+_LINES = re.compile(r"\n|[^\n]+")
+
+_FENCE = re.compile(r" {0,3}(`{3,}|~{3,})([^`]*)")
+_HEADING = re.compile(r" {0,3}#{1,6}(\s|$)")
+
+
+class StreamRenderer:
+    """Write streamed text with word-aware wrapping and padding.
+
+    Text is wrapped into a pending buffer that is written at most once per
+    `frame_interval`; a timer writes text that arrives just before a pause.
+    Anything else printed to the same console first writes the pending text,
+    so tool messages never overtake the reply.
+
+    Args:
+        console: Console or text file to write to
+        indent: Left padding of every line
+        wrap: Wrap words at the right margin
+        markdown: Render the stream as Markdown, block by block, instead of dim plain text
+        right_padding: Columns kept free at the right margin
+        frame_interval: Minimum seconds between two writes
+    """
+
+    __slots__ = (
+        "console", "indent", "wrap", "right_padding", "frame_interval",
+        "_position", "_word", "_at_line_start", "_max_line_width", "_terminal_width",
+        "_pending", "_last_flush", "_timer", "_lock", "_markdown", "__weakref__",
+    )
+
+    def __init__(self, console: Union[Console, IO[str]], indent: int = 0, wrap: bool = True,
+                 markdown: bool = False, right_padding: int = 0,
+                 frame_interval: float = STREAM_FRAME_INTERVAL):
+        self.console = console if isinstance(console, Console) else Console(file=console)
+        self.indent = indent
+        self.wrap = wrap
+        self.right_padding = right_padding
+        self.frame_interval = frame_interval
+        self._pending = Text(end="")
+        self._timer = None
+        self._lock = threading.RLock()
+        self._markdown = None
+        _flush_hook(self.console).renderers.add(self)
+        self._reset(markdown)
+
+    def __enter__(self) -> "StreamRenderer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.end()
+
+    def start(self, markdown: bool = False) -> None:
+        """Finish the current stream and start a new one at the beginning of a line."""
+        with self._lock:
+            if self._markdown is not None:
+                self._markdown.finish()
+            self._cancel_timer()
+            self.flush()
+            self._reset(markdown)
+
+    def feed(self, chunk: str) -> None:
+        """Add a chunk of streamed text."""
+        with self._lock:
+            if self._markdown is not None:
+                if self._markdown.feed(chunk):
+                    return
+                # Too long for Markdown: stream the unfinished tail as plain text
+                chunk = self._markdown.abandon() + chunk
+                self._reset(markdown=False)
+
+            append = self._pending.append
+            padding = " " * self.indent
+            wrap = self.wrap
+            position = self._position
+            word = self._word
+            at_line_start = self._at_line_start
+            max_line_width = self._max_line_width
+            terminal_width = self._terminal_width
+            # Tabs expand as if each was printed on its own, like rich did per character
+            tab_size = self.console.tab_size
+            tab = " " * tab_size
+
+            # Work on whole words and blanks instead of single characters
+            for token in (_TOKENS if wrap else _LINES).findall(chunk):
+                if at_line_start:
+                    # Add padding at start of line
+                    append(padding)
+                    at_line_start = False
+                    position = 0
+
+                if token == '\n':
+                    # Print any buffered word, then start a new line
+                    if word:
+                        if len(word) > terminal_width:
+                            self._write_overlong(word)
+                            append = self._pending.append
+                        else:
+                            append(word.expandtabs(tab_size), "dim")
+                        word = ""
+                    append('\n')
+                    at_line_start = True
+                elif wrap and (token == ' ' or token == '\t'):
+                    # End of word, check if it fits
+                    if word:
+                        word_length = len(word)
+                        if position + word_length > max_line_width:
+                            # Word doesn't fit, wrap to new line
+                            append('\n')
+                            append(padding)
+                            position = 0
+                        if word_length > terminal_width:
+                            self._write_overlong(word)
+                            append = self._pending.append
+                        else:
+                            append(word, "dim")
+                        position += word_length
+                        word = ""
+                    # Print the space
+                    append(token if token == ' ' else tab, "dim")
+                    position += 1
+                else:
+                    # Add to word buffer
+                    word += token
+
+            self._position = position
+            self._word = word
+            self._at_line_start = at_line_start
+            self._schedule_flush()
+
+    def end(self) -> None:
+        """Finish the stream, writing the last word and everything pending."""
+        with self._lock:
+            if self._markdown is not None:
+                self._markdown.finish()
+                self._markdown = None
+                return
+            word = self._word
+            if word:
+                if self.wrap and self._position + len(word) > self._max_line_width:
+                    self._pending.append('\n')
+                    self._pending.append(" " * self.indent)
+                    self._at_line_start = False
+                if len(word) > self._terminal_width:
+                    self._write_overlong(word)
+                else:
+                    self._pending.append(word.expandtabs(self.console.tab_size), "dim")
+                self._word = ""
+            self._cancel_timer()
+            self.flush()
+
+    def flush(self) -> None:
+        """Write pending text to the console in one go."""
+        with self._lock:
+            self._timer = None
+            pending = self._take_pending()
+            if pending is not None:
+                # Only real writes start a frame, so the first word shows up right away
+                self._last_flush = time.monotonic()
+                self.console.print(pending, end="", soft_wrap=True, highlight=False)
+
+    def _reset(self, markdown: bool) -> None:
+        self._position = 0
+        self._word = ""
+        self._at_line_start = True
+        self._terminal_width = self.console.width
+        self._max_line_width = self._terminal_width - self.indent - self.right_padding
+        # Show the first chunk right away
+        self._last_flush = 0.0
+        self._markdown = _MarkdownBlocks(self) if markdown else None
+
+    def _take_pending(self) -> Optional[Text]:
+        """Return the text that was not written yet, or None."""
+        pending = self._pending
+        if not pending:
+            return None
+        self._pending = Text(end="")
+        return pending
+
+    def _write_overlong(self, word: str) -> None:
+        """Write text wider than the terminal on its own, folded by rich like any print."""
+        self.flush()
+        self.console.print(Text(word, style="dim"), end="", highlight=False)
+
+    def _schedule_flush(self) -> None:
+        """Flush now if a frame has passed since the last write, otherwise once it has."""
+        wait = self._last_flush + self.frame_interval - time.monotonic()
+        if wait <= 0:
+            self._cancel_timer()
+            self.flush()
+        elif self._timer is None:
+            # Text arriving just before a pause must not wait for the next chunk
+            self._timer = threading.Timer(wait, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+class _FlushPendingHook(RenderHook):
+    """Write pending streamed text before anything else printed to a console.
+
+    Keeps tool messages and prompts from overtaking a stream that is still
+    waiting for its next frame.
+    """
+
+    def __init__(self):
+        self.renderers = weakref.WeakSet()
+
+    def process_renderables(self, renderables):
+        pending = []
+        for renderer in list(self.renderers):
+            # A renderer busy in another thread writes its text itself
+            if renderer._lock.acquire(blocking=False):
+                try:
+                    text = renderer._take_pending()
+                finally:
+                    renderer._lock.release()
+                if text is not None:
+                    pending.append(text)
+        return [*pending, *renderables] if pending else renderables
+
+
+# One hook per console, shared by all renderers writing to it
+_flush_hooks = weakref.WeakKeyDictionary()
+
+
+def _flush_hook(console: Console) -> _FlushPendingHook:
+    hook = _flush_hooks.get(console)
+    if hook is None:
+        hook = _flush_hooks[console] = _FlushPendingHook()
+        console.push_render_hook(hook)
+    return hook
+
+
+@lru_cache(maxsize=64)
+def _highlight_code(console: Console, code: str, lexer: str, width: int) -> List[List[Segment]]:
+    """Render a finished code block once; repeated blocks reuse the lines."""
+    from rich.syntax import Syntax
+    syntax = Syntax(code, lexer, theme=CODE_THEME, word_wrap=True, padding=1)
+    return console.render_lines(syntax, console.options.update_width(width), pad=False)
+
+
+def _is_blank_line(line: List[Segment]) -> bool:
+    """Check whether a rendered line shows nothing (no text, no background)."""
+    return all(not segment.text.strip() and not (segment.style and segment.style.bgcolor) for segment in line)
+
+
+class _MarkdownBlocks:
+    """Render a stream as Markdown, one finished block at a time.
+
+    Paragraphs, lists and headings finish at a blank line, fenced code at its
+    closing fence. Finished blocks are printed once and never touched again;
+    only the unfinished tail is redrawn in a transient live region, at most
+    once per frame.
+    """
+
+    def __init__(self, renderer: StreamRenderer):
+        self.renderer = renderer
+        self.console = renderer.console
+        self.indent = renderer.indent
+        self.width = max(self.console.width - renderer.indent - renderer.right_padding, 1)
+        self.lines = []          # Complete lines of the unfinished block
+        self.partial = ""        # Text after the last newline
+        self.fence = None        # Opening fence of an unfinished code block
+        self.lexer = "text"
+        self.printed = False     # Whether a block was printed yet
+        self.size = 0
+        self.live = None
+        self.last_redraw = 0.0
+        self.timer = None
+
+    def feed(self, chunk: str) -> bool:
+        """Add a chunk, print blocks it finishes and redraw the tail.
+
+        Returns:
+            False once the stream is longer than `MARKDOWN_STREAM_LIMIT`; the
+            chunk was not added then.
+        """
+        self.size += len(chunk)
+        if self.size > MARKDOWN_STREAM_LIMIT:
+            return False
+
+        *complete, self.partial = (self.partial + chunk).split("\n")
+        for line in complete:
+            self._add_line(line + "\n")
+        self._schedule_redraw()
+        return True
+
+    def finish(self) -> None:
+        """Print the unfinished tail as the last block."""
+        self._stop_live()
+        if self.partial:
+            self.lines.append(self.partial)
+            self.partial = ""
+        self._print_block()
+
+    def abandon(self) -> str:
+        """Stop rendering and return the unfinished tail as text."""
+        self._stop_live()
+        tail = self._tail()
+        self.lines, self.partial = [], ""
+        return tail
+
+    def _add_line(self, line: str) -> None:
+        if self.fence is not None:
+            marker = line.strip()
+            if len(marker) >= len(self.fence) and set(marker) == {self.fence[0]}:
+                # Closing fence: highlight the code without the fence lines
+                code = "".join(self.lines[1:]).rstrip()
+                self.lines, self.fence = [], None
+                self._print_lines(_highlight_code(self.console, code, self.lexer, self.width))
+            else:
+                self.lines.append(line)
+            return
+
+        fence = _FENCE.fullmatch(line.rstrip("\n"))
+        if fence:
+            self._print_block()
+            self.fence = fence.group(1)
+            self.lexer = fence.group(2).strip().partition(" ")[0] or "text"
+            self.lines.append(line)
+        elif not line.strip():
+            self._print_block()
+        elif _HEADING.match(line):
+            # A heading is complete as soon as its line is
+            self._print_block()
+            self.lines.append(line)
+            self._print_block()
+        else:
+            self.lines.append(line)
+
+    def _print_block(self) -> None:
+        """Print the collected block permanently."""
+        if self.lines:
+            from rich.markdown import Markdown
+            markdown = Markdown("".join(self.lines), code_theme=CODE_THEME)
+            self.lines = []
+            self._print_lines(self.console.render_lines(markdown, self.console.options.update_width(self.width), pad=False))
+
+    def _print_lines(self, lines: List[List[Segment]]) -> None:
+        """Print rendered lines padded, one blank line apart from the previous block."""
+        start, end = 0, len(lines)
+        while start < end and _is_blank_line(lines[start]):
+            start += 1
+        while end > start and _is_blank_line(lines[end - 1]):
+            end -= 1
+        if start == end:
+            return
+        if self.printed:
+            self.console.print()
+        self.printed = True
+        padding = Segment(" " * self.indent)
+        self.console.print(Segments([
+            segment for line in lines[start:end] for segment in (padding, *line, Segment.line())
+        ]), end="")
+
+    def _tail(self) -> str:
+        return "".join(self.lines) + self.partial
+
+    def _schedule_redraw(self) -> None:
+        """Redraw the tail now if a frame has passed, otherwise once it has."""
+        wait = self.last_redraw + self.renderer.frame_interval - time.monotonic()
+        if wait <= 0:
+            self._redraw()
+        elif self.timer is None:
+            self.timer = threading.Timer(wait, self._redraw)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _redraw(self) -> None:
+        with self.renderer._lock:
+            self.timer = None
+            self.last_redraw = time.monotonic()
+            if self.renderer._markdown is not self:
+                return
+            from rich.live import Live
+            from rich.markdown import Markdown
+            from rich.padding import Padding
+            tail = Padding(Markdown(self._tail(), code_theme=CODE_THEME), (0, 0, 0, self.indent))
+            if self.live is None:
+                self.live = Live(tail, console=self.console, auto_refresh=False, transient=True)
+                self.live.start()
+            else:
+                self.live.update(tail, refresh=True)
+
+    def _stop_live(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.live is not None:
+            self.live.stop()
+            self.live = None
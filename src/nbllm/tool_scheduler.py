@@ -0,0 +1,130 @@
+"""Concurrent execution of the tool calls requested in one model response."""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List
+import asyncio
+
+from . import ui
+
+
+def requires_confirmation(func):
+    """Mark a tool function or Toolbox method as asking the user for confirmation.
+
+    Such calls are never run concurrently: they execute one at a time on the
+    calling thread, so prompts and diffs don't interleave. Toolboxes with a
+    `tool_name` that the user trusts (see `ui.trust_tool`) don't prompt and are
+    run in parallel like any other tool.
+    """
+    func.requires_confirmation = True
+    return func
+
+
+def needs_serial_execution(tool) -> bool:
+    """Check whether a tool call has to run on the calling thread."""
+    implementation = getattr(tool, "implementation", None)
+    if implementation is None:
+        return False
+    instance = getattr(implementation, "__self__", None)
+    # Toolboxes bound to their thread (e.g. a browser session) opt out entirely
+    if getattr(instance, "run_serially", False):
+        return True
+    if not getattr(implementation, "requires_confirmation", False):
+        return False
+    tool_name = getattr(instance, "tool_name", None)
+    return not (tool_name and ui.is_tool_trusted(tool_name))
+
+
+class ToolScheduler:
+    """Run the tool calls of one response in a bounded thread pool.
+
+    Calls that need a user confirmation run serially on the calling thread while
+    the others run in the pool. Results are returned in the order the model
+    requested the calls.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        """Create a scheduler running at most `max_workers` calls at once."""
+        self.max_workers = max_workers
+
+    def run_calls(self, tool_calls: list, tools: list, execute: Callable) -> List:
+        """Execute `tool_calls` with `execute(call) -> ToolResult`.
+
+        Args:
+            tool_calls: Tool calls in the order the model requested them
+            tools: Tools available to the response, used to look up each call
+            execute: Function executing a single tool call
+        """
+        tools_by_name = {getattr(tool, "name", None): tool for tool in tools}
+        serial = [needs_serial_execution(tools_by_name.get(call.name)) for call in tool_calls]
+        parallel_count = serial.count(False)
+
+        if self.max_workers <= 1 or parallel_count <= 1:
+            return [execute(call) for call in tool_calls]
+
+        results = [None] * len(tool_calls)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, parallel_count)) as pool:
+            futures = {
+                index: pool.submit(execute, call)
+                for index, call in enumerate(tool_calls)
+                if not serial[index]
+            }
+            # Interactive calls run here, one at a time, while the pool works
+            for index, call in enumerate(tool_calls):
+                if serial[index]:
+                    results[index] = execute(call)
+            for index, future in futures.items():
+                results[index] = future.result()
+        return results
+
+    async def run_calls_async(self, tool_calls: list, tools: list, execute: Callable[..., Awaitable]) -> List:
+        """Execute `tool_calls` with the coroutine function `execute(call)` on the running loop.
+
+        Like `run_calls`: calls needing confirmation are awaited one at a
+        time, in order, while the others run as tasks, at most `max_workers`
+        at once. Results are returned in the order of `tool_calls`.
+
+        Args:
+            tool_calls: Tool calls in the order the model requested them
+            tools: Tools available to the response, used to look up each call
+            execute: Coroutine function executing a single tool call
+        """
+        tools_by_name = {getattr(tool, "name", None): tool for tool in tools}
+        serial = [needs_serial_execution(tools_by_name.get(call.name)) for call in tool_calls]
+        workers = asyncio.Semaphore(max(1, self.max_workers))
+
+        async def bounded(call):
+            async with workers:
+                return await execute(call)
+
+        results = [None] * len(tool_calls)
+        tasks = {
+            index: asyncio.create_task(bounded(call))
+            for index, call in enumerate(tool_calls)
+            if not serial[index]
+        }
+        try:
+            for index, call in enumerate(tool_calls):
+                if serial[index]:
+                    results[index] = await execute(call)
+            for index, task in tasks.items():
+                results[index] = await task
+        finally:
+            # Don't leave calls running when one failed or the chat was cancelled
+            for task in tasks.values():
+                task.cancel()
+        return results
+
+    def run(self, response) -> List:
+        """Execute all tool calls of a finished synchronous `llm` response."""
+        tool_calls = response.tool_calls()
+        # Prepare toolboxes once up front instead of racing in the workers
+        response.execute_tool_calls(tool_calls_list=[])
+        return self.run_calls(
+            tool_calls,
+            response.prompt.tools,
+            lambda call: response.execute_tool_calls(
+                tool_calls_list=[call],
+                before_call=response.before_call,
+                after_call=response.after_call,
+            )[0],
+        )
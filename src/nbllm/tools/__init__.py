@@ -1,16 +1,39 @@
 """Tools for the nbllm assistant."""
 
-from .filesystem import FileSystem, FileTool
-from .todo import TodoTools
-from .webfetch import WebFetchTool
+import importlib
+
 from ..not_installed import NotInstalled
 
-try:
-    from .playwright_browser import PlaywrightTool
-except ImportError:
-    # Replace with NotInstalled proxy
-    PlaywrightTool = NotInstalled("PlaywrightTool", "browser")
+# Tools and the modules defining them, imported on first access so that
+# unused tools don't load their dependencies (e.g. requests for WebFetchTool)
+_LAZY_TOOLS = {
+    "FileSystem": ".filesystem",
+    "FileTool": ".filesystem",
+    "TodoTools": ".todo",
+    "WebFetchTool": ".webfetch",
+    "PlaywrightTool": ".playwright_browser",
+}
+
+# Tools needing an optional extra, replaced by a NotInstalled proxy without it
+_EXTRAS = {"PlaywrightTool": "browser"}
+
+
+def __getattr__(name: str):
+    module = _LAZY_TOOLS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        value = getattr(importlib.import_module(module, __name__), name)
+    except ImportError:
+        if name not in _EXTRAS:
+            raise
+        value = NotInstalled(name, _EXTRAS[name])
+    globals()[name] = value
+    return value
+
 
+def __dir__():
+    return sorted([*globals(), *_LAZY_TOOLS])
 
 
-__all__ = ["FileSystem", "FileTool", "TodoTools", "WebFetchTool", "PlaywrightTool"]
\ No newline at end of file
+__all__ = ["FileSystem", "FileTool", "TodoTools", "WebFetchTool", "PlaywrightTool"]
@@ -8,8 +8,10 @@ import llm
 
 from .. import config
 from .. import ui
+from ..tool_scheduler import requires_confirmation
 
 
+@requires_confirmation
 def run_command(command: str, working_directory: Optional[str] = ".", timeout: int = 30) -> str:
     """Execute any shell command and return the output. Full access to the system."""
     config.tool_debug(f">>> LLM calling tool: run_command(command={repr(command)}, working_directory={repr(working_directory)}, timeout={timeout})")
@@ -119,21 +121,25 @@ class GitTool(llm.Toolbox):
         except Exception as e:
             return f"Error executing git command: {e}"
     
+    @requires_confirmation
     def status(self, working_directory: Optional[str] = None) -> str:
         """Get git status."""
         config.tool_debug(f">>> LLM calling tool: GitTool.status(working_directory={repr(working_directory)})")
         return self._run_git("status", working_directory)
     
+    @requires_confirmation
     def log(self, args: str = "--oneline -10", working_directory: Optional[str] = None) -> str:
         """Get git log. Default: last 10 commits in oneline format."""
         config.tool_debug(f">>> LLM calling tool: GitTool.log(args={repr(args)}, working_directory={repr(working_directory)})")
         return self._run_git(f"log {args}", working_directory)
     
+    @requires_confirmation
     def diff(self, args: str = "", working_directory: Optional[str] = None) -> str:
         """Get git diff."""
         config.tool_debug(f">>> LLM calling tool: GitTool.diff(args={repr(args)}, working_directory={repr(working_directory)})")
         return self._run_git(f"diff {args}", working_directory)
     
+    @requires_confirmation
     def branch(self, args: str = "-a", working_directory: Optional[str] = None) -> str:
         """List git branches. Default: all branches."""
         config.tool_debug(f">>> LLM calling tool: GitTool.branch(args={repr(args)}, working_directory={repr(working_directory)})")
@@ -184,23 +190,27 @@ class NpmTool(llm.Toolbox):
         except Exception as e:
             return f"Error executing npm command: {e}"
     
+    @requires_confirmation
     def list(self, depth: int = 0, working_directory: Optional[str] = None) -> str:
         """List installed packages."""
         config.tool_debug(f">>> LLM calling tool: NpmTool.list(depth={depth}, working_directory={repr(working_directory)})")
         args = f"list --depth={depth}"
         return self._run_npm(args, working_directory)
     
+    @requires_confirmation
     def outdated(self, working_directory: Optional[str] = None) -> str:
         """Check for outdated packages."""
         config.tool_debug(f">>> LLM calling tool: NpmTool.outdated(working_directory={repr(working_directory)})")
         return self._run_npm("outdated", working_directory)
     
+    @requires_confirmation
     def audit(self, fix: bool = False, working_directory: Optional[str] = None) -> str:
         """Run security audit. Set fix=True to auto-fix issues."""
         config.tool_debug(f">>> LLM calling tool: NpmTool.audit(fix={fix}, working_directory={repr(working_directory)})")
         args = "audit fix" if fix else "audit"
         return self._run_npm(args, working_directory)
     
+    @requires_confirmation
     def scripts(self, working_directory: Optional[str] = None) -> str:
         """List available npm scripts from package.json."""
         config.tool_debug(f">>> LLM calling tool: NpmTool.scripts(working_directory={repr(working_directory)})")
@@ -286,11 +296,13 @@ class PythonTool(llm.Toolbox):
         except Exception as e:
             return f"Error executing uv command: {e}"
     
+    @requires_confirmation
     def version(self) -> str:
         """Get Python version."""
         config.tool_debug(">>> LLM calling tool: PythonTool.version()")
         return self._run_python("--version")
     
+    @requires_confirmation
     def pip_list(self, format: str = "columns", working_directory: Optional[str] = None) -> str:
         """List installed packages. Format can be: columns, freeze, json."""
         config.tool_debug(f">>> LLM calling tool: PythonTool.pip_list(format={repr(format)}, working_directory={repr(working_directory)})")
@@ -302,6 +314,7 @@ class PythonTool(llm.Toolbox):
             args = f"-m pip list --format={format}"
             return self._run_python(args, working_directory)
     
+    @requires_confirmation
     def pip_show(self, package: str, working_directory: Optional[str] = None) -> str:
         """Show details about a specific package."""
         config.tool_debug(f">>> LLM calling tool: PythonTool.pip_show(package={repr(package)}, working_directory={repr(working_directory)})")
@@ -311,6 +324,7 @@ class PythonTool(llm.Toolbox):
         else:
             return self._run_python(f"-m pip show {package}", working_directory)
     
+    @requires_confirmation
     def check_import(self, module: str, working_directory: Optional[str] = None) -> str:
         """Check if a module can be imported."""
         config.tool_debug(f">>> LLM calling tool: PythonTool.check_import(module={repr(module)}, working_directory={repr(working_directory)})")
@@ -0,0 +1,326 @@
+"""Applying edits to files: several replacements at once, diffs and atomic writes."""
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, NamedTuple, Optional, Tuple, Union
+import difflib
+import os
+import tempfile
+
+from .. import ui
+
+if TYPE_CHECKING:
+    from .journal import EditJournal
+
+
+# Unchanged lines shown around each change of a diff
+CONTEXT_LINES = 3
+
+# Longer diffs are collapsed to their first hunks and a summary
+MAX_DIFF_LINES = 200
+
+# What the model is told when the user declines a change
+DECLINED = ("IMPORTANT: The user declined the changes. Do not continue with the task. "
+            "Wait for new instructions from the user. IMPORTANT: Do not continue with the task.")
+
+
+class EditError(ValueError):
+    """An edit that cannot be applied, e.g. because its text is missing or ambiguous."""
+
+
+class Edit(NamedTuple):
+    """Replace `old_string` with `new_string`, which must occur `expected_count` times."""
+
+    old_string: str
+    new_string: str
+    expected_count: int = 1
+
+
+def parse_edits(edits: Iterable) -> List[Edit]:
+    """Turn the edits of a tool call, as dicts or sequences, into `Edit`s."""
+    parsed = []
+    for number, edit in enumerate(edits, 1):
+        try:
+            if isinstance(edit, dict):
+                parsed.append(Edit(edit["old_string"], edit["new_string"], int(edit.get("expected_count", 1))))
+            else:
+                parsed.append(Edit(*edit))
+        except (KeyError, TypeError, ValueError) as e:
+            raise EditError(f"edit {number} needs old_string, new_string and optionally expected_count ({e})")
+    return parsed
+
+
+def apply_edits(content: str, edits: List[Edit]) -> Tuple[str, List[Tuple[int, int, str]]]:
+    """Apply all edits to `content` in one pass.
+
+    Every edit is located in the original content, so edits don't see each
+    other's replacements. The content is only rebuilt once all of them were
+    found exactly `expected_count` times without overlapping.
+
+    Returns:
+        The new content and the replaced spans as (start, end, new text), in order
+
+    Raises:
+        EditError: If an edit's text is empty, missing, found a different
+            number of times or overlaps another edit
+    """
+    spans = []
+    for number, edit in enumerate(edits, 1):
+        if not edit.old_string:
+            raise EditError(f"edit {number} has an empty old_string")
+        starts = _occurrences(content, edit.old_string)
+        if not starts:
+            raise EditError(f"edit {number}: old_string not found: {_preview(edit.old_string)}")
+        if len(starts) != edit.expected_count:
+            raise EditError(
+                f"edit {number}: old_string found {len(starts)} times, expected {edit.expected_count}: "
+                f"{_preview(edit.old_string)} (add surrounding lines to make it unique, or set expected_count)"
+            )
+        spans.extend((start, start + len(edit.old_string), edit.new_string, number) for start in starts)
+
+    spans.sort()
+    for previous, span in zip(spans, spans[1:]):
+        if span[0] < previous[1]:
+            raise EditError(f"edits {previous[3]} and {span[3]} overlap")
+
+    spans = [(start, end, new_string) for start, end, new_string, _ in spans]
+    return replace_spans(content, spans), spans
+
+
+def replace_all(content: str, old_string: str, new_string: str) -> Tuple[str, List[Tuple[int, int, str]]]:
+    """Replace every occurrence of `old_string`, like `str.replace`, also returning the replaced spans."""
+    if not old_string:
+        return content, []
+    spans = [(start, start + len(old_string), new_string) for start in _occurrences(content, old_string)]
+    return replace_spans(content, spans), spans
+
+
+def _occurrences(content: str, text: str) -> List[int]:
+    """Start of each non-overlapping occurrence of `text`."""
+    starts = []
+    position = content.find(text)
+    while position != -1:
+        starts.append(position)
+        position = content.find(text, position + len(text))
+    return starts
+
+
+def replace_spans(content: str, spans: List[Tuple[int, int, str]]) -> str:
+    """Replace each (start, end, text) span of `content`; spans are in order and don't overlap."""
+    parts, position = [], 0
+    for start, end, new_string in spans:
+        parts.append(content[position:start])
+        parts.append(new_string)
+        position = end
+    parts.append(content[position:])
+    return "".join(parts)
+
+
+def _preview(text: str, limit: int = 60) -> str:
+    text = text if len(text) <= limit else text[:limit] + "..."
+    return repr(text)
+
+
+def read_text(path: Union[str, Path]) -> str:
+    """Read a UTF-8 file, keeping its line endings as they are."""
+    with open(path, encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def write_atomic(path: Union[str, Path], content: str) -> None:
+    """Write a file through a temporary file and `os.replace`.
+
+    Readers see either the old or the new content, never a partial write,
+    and a failed write leaves the file as it was. An existing file keeps
+    its permissions.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(temporary, path.stat().st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        raise
+
+
+class Hunk(NamedTuple):
+    """A hunk of a unified diff; lines are (tag, text) with tag " ", "-" or "+"."""
+
+    old_start: int    # 0-based
+    new_start: int
+    lines: List[Tuple[str, str]]
+
+
+def _context_before(content: str, position: int, count: int) -> List[str]:
+    lines = []
+    while position > 0 and len(lines) < count:
+        start = content.rfind("\n", 0, position - 1) + 1
+        lines.append(content[start:position])
+        position = start
+    return lines[::-1]
+
+
+def _context_after(content: str, position: int, count: int) -> List[str]:
+    lines = []
+    while position < len(content) and len(lines) < count:
+        end = content.find("\n", position)
+        end = len(content) if end == -1 else end + 1
+        lines.append(content[position:end])
+        position = end
+    return lines
+
+
+def diff_hunks(original: str, new: str, spans: List[Tuple[int, int, str]],
+               context: int = CONTEXT_LINES) -> List[Hunk]:
+    """Diff a change around the spans it replaced, instead of over the whole file.
+
+    Only the lines holding a replaced span, plus `context` lines around
+    them, are compared, so the cost grows with the size of the change and
+    not of the file. Spans whose lines are close together share a hunk.
+
+    Args:
+        original: Content before the change
+        new: Content after replacing `spans`
+        spans: Replaced (start, end, new text) in `original`, in order, as from `apply_edits`
+        context: Number of unchanged lines shown around each change
+    """
+    # Group the spans into regions of whole lines: (start, end, first line, delta before, delta after)
+    regions = []
+    delta, line, counted = 0, 0, 0
+    for start, end, new_text in spans:
+        line_start = original.rfind("\n", 0, start) + 1
+        # The line holding `end` too: a replaced newline joins it to the new text
+        line_end = original.find("\n", end)
+        line_end = len(original) if line_end == -1 else line_end + 1
+        line += original.count("\n", counted, line_start)
+        counted = line_start
+        delta_after = delta + len(new_text) - (end - start)
+        if regions and original.count("\n", regions[-1][1], line_start) <= 2 * context:
+            regions[-1][1], regions[-1][4] = line_end, delta_after
+        else:
+            regions.append([line_start, line_end, line, delta, delta_after])
+        delta = delta_after
+
+    hunks = []
+    line_delta = 0
+    for start, end, first_line, delta_before, delta_after in regions:
+        old_lines = original[start:end].splitlines(keepends=True)
+        new_lines = new[start + delta_before:end + delta_after].splitlines(keepends=True)
+        before = _context_before(original, start, context)
+        after = _context_after(original, end, context)
+        old_window, new_window = before + old_lines + after, before + new_lines + after
+        old_first = first_line - len(before)
+        new_first = old_first + line_delta
+        line_delta += len(new_lines) - len(old_lines)
+        matcher = difflib.SequenceMatcher(None, old_window, new_window, autojunk=False)
+        for group in matcher.get_grouped_opcodes(context):
+            lines = []
+            for tag, i1, i2, j1, j2 in group:
+                if tag == "equal":
+                    lines.extend((" ", text) for text in old_window[i1:i2])
+                    continue
+                lines.extend(("-", text) for text in old_window[i1:i2])
+                lines.extend(("+", text) for text in new_window[j1:j2])
+            hunks.append(Hunk(old_first + group[0][1], new_first + group[0][3], lines))
+    return hunks
+
+
+def _render_hunk(hunk: Hunk) -> List[List[Tuple[str, str]]]:
+    """Styled lines of a hunk: a header, then lines numbered as in the old or new file."""
+    old_count = sum(tag != "+" for tag, _ in hunk.lines)
+    new_count = sum(tag != "-" for tag, _ in hunk.lines)
+    lines = [[(f"@@ -{hunk.old_start + 1},{old_count} +{hunk.new_start + 1},{new_count} @@", "cyan")]]
+    old_number, new_number = hunk.old_start + 1, hunk.new_start + 1
+    for tag, text in hunk.lines:
+        text = text.rstrip()
+        if tag == "-":
+            lines.append([(f"{old_number:4d} -{text}", "white on red")])
+            old_number += 1
+        elif tag == "+":
+            lines.append([(f"{new_number:4d} +{text}", "white on green")])
+            new_number += 1
+        else:
+            lines.append([(f"{old_number:4d}", "dim"), (f"  {text}", "")])
+            old_number += 1
+            new_number += 1
+    return lines
+
+
+def show_diff(original: str, new: str, spans: List[Tuple[int, int, str]], name: str,
+              max_lines: int = MAX_DIFF_LINES) -> bool:
+    """Print a colored diff of a change, with line numbers, in one write.
+
+    Diffs longer than `max_lines` show their first hunks and a summary, and
+    the user can ask for the rest.
+
+    Args:
+        original: Content before the change
+        new: Content after the change
+        spans: Replaced (start, end, new text) in `original`
+        name: File name shown in the header
+        max_lines: Maximum number of lines shown before asking
+
+    Returns:
+        Whether there was anything to show
+    """
+    hunks = diff_hunks(original, new, spans)
+    if not hunks:
+        return False
+
+    ui.tool_warning("Proposed changes:")
+    ui.print_empty_line()
+    header = [[(f"--- {name} (before)", "dim")], [(f"+++ {name} (after)", "dim")]]
+    rendered = [_render_hunk(hunk) for hunk in hunks]
+    total = sum(len(lines) for lines in rendered)
+    if total <= max_lines:
+        ui.print_lines(header + [line for lines in rendered for line in lines])
+    else:
+        shown, count = [], 0
+        for lines in rendered:
+            if shown and count + len(lines) > max_lines:
+                break
+            shown.append(lines)
+            count += len(lines)
+        hidden = hunks[len(shown):]
+        removed = sum(tag == "-" for hunk in hidden for tag, _ in hunk.lines)
+        added = sum(tag == "+" for hunk in hidden for tag, _ in hunk.lines)
+        summary = [(f"... {len(hidden):,} more hunks (-{removed:,} +{added:,} lines) not shown", "yellow")]
+        ui.print_lines(header + [line for lines in shown for line in lines] + [summary])
+        ui.print_empty_line()
+        if ui.confirm(f"Show the whole diff ({len(hunks):,} hunks, {total:,} lines)?", default=False):
+            ui.print_lines([line for lines in rendered[len(shown):] for line in lines])
+
+    ui.print("")  # Extra newline for clarity
+    return True
+
+
+def confirm_and_write(path: Path, original: str, new: str, spans: List[Tuple[int, int, str]], name: str,
+                      journal: Optional["EditJournal"] = None, description: str = "edit") -> str:
+    """Show the diff of a change, ask the user to confirm it and write it atomically.
+
+    A written change is recorded in `journal`, if given, so it can be undone.
+
+    Returns:
+        The message for the model: applied, declined or nothing to change
+    """
+    if not show_diff(original, new, spans, name):
+        return f"No changes needed in '{name}'"
+    ui.print_empty_line()  # Empty line for clarity
+    if not ui.confirm("Apply these changes?", default=True):
+        ui.tool_error("Changes cancelled. Please provide new instructions.")
+        return DECLINED
+    write_atomic(path, new)
+    if journal is not None:
+        journal.record(path, original, new, spans, description)
+    return f"Applied changes to '{name}'"
@@ -0,0 +1,273 @@
+"""Reading ranges of lines from files of any size."""
+
+from bisect import bisect_left
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+import hashlib
+import mmap
+import os
+import stat as stat_module
+import threading
+
+from .sniff import SNIFF_BYTES, FileType, describe_binary, sniff
+
+
+# Most bytes returned by one read
+MAX_CHARS = 50_000
+
+# Bytes per block of a line index
+BLOCK_SIZE = 1 << 16
+
+# Larger files whose first bytes hold no line break are only previewed
+LONG_LINE_FILE_BYTES = 1024 * 1024
+
+# Bytes shown of such a file
+LONG_LINE_PREVIEW = 2000
+
+# Larger UTF-16 and UTF-32 files are only previewed, as they are decoded whole
+MAX_WIDE_FILE_BYTES = 16 * 1024 * 1024
+
+# Number of line indexes kept, for the most recently read files
+_CACHE_SIZE = 32
+
+# Rough number of characters per token, for reporting the tokens saved
+CHARS_PER_TOKEN = 4
+
+_indexes: "OrderedDict[tuple, LineIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class LineIndex:
+    """Number of newlines before each block of `BLOCK_SIZE` bytes of a file.
+
+    Finding where a line starts takes a bisection over the blocks and a scan
+    of at most one block, however large the file is.
+
+    Args:
+        data: Contents of the file, as bytes or an mmap
+        size: Size of the file in bytes
+    """
+
+    __slots__ = ("size", "lines", "_block_size", "_newlines")
+
+    def __init__(self, data, size: int):
+        newlines = [0]
+        total = 0
+        for start in range(0, size, BLOCK_SIZE):
+            total += data[start:start + BLOCK_SIZE].count(b"\n")
+            newlines.append(total)
+        self.size = size
+        self._block_size = BLOCK_SIZE
+        self._newlines = newlines
+        # A last line without a newline counts too
+        self.lines = total + (1 if size and data[size - 1:size] != b"\n" else 0)
+
+    def offset(self, data, line: int) -> int:
+        """Return the byte offset at which `line` (0-based) starts, or the file size past the last line."""
+        if line <= 0:
+            return 0
+        if line >= self.lines:
+            return self.size
+        # The line starts after the line-th newline: find the block holding it
+        block = bisect_left(self._newlines, line) - 1
+        position = block * self._block_size
+        for _ in range(line - self._newlines[block]):
+            position = data.find(b"\n", position) + 1
+        return position
+
+
+def line_index(path: Union[str, Path], data, stat: os.stat_result) -> LineIndex:
+    """Return the line index of a file, reusing the one built for the same path, mtime and size."""
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = LineIndex(data, stat.st_size)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > _CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def read_lines(path: Union[str, Path], offset: int = 0, limit: Optional[int] = None,
+               tail: Optional[int] = None, max_chars: int = MAX_CHARS) -> str:
+    """Read a range of lines of a text file.
+
+    The first bytes tell binary files, which get a short summary with a
+    hexdump instead, and the encoding of text files. Regular files are
+    mapped into memory, so only the lines returned (and one block to find
+    where they start) are read. The whole file is returned as it is; a part
+    of it ends with a note giving the lines shown, the total number of lines
+    and the offset to continue from.
+
+    Args:
+        path: File to read
+        offset: Number of lines to skip
+        limit: Maximum number of lines (None: as many as fit in `max_chars`)
+        tail: Read the last `tail` lines instead
+        max_chars: Maximum number of bytes to return
+    """
+    path = Path(path)
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        regular = stat_module.S_ISREG(stat.st_mode) and stat.st_size
+        if regular:
+            head, size = f.read(SNIFF_BYTES), stat.st_size
+        else:
+            # Empty files and special files without a size
+            data = f.read()
+            head, size = data[:SNIFF_BYTES], len(data)
+        file_type = sniff(head, size)
+        if file_type.binary:
+            return describe_binary(file_type, head, size)
+        if file_type.long_lines and size > LONG_LINE_FILE_BYTES:
+            return _preview_long_lines(f, file_type, head, size, tail is not None)
+        if file_type.encoding.startswith(("utf-16", "utf-32")):
+            # Line breaks are not single bytes: decode the file and read the lines of its UTF-8 form
+            if size > MAX_WIDE_FILE_BYTES:
+                return _preview_long_lines(f, file_type, head, size, tail is not None)
+            f.seek(0)
+            data = f.read().decode(file_type.encoding, errors="replace").encode("utf-8")
+            text = _read_range(data, LineIndex(data, len(data)), offset, limit, tail, max_chars, "utf-8")
+            return text + f"\n(decoded from {file_type.description})"
+
+        if regular:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                text = _read_range(data, line_index(path, data, stat), offset, limit, tail, max_chars, file_type.encoding)
+        else:
+            text = _read_range(data, LineIndex(data, len(data)), offset, limit, tail, max_chars, file_type.encoding)
+    if file_type.encoding not in ("utf-8", "utf-8-sig"):
+        text += f"\n(decoded from {file_type.description})"
+    return text
+
+
+def _preview_long_lines(f, file_type: FileType, head: bytes, size: int, from_end: bool) -> str:
+    """The start (or end) of a large file whose lines are too long to read by line, e.g. minified code."""
+    if from_end:
+        f.seek(max(0, size - LONG_LINE_PREVIEW))
+        data = f.read(LONG_LINE_PREVIEW)
+    else:
+        data = head[:LONG_LINE_PREVIEW]
+    text = data.decode(file_type.encoding, errors="replace")
+    where = "last" if from_end else "first"
+    return (
+        f"{text}\n... ({file_type.description}, {size:,} bytes, with lines too long to read by line "
+        f"(minified or generated?); showing the {where} {len(data):,} bytes only. Search it for specific text instead.)"
+    )
+
+
+def _read_range(data, index: LineIndex, offset: int, limit: Optional[int],
+                tail: Optional[int], max_chars: int, encoding: str = "utf-8") -> str:
+    total = index.lines
+    if tail is not None:
+        offset, limit = total - max(0, tail), tail
+    first = min(max(0, offset), total)
+    last = total if limit is None else min(total, first + max(0, limit))
+    start, end = index.offset(data, first), index.offset(data, last)
+    cut_line = False
+    if end - start > max_chars:
+        # End after the last whole line that fits, or within a line too long to fit
+        newline = data.rfind(b"\n", start, start + max_chars)
+        if newline == -1:
+            end, last, cut_line = start + max_chars, first + 1, True
+        else:
+            end = newline + 1
+            last = first + data[start:end].count(b"\n")
+    text = data[start:end].decode(encoding, errors="replace")
+
+    if first == 0 and last == total and not cut_line:
+        return text
+    if first >= total and total:
+        return f"(offset {offset} is past the end of the file, which has {total:,} lines)"
+    if text and not text.endswith("\n"):
+        text += "\n"
+    note = f"... (lines {first + 1:,}-{last:,} of {total:,}"
+    if cut_line:
+        note += f"; line {last:,} is cut after {max_chars:,} bytes"
+    if last < total:
+        note += f"; continue with offset={last}"
+    return text + note + ")"
+
+
+class _SeenRead(NamedTuple):
+    """What a read returned: the file version it came from and a hash of the text."""
+
+    mtime: int
+    size: int
+    digest: bytes
+    chars: int
+    nbytes: int
+
+
+class ReadCache:
+    """Remembers what the model has read in one session, to avoid sending it twice.
+
+    Reads are keyed by resolved path and line range. If the file's mtime and
+    size are those of the previous read, it is not read again; if they
+    changed but the text hashes the same, it is not sent again. Either way
+    the tool returns a short marker instead of the text. Share one cache
+    between all file tools of a chat; `Chat` does this for its tools.
+    """
+
+    def __init__(self):
+        self._seen: Dict[Tuple, _SeenRead] = {}
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.unchanged = 0
+        self.chars_saved = 0
+        self.bytes_not_read = 0
+
+    def read(self, path: Path, offset: int = 0, limit: Optional[int] = None,
+             tail: Optional[int] = None, force: bool = False) -> Tuple[str, bool]:
+        """Read a range of lines with `read_lines`, unless the model already has it.
+
+        Returns:
+            The text (or a marker saying it is unchanged) and whether it was unchanged
+        """
+        path = Path(path).resolve()
+        key = (str(path), offset, limit, tail)
+        stat = os.stat(path)
+        with self._lock:
+            self.reads += 1
+            seen = self._seen.get(key)
+        if not force and seen is not None and (seen.mtime, seen.size) == (stat.st_mtime_ns, stat.st_size):
+            return self._unchanged(path, seen, read_from_disk=False), True
+
+        text = read_lines(path, offset, limit, tail)
+        encoded = text.encode("utf-8", errors="replace")
+        digest = hashlib.blake2b(encoded, digest_size=16).digest()
+        current = _SeenRead(stat.st_mtime_ns, stat.st_size, digest, len(text), len(encoded))
+        with self._lock:
+            self._seen[key] = current
+        if not force and seen is not None and seen.digest == digest:
+            return self._unchanged(path, current, read_from_disk=True), True
+        return text, False
+
+    def forget(self, path: Optional[Path] = None) -> None:
+        """Forget the reads of `path`, or of all files, so they are sent in full again."""
+        with self._lock:
+            if path is None:
+                self._seen.clear()
+            else:
+                resolved = str(Path(path).resolve())
+                for key in [key for key in self._seen if key[0] == resolved]:
+                    del self._seen[key]
+
+    def summary(self) -> str:
+        """Describe the reads avoided so far."""
+        return (f"{self.unchanged} of {self.reads} reads unchanged, "
+                f"~{self.chars_saved // CHARS_PER_TOKEN:,} tokens and {self.bytes_not_read:,} bytes of disk reads saved")
+
+    def _unchanged(self, path: Path, seen: _SeenRead, read_from_disk: bool) -> str:
+        marker = (f"(unchanged: {path.name} is the same as when you last read these lines; "
+                  f"call read_file again with force=True for the full text)")
+        with self._lock:
+            self.unchanged += 1
+            self.chars_saved += max(0, seen.chars - len(marker))
+            if not read_from_disk:
+                self.bytes_not_read += seen.nbytes
+        return marker
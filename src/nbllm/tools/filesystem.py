@@ -1,27 +1,62 @@
 """File tools for the nbllm assistant."""
 
-from typing import Optional
+from typing import Callable, List, Optional
 from pathlib import Path
-import difflib
+import os
 import re
 import llm
 from rich import get_console
 from rich.prompt import Confirm, Prompt
 
 from .. import ui
+from .editing import DECLINED, EditError, apply_edits, confirm_and_write, parse_edits, read_text, replace_all, show_diff, write_atomic
+from .file_reading import ReadCache
+from .journal import EditJournal
+from .outline import outline, read_symbol
+from .repo_map import DEFAULT_TOKENS, RepoMap
+from .search import MAX_RESULTS, search_tree
+from .tree import glob_files, render_tree
+from ..tool_scheduler import requires_confirmation
 
 
 class FileSystem(llm.Toolbox):
     """File system operations toolbox - can work with multiple files and directories."""
     
-    def __init__(self, working_directory: str = "."):
+    def __init__(self, working_directory: str = ".", read_cache: Optional[ReadCache] = None, journal: Optional[EditJournal] = None):
         self.working_directory = Path(working_directory).resolve()
+        self.read_cache = read_cache if read_cache is not None else ReadCache()
+        self.journal = journal if journal is not None else EditJournal()
+        self._repo_map: Optional[RepoMap] = None
     
     def _debug_return(self, value: str) -> str:
         """Helper to show what the LLM receives from tools"""
         ui.tool_debug(f"\n>>> Tool returning to LLM: {repr(value)}\n")
         return value
         
+    def _cached_read(self, full_path: Path, offset: int, limit: Optional[int], tail: Optional[int], force: bool) -> str:
+        """Read through the read cache, reporting its savings in debug mode."""
+        text, unchanged = self.read_cache.read(full_path, offset, limit, tail, force)
+        if unchanged:
+            ui.tool_debug(f">>> Read cache: {self.read_cache.summary()}")
+        return text
+    
+    def _undo(self, path: Optional[Path], name: Callable[[Path], str]) -> str:
+        """Revert the last edit (of `path`) after showing its diff and asking the user."""
+        def confirm(current, reverted, spans, edited_path):
+            if show_diff(current, reverted, spans, name(edited_path)):
+                ui.print_empty_line()
+            return ui.confirm("Undo this edit?", default=True)
+        
+        try:
+            entry = self.journal.undo(path, confirm)
+        except EditError as e:
+            return f"Error: {e}"
+        if entry is None:
+            ui.tool_error("Undo cancelled. Please provide new instructions.")
+            return DECLINED
+        removed, added = entry.lines_changed()
+        return f"Reverted the {entry.description} of '{name(entry.path)}' (-{added} +{removed} lines)"
+        
     def _resolve_path(self, file_path: str) -> Path:
         if Path(file_path).is_absolute():
             return Path(file_path).resolve()
@@ -34,109 +69,154 @@ class FileSystem(llm.Toolbox):
         target_dir = self._resolve_path(directory) if directory else self.working_directory
         
         items = []
-        for item in sorted(target_dir.iterdir()):
-            if item.is_dir():
-                items.append(f"{item.name}/ [DIR]")
-            else:
-                items.append(f"{item.name} ({item.stat().st_size} bytes)")
+        with os.scandir(target_dir) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.is_dir():
+                    items.append(f"{entry.name}/ [DIR]")
+                else:
+                    items.append(f"{entry.name} ({entry.stat().st_size} bytes)")
                 
         return self._debug_return(f"Files in {target_dir}:\n" + "\n".join(items) if items else "No files found")
     
-    def read_file(self, file_path: str) -> str:
-        """Read content from a file."""
-        ui.tool_debug(f">>> LLM calling tool: read_file(file_path={repr(file_path)})")
+    def tree(self, path: Optional[str] = None, depth: int = 3) -> str:
+        """Show the layout of a directory as an indented tree, depth levels deep. Deeper directories, directories excluded by .gitignore and the files of very large directories are summarized by their counts, so the output stays short. Prefer this over repeated list_files calls."""
+        ui.tool_debug(f">>> LLM calling tool: tree(path={repr(path)}, depth={depth})")
+        ui.tool_status(f"Listing the tree of {path or 'current directory'}...")
+        root, relative = self._tree_root(path)
+        if root is None:
+            return self._debug_return(f"Error: '{path}' is not a directory")
+        return self._debug_return(render_tree(root, relative, depth))
+    
+    def glob(self, pattern: str, path: Optional[str] = None) -> str:
+        """List the files matching a glob pattern, such as "*.py" (a name in any directory) or "src/**/test_*.py" (relative to path, default the working directory). Files excluded by .gitignore are skipped."""
+        ui.tool_debug(f">>> LLM calling tool: glob(pattern={repr(pattern)}, path={repr(path)})")
+        ui.tool_status(f"Finding files matching {pattern}...")
+        root, relative = self._tree_root(path)
+        if root is None:
+            return self._debug_return(f"Error: '{path}' is not a directory")
+        return self._debug_return(glob_files(root, pattern, relative))
+    
+    def _tree_root(self, path: Optional[str]):
+        """Split a directory into the root whose .gitignore files apply and the path below it, or (None, None)."""
+        if not path:
+            return self.working_directory, ""
+        full_path = self._resolve_path(path)
+        if not full_path.is_dir():
+            return None, None
+        try:
+            return self.working_directory, full_path.relative_to(self.working_directory).as_posix()
+        except ValueError:
+            return full_path, ""
+    
+    def repo_map(self, max_tokens: int = DEFAULT_TOKENS) -> str:
+        """Summarize the source files of the working directory in about max_tokens tokens: the files whose classes and functions the other files use most come first, each with those classes and functions, their signatures and line numbers. Call this first in an unfamiliar repository instead of listing and reading files one by one; use outline, read_symbol or read_file for details."""
+        ui.tool_debug(f">>> LLM calling tool: repo_map(max_tokens={max_tokens})")
+        ui.tool_status("Mapping the repository...")
+        if self._repo_map is None:
+            self._repo_map = RepoMap(self.working_directory)
+        return self._debug_return(self._repo_map.render(max_tokens))
+    
+    def read_file(self, file_path: str, offset: int = 0, limit: Optional[int] = None, tail: Optional[int] = None, force: bool = False) -> str:
+        """Read lines from a file. Large files are returned in parts: a note at the end gives the lines shown, the total number of lines and the offset to continue from. offset skips that many lines, limit caps the number of lines, and tail reads the last lines instead (e.g. of a log). If the lines did not change since you last read them, a short note says so instead; set force to get the full text anyway. Binary files (images, archives, ...) get a short summary with a hexdump instead of their content."""
+        ui.tool_debug(f">>> LLM calling tool: read_file(file_path={repr(file_path)}, offset={offset}, limit={limit}, tail={tail}, force={force})")
         ui.tool_status(f"Reading file: {file_path}")
         full_path = self._resolve_path(file_path)
-        content = full_path.read_text(encoding='utf-8', errors='replace')
-        
-        if len(content) > 50_000:
-            content = content[:50_000] + "\n... (truncated)"
-            
-        return self._debug_return(content)
+        return self._debug_return(self._cached_read(full_path, offset, limit, tail, force))
+    
+    def outline(self, file_path: str) -> str:
+        """Outline a Python file: its classes and functions with their signatures and line ranges, nested by indentation. Much shorter than reading the file; use read_symbol to read one of them."""
+        ui.tool_debug(f">>> LLM calling tool: outline(file_path={repr(file_path)})")
+        ui.tool_status(f"Outlining file: {file_path}")
+        full_path = self._resolve_path(file_path)
+        if not full_path.is_file():
+            return self._debug_return(f"Error: '{file_path}' is not a file")
+        return self._debug_return(outline(full_path))
+    
+    def read_symbol(self, file_path: str, symbol: str) -> str:
+        """Read the source of one class or function of a Python file, e.g. symbol="Chat.switch_mode" (or just "switch_mode" if the name is unique), with its line range. Use this instead of read_file to see or edit one function."""
+        ui.tool_debug(f">>> LLM calling tool: read_symbol(file_path={repr(file_path)}, symbol={repr(symbol)})")
+        ui.tool_status(f"Reading {symbol} from: {file_path}")
+        full_path = self._resolve_path(file_path)
+        if not full_path.is_file():
+            return self._debug_return(f"Error: '{file_path}' is not a file")
+        return self._debug_return(read_symbol(full_path, symbol))
+    
+    def search(self, pattern: str, path: Optional[str] = None, glob: Optional[str] = None, context: int = 0, max_results: int = MAX_RESULTS, ignore_case: bool = False) -> str:
+        """Search file contents for a Python regular expression and list the matching lines as path:line: text. Limit the search to a file or directory with path and to file names with glob (e.g. "*.py"); context adds lines around each match. Binary files and files excluded by .gitignore are skipped, and the search stops after max_results matching lines."""
+        ui.tool_debug(f">>> LLM calling tool: search(pattern={repr(pattern)}, path={repr(path)}, glob={repr(glob)}, context={context}, max_results={max_results}, ignore_case={ignore_case})")
+        ui.tool_status(f"Searching for {pattern!r} in {path or 'current directory'}...")
+        root, relative = self.working_directory, ""
+        if path:
+            full_path = self._resolve_path(path)
+            if not full_path.exists():
+                return self._debug_return(f"Error: '{path}' does not exist")
+            try:
+                relative = full_path.relative_to(root).as_posix()
+            except ValueError:
+                # Outside the working directory: search it on its own
+                root, relative = (full_path.parent, full_path.name) if full_path.is_file() else (full_path, "")
+        try:
+            result = search_tree(root, pattern, relative, glob, context, max_results, ignore_case)
+        except re.error as e:
+            return self._debug_return(f"Error: invalid regular expression {pattern!r}: {e}")
+        return self._debug_return(result)
     
     def write_file(self, file_path: str, content: str) -> str:
         """Write content to a file."""
         ui.tool_debug(f">>> LLM calling tool: write_file(file_path={repr(file_path)}, content=<{len(content)} chars>)")
         ui.tool_status(f"Writing {len(content):,} characters to: {file_path}")
         full_path = self._resolve_path(file_path)
-        full_path.parent.mkdir(parents=True, exist_ok=True)
-        full_path.write_text(content, encoding='utf-8')
+        existed = full_path.exists()
+        try:
+            original_content = read_text(full_path) if existed else None
+        except (OSError, UnicodeDecodeError):
+            original_content = None
+        write_atomic(full_path, content)
+        # Overwritten files that were not text can't be restored
+        if original_content is not None or not existed:
+            self.journal.record(full_path, original_content, content, description="write_file")
         
         return self._debug_return(f"Wrote {len(content):,} characters to '{file_path}'")
     
+    @requires_confirmation
     def replace_in_file(self, file_path: str, old_string: str, new_string: str) -> str:
         """Replace string in file and show diff. The user may deny the change, in which case you should wait for new instructions."""
         ui.tool_debug(f">>> LLM calling tool: replace_in_file(file_path={repr(file_path)}, old_string=<{len(old_string)} chars>, new_string=<{len(new_string)} chars>)")
         ui.tool_status(f"Preparing to replace text in: {file_path}")
         full_path = self._resolve_path(file_path)
-        original_content = full_path.read_text(encoding='utf-8')
-        new_content = original_content.replace(old_string, new_string)
-        
-        diff_lines = list(difflib.unified_diff(
-            original_content.splitlines(keepends=True),
-            new_content.splitlines(keepends=True),
-            fromfile=f"{file_path} (before)",
-            tofile=f"{file_path} (after)",
-            n=3
-        ))
-        
-        if diff_lines:
-            # Show the diff with custom formatting
-            ui.tool_warning("Proposed changes:")
-            ui.print("")
-            
-            # Parse the diff to add line numbers and colors
-            line_num_old = 0
-            line_num_new = 0
-            
-            for line in diff_lines:
-                if line.startswith('---') or line.startswith('+++'):
-                    # File headers
-                    ui.print(f"[dim]{line.rstrip()}[/dim]")
-                elif line.startswith('@@'):
-                    # Hunk header - extract line numbers
-                    match = re.search(r'-(\d+)(?:,\d+)? \+(\d+)(?:,\d+)?', line)
-                    if match:
-                        line_num_old = int(match.group(1))
-                        line_num_new = int(match.group(2))
-                    ui.print(f"[cyan]{line.rstrip()}[/cyan]")
-                elif line.startswith('-'):
-                    # Removed line
-                    ui.print(f"[on red][white]{line_num_old:4d} {line.rstrip()}[/white][/on red]")
-                    line_num_old += 1
-                elif line.startswith('+'):
-                    # Added line
-                    ui.print(f"[on green][white]{line_num_new:4d} {line.rstrip()}[/white][/on green]")
-                    line_num_new += 1
-                elif line.startswith(' '):
-                    # Context line
-                    ui.print(f"[dim]{line_num_old:4d}[/dim] {line.rstrip()}")
-                    line_num_old += 1
-                    line_num_new += 1
-                else:
-                    # Other lines (shouldn't happen in unified diff)
-                    ui.print(line.rstrip())
-            
-            ui.print("")  # Extra newline for clarity
-            
-            # Ask for confirmation
-            ui.print_empty_line()  # Empty line for clarity
-            confirm = ui.confirm(
-                "Apply these changes?", 
-                default=True
-            )
-            
-            if confirm:
-                full_path.write_text(new_content, encoding='utf-8')
-                return self._debug_return(f"Applied changes to '{file_path}'")
-            else:
-                ui.tool_error("Changes cancelled. Please provide new instructions.")
-                return self._debug_return("IMPORTANT: The user declined the changes. Do not continue with the task. Wait for new instructions from the user. IMPORTANT: Do not continue with the task.")
-        else:
-            return self._debug_return(f"No changes needed in '{file_path}'")
+        original_content = read_text(full_path)
+        new_content, spans = replace_all(original_content, old_string, new_string)
+        return self._debug_return(confirm_and_write(full_path, original_content, new_content, spans, file_path, self.journal, "replace_in_file"))
+    
+    @requires_confirmation
+    def multi_edit(self, file_path: str, edits: List[dict]) -> str:
+        """Apply several replacements to one file at once, with a single diff for the user to confirm. Each edit is {"old_string": ..., "new_string": ..., "expected_count": 1}: old_string must occur exactly expected_count times (default 1) in the original file, and edits must not overlap. If any edit does not match, nothing is written. Prefer this over several replace_in_file calls on the same file. The user may deny the change, in which case you should wait for new instructions."""
+        ui.tool_debug(f">>> LLM calling tool: multi_edit(file_path={repr(file_path)}, edits=<{len(edits)} edits>)")
+        ui.tool_status(f"Preparing {len(edits)} edits to: {file_path}")
+        full_path = self._resolve_path(file_path)
+        try:
+            original_content = read_text(full_path)
+            new_content, spans = apply_edits(original_content, parse_edits(edits))
+        except (OSError, EditError) as e:
+            return self._debug_return(f"Error: {e}. No changes were written.")
+        return self._debug_return(confirm_and_write(full_path, original_content, new_content, spans, file_path, self.journal, "multi_edit"))
+    
+    @requires_confirmation
+    def undo_last_edit(self, file_path: Optional[str] = None) -> str:
+        """Undo the last edit made in this session (by write_file, replace_in_file or multi_edit), or the last edit of file_path. The user sees the diff and may deny it. Undo is refused if the file changed outside this session since the edit."""
+        ui.tool_debug(f">>> LLM calling tool: undo_last_edit(file_path={repr(file_path)})")
+        ui.tool_status(f"Preparing to undo the last edit{f' of {file_path}' if file_path else ''}")
+        path = self._resolve_path(file_path) if file_path else None
+        return self._debug_return(self._undo(path, self._display_path))
+    
+    def _display_path(self, path: Path) -> str:
+        try:
+            return path.relative_to(self.working_directory).as_posix()
+        except ValueError:
+            return str(path)
 
 
-def FileTool(file_path: Optional[str] = None):
+def FileTool(file_path: Optional[str] = None, read_cache: Optional[ReadCache] = None, journal: Optional[EditJournal] = None):
     """Factory function to create a FileTool with file-specific docstring."""
     if file_path is None:
         file_path = ui.input("Enter the path to the file you want to edit: ")
@@ -146,10 +226,15 @@ def FileTool(file_path: Optional[str] = None):
         raise FileNotFoundError(f"File does not exist: {file_path}")
     
     class _FileTool(llm.Toolbox):
-        f"""Single file editing toolbox - focused on editing {file_path_obj.name}. This tool cannot be used to open or edit other files."""
+        """Single file editing toolbox - focused on editing {name}. This tool cannot be used to open or edit other files."""
         
         def __init__(self):
             self.file_path = file_path_obj
+            self.read_cache = read_cache if read_cache is not None else ReadCache()
+            self.journal = journal if journal is not None else EditJournal()
+        
+        _cached_read = FileSystem._cached_read
+        _undo = FileSystem._undo
         
         def _debug_return(self, value: str) -> str:
             """Helper to show what the LLM receives from tools"""
@@ -162,87 +247,56 @@ def FileTool(file_path: Optional[str] = None):
             ui.tool_status(f"Getting file path for: {self.file_path.name}")
             return self._debug_return(f"This tool can only access one file: {self.file_path}. Other files exist but are not accessible through this tool.")
         
-        def read_file(self) -> str:
-            f"""Read the content of {self.file_path.name}. This tool cannot be used to open or edit other files."""
-            ui.tool_debug(">>> LLM calling tool: read_file()")
+        def read_file(self, offset: int = 0, limit: Optional[int] = None, tail: Optional[int] = None, force: bool = False) -> str:
+            """Read lines of {name}. Large files are returned in parts: a note at the end gives the lines shown, the total number of lines and the offset to continue from. offset skips that many lines, limit caps the number of lines, and tail reads the last lines instead. If the lines did not change since you last read them, a short note says so instead; set force to get the full text anyway. Binary files get a short summary with a hexdump instead. This tool cannot be used to open or edit other files."""
+            ui.tool_debug(f">>> LLM calling tool: read_file(offset={offset}, limit={limit}, tail={tail}, force={force})")
             ui.tool_status(f"Reading file: {self.file_path.name}")
-            
-            content = self.file_path.read_text(encoding='utf-8', errors='replace')
-            
-            if len(content) > 50_000:
-                content = content[:50_000] + "\n... (truncated)"
-                
-            return self._debug_return(content)
+            return self._debug_return(self._cached_read(self.file_path, offset, limit, tail, force))
+        
+        def outline(self) -> str:
+            """Outline {name} if it is a Python file: its classes and functions with their signatures and line ranges, nested by indentation. Much shorter than reading the file; use read_symbol to read one of them."""
+            ui.tool_debug(">>> LLM calling tool: outline()")
+            ui.tool_status(f"Outlining file: {self.file_path.name}")
+            return self._debug_return(outline(self.file_path))
+        
+        def read_symbol(self, symbol: str) -> str:
+            """Read the source of one class or function of {name}, e.g. symbol="Chat.switch_mode" (or just "switch_mode" if the name is unique), with its line range. Use this instead of read_file to see or edit one function."""
+            ui.tool_debug(f">>> LLM calling tool: read_symbol(symbol={repr(symbol)})")
+            ui.tool_status(f"Reading {symbol} from: {self.file_path.name}")
+            return self._debug_return(read_symbol(self.file_path, symbol))
         
+        @requires_confirmation
         def replace_in_file(self, old_string: str, new_string: str) -> str:
-            f"""Replace string in {self.file_path.name} and show diff. The user may deny the change, in which case you should wait for new instructions. This tool cannot be used to open or edit other files."""
+            """Replace string in {name} and show diff. The user may deny the change, in which case you should wait for new instructions. This tool cannot be used to open or edit other files."""
             ui.tool_debug(f">>> LLM calling tool: replace_in_file(old_string=<{len(old_string)} chars>, new_string=<{len(new_string)} chars>)")
             ui.tool_status(f"Preparing to replace text in: {self.file_path.name}")
             
-            original_content = self.file_path.read_text(encoding='utf-8')
-            new_content = original_content.replace(old_string, new_string)
-            
-            diff_lines = list(difflib.unified_diff(
-                original_content.splitlines(keepends=True),
-                new_content.splitlines(keepends=True),
-                fromfile=f"{self.file_path.name} (before)",
-                tofile=f"{self.file_path.name} (after)",
-                n=3
-            ))
-            
-            if diff_lines:
-                # Show the diff with custom formatting
-                ui.tool_warning("Proposed changes:")
-                ui.print_empty_line()
-                
-                # Parse the diff to add line numbers and colors
-                line_num_old = 0
-                line_num_new = 0
-                
-                for line in diff_lines:
-                    if line.startswith('---') or line.startswith('+++'):
-                        # File headers
-                        ui.print(f"[dim]{line.rstrip()}[/dim]")
-                    elif line.startswith('@@'):
-                        # Hunk header - extract line numbers
-                        match = re.search(r'-(\d+)(?:,\d+)? \+(\d+)(?:,\d+)?', line)
-                        if match:
-                            line_num_old = int(match.group(1))
-                            line_num_new = int(match.group(2))
-                        ui.print(f"[cyan]{line.rstrip()}[/cyan]")
-                    elif line.startswith('-'):
-                        # Removed line
-                        ui.print(f"[on red][white]{line_num_old:4d} {line.rstrip()}[/white][/on red]")
-                        line_num_old += 1
-                    elif line.startswith('+'):
-                        # Added line
-                        ui.print(f"[on green][white]{line_num_new:4d} {line.rstrip()}[/white][/on green]")
-                        line_num_new += 1
-                    elif line.startswith(' '):
-                        # Context line
-                        ui.print(f"[dim]{line_num_old:4d}[/dim] {line.rstrip()}")
-                        line_num_old += 1
-                        line_num_new += 1
-                    else:
-                        # Other lines (shouldn't happen in unified diff)
-                        ui.print(line.rstrip())
-                
-                ui.print("")  # Extra newline for clarity
-                
-                # Ask for confirmation
-                ui.print_empty_line()  # Empty line for clarity
-                confirm = ui.confirm(
-                    "Apply these changes?", 
-                    default=True
-                )
-                
-                if confirm:
-                    self.file_path.write_text(new_content, encoding='utf-8')
-                    return self._debug_return(f"Applied changes to '{self.file_path.name}'")
-                else:
-                    ui.tool_error("Changes cancelled. Please provide new instructions.")
-                    return self._debug_return("IMPORTANT: The user declined the changes. Do not continue with the task. Wait for new instructions from the user. IMPORTANT: Do not continue with the task.")
-            else:
-                return self._debug_return(f"No changes needed in '{self.file_path.name}'")
+            original_content = read_text(self.file_path)
+            new_content, spans = replace_all(original_content, old_string, new_string)
+            return self._debug_return(confirm_and_write(self.file_path, original_content, new_content, spans, self.file_path.name, self.journal, "replace_in_file"))
+        
+        @requires_confirmation
+        def multi_edit(self, edits: List[dict]) -> str:
+            """Apply several replacements to {name} at once, with a single diff for the user to confirm. Each edit is {{"old_string": ..., "new_string": ..., "expected_count": 1}}: old_string must occur exactly expected_count times (default 1) in the original file, and edits must not overlap. If any edit does not match, nothing is written. Prefer this over several replace_in_file calls. The user may deny the change, in which case you should wait for new instructions. This tool cannot be used to open or edit other files."""
+            ui.tool_debug(f">>> LLM calling tool: multi_edit(edits=<{len(edits)} edits>)")
+            ui.tool_status(f"Preparing {len(edits)} edits to: {self.file_path.name}")
+            try:
+                original_content = read_text(self.file_path)
+                new_content, spans = apply_edits(original_content, parse_edits(edits))
+            except (OSError, EditError) as e:
+                return self._debug_return(f"Error: {e}. No changes were written.")
+            return self._debug_return(confirm_and_write(self.file_path, original_content, new_content, spans, self.file_path.name, self.journal, "multi_edit"))
+        
+        @requires_confirmation
+        def undo_last_edit(self) -> str:
+            """Undo the last edit made to {name} in this session. The user sees the diff and may deny it. Undo is refused if the file changed outside this session since the edit."""
+            ui.tool_debug(">>> LLM calling tool: undo_last_edit()")
+            ui.tool_status(f"Preparing to undo the last edit of: {self.file_path.name}")
+            return self._debug_return(self._undo(self.file_path, lambda path: path.name))
     
+    # Docstrings are the tool descriptions, so they name the file once it is known
+    _FileTool.__doc__ = _FileTool.__doc__.format(name=file_path_obj.name)
+    for attribute in vars(_FileTool).values():
+        if callable(attribute) and not attribute.__name__.startswith("_"):
+            attribute.__doc__ = attribute.__doc__.format(name=file_path_obj.name)
     return _FileTool()
\ No newline at end of file
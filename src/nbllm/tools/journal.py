@@ -0,0 +1,195 @@
+"""Undo and redo of the file edits made in a session."""
+
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Tuple
+import hashlib
+import os
+import threading
+import time
+
+from .editing import EditError, read_text, replace_spans, write_atomic
+
+
+# Most edits kept for undo; older ones are dropped
+MAX_ENTRIES = 1000
+
+
+class _Change(NamedTuple):
+    """One replaced piece of a file: `old_text` at `start` of the old content became `new_text`."""
+
+    start: int
+    old_text: str
+    new_text: str
+
+
+class JournalEntry(NamedTuple):
+    """An edit of one file, stored as the pieces it changed and hashes of both versions."""
+
+    path: Path
+    description: str
+    changes: List[_Change]
+    before: Optional[bytes]   # None: the edit created the file
+    after: bytes
+    time: float
+
+    def lines_changed(self) -> Tuple[int, int]:
+        """Number of lines removed and added."""
+        removed = sum(change.old_text.count("\n") for change in self.changes)
+        added = sum(change.new_text.count("\n") for change in self.changes)
+        return removed, added
+
+
+def _digest(content: str) -> bytes:
+    return hashlib.blake2b(content.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+
+
+def _changed_range(old: str, new: str) -> Tuple[int, int]:
+    """Length of the common prefix and suffix of two texts, found by bisection on slices."""
+    low, high = 0, min(len(old), len(new))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[:middle] == new[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    prefix = low
+    low, high = 0, min(len(old), len(new)) - prefix
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[len(old) - middle:] == new[len(new) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return prefix, low
+
+
+class EditJournal:
+    """Remembers the file edits of a session so they can be undone and redone.
+
+    Each edit keeps only the text it replaced and the text replacing it,
+    plus hashes of the file before and after, so hundreds of edits to large
+    files take little memory. Undo refuses when the file no longer hashes
+    as it did right after the edit, i.e. it changed outside the session;
+    redo refuses likewise. Share one journal between all file tools of a
+    chat; `Chat` does this for its tools.
+
+    Args:
+        max_entries: Number of edits kept for undo
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._done: List[JournalEntry] = []
+        self._undone: List[JournalEntry] = []
+        self._lock = threading.Lock()
+
+    def record(self, path: Path, before: Optional[str], after: str,
+               spans: Optional[List[Tuple[int, int, str]]] = None, description: str = "edit") -> None:
+        """Record an edit that was written to `path`.
+
+        Args:
+            path: Edited file
+            before: Content before the edit, or None if the edit created the file
+            after: Content written
+            spans: Replaced (start, end, new text) in `before`, if known; otherwise
+                the changed range is found by comparing both versions
+            description: What made the edit, shown by `history`
+        """
+        if before is None:
+            changes = [_Change(0, "", after)]
+        elif spans is None:
+            prefix, suffix = _changed_range(before, after)
+            changes = [_Change(prefix, before[prefix:len(before) - suffix], after[prefix:len(after) - suffix])]
+        else:
+            changes = [_Change(start, before[start:end], new_text) for start, end, new_text in spans]
+        entry = JournalEntry(
+            Path(path).resolve(), description, changes,
+            None if before is None else _digest(before), _digest(after), time.time(),
+        )
+        with self._lock:
+            self._done.append(entry)
+            del self._done[:-self.max_entries]
+            self._undone.clear()
+
+    def undo(self, path: Optional[Path] = None,
+             confirm: Optional[Callable[[str, str, List[Tuple[int, int, str]], Path], bool]] = None) -> Optional[JournalEntry]:
+        """Revert the last edit, or the last edit of `path`.
+
+        Args:
+            path: Only consider edits of this file
+            confirm: Called with the current content, the reverted content, the
+                replaced spans and the path; the edit is kept if it returns False
+
+        Returns:
+            The reverted entry, or None if `confirm` declined
+
+        Raises:
+            EditError: If there is nothing to undo or the file changed since the edit
+        """
+        return self._move(self._done, self._undone, path, confirm, undo=True)
+
+    def redo(self, path: Optional[Path] = None,
+             confirm: Optional[Callable[[str, str, List[Tuple[int, int, str]], Path], bool]] = None) -> Optional[JournalEntry]:
+        """Apply the last undone edit again, or the last undone edit of `path`; see `undo`."""
+        return self._move(self._undone, self._done, path, confirm, undo=False)
+
+    def history(self) -> Tuple[List[JournalEntry], List[JournalEntry]]:
+        """The edits that can be undone and those that can be redone, oldest first."""
+        with self._lock:
+            return list(self._done), list(self._undone)
+
+    def _move(self, source: List[JournalEntry], target: List[JournalEntry], path: Optional[Path],
+              confirm, undo: bool) -> Optional[JournalEntry]:
+        with self._lock:
+            resolved = None if path is None else Path(path).resolve()
+            index = next(
+                (i for i in range(len(source) - 1, -1, -1) if resolved is None or source[i].path == resolved),
+                None,
+            )
+            if index is None:
+                what = "undo" if undo else "redo"
+                raise EditError(f"nothing to {what}" + ("" if resolved is None else f" for {resolved.name}"))
+            entry = source[index]
+
+            expected = entry.after if undo else entry.before
+            exists = entry.path.exists()
+            if expected is None:
+                # Redoing the creation of a file
+                if exists:
+                    raise EditError(f"{entry.path.name} was created again outside this session")
+                current = ""
+            else:
+                try:
+                    current = read_text(entry.path) if exists else None
+                except (OSError, UnicodeDecodeError):
+                    current = None
+                if current is None or _digest(current) != expected:
+                    raise EditError(
+                        f"{entry.path.name} changed outside this session since the edit; "
+                        f"not {'undoing' if undo else 'redoing'} it"
+                    )
+
+            spans = self._spans(entry, undo)
+            new_content = replace_spans(current, spans)
+            if confirm is not None and not confirm(current, new_content, spans, entry.path):
+                return None
+            if undo and entry.before is None:
+                os.unlink(entry.path)
+            else:
+                write_atomic(entry.path, new_content)
+            del source[index]
+            target.append(entry)
+            return entry
+
+    @staticmethod
+    def _spans(entry: JournalEntry, undo: bool) -> List[Tuple[int, int, str]]:
+        """Spans replacing the edit's changes in the content after it (undo) or before it (redo)."""
+        if not undo:
+            return [(change.start, change.start + len(change.old_text), change.new_text) for change in entry.changes]
+        spans, delta = [], 0
+        for change in entry.changes:
+            start = change.start + delta
+            spans.append((start, start + len(change.new_text), change.old_text))
+            delta += len(change.new_text) - len(change.old_text)
+        return spans
+
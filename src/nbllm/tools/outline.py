@@ -0,0 +1,172 @@
+"""Outlines of Python modules and the source of single symbols, from a cached AST index."""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple, Union
+import ast
+import difflib
+import io
+import os
+import threading
+
+
+# Number of module indexes kept, for the most recently used files
+_CACHE_SIZE = 64
+
+# Longer signatures are shortened in outlines
+_MAX_SIGNATURE = 120
+
+# Suffixes of the files that can be outlined
+PYTHON_SUFFIXES = (".py", ".pyi", ".pyw")
+
+_indexes: "OrderedDict[str, Tuple[Tuple[int, int], ModuleIndex]]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class Symbol(NamedTuple):
+    """A class or function of a module."""
+
+    name: str           # Qualified, e.g. "Chat.switch_mode"
+    kind: str           # "class", "def" or "async def"
+    signature: str      # e.g. "switch_mode(self, new_mode: str)"
+    start: int          # First line, decorators included (1-based)
+    end: int            # Last line (1-based)
+    depth: int
+    in_function: bool   # Defined inside a function, left out of outlines
+
+
+def signature(node: ast.AST) -> str:
+    """The signature of a class or function definition, e.g. "switch_mode(self, new_mode: str)"."""
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases]
+        bases += [ast.unparse(keyword) for keyword in node.keywords]
+        return node.name + (f"({', '.join(bases)})" if bases else "")
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns is not None else ""
+    return f"{node.name}({ast.unparse(node.args)}){returns}"
+
+
+def _symbols(body: List[ast.stmt], prefix: str = "", depth: int = 0, in_function: bool = False) -> List[Symbol]:
+    symbols = []
+    for node in body:
+        if not isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        kind = "class" if isinstance(node, ast.ClassDef) else "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+        start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        name = prefix + node.name
+        symbols.append(Symbol(name, kind, signature(node), start, node.end_lineno, depth, in_function))
+        symbols.extend(_symbols(node.body, name + ".", depth + 1, in_function or kind != "class"))
+    return symbols
+
+
+class ModuleIndex:
+    """The classes and functions of a Python module and its lines.
+
+    Args:
+        source: Source code of the module
+        filename: File name used in syntax errors
+    """
+
+    def __init__(self, source: str, filename: str = "<unknown>"):
+        tree = ast.parse(source, filename)
+        # Only the line endings ast counts, not form feeds and other separators str.splitlines knows
+        self.lines = io.StringIO(source, newline="").readlines()
+        self.symbols = _symbols(tree.body)
+        self._by_name = {symbol.name: symbol for symbol in self.symbols}
+
+    def outline(self) -> str:
+        """Classes and functions with their signatures and line ranges, indented by nesting."""
+        if not self.symbols:
+            return f"(no classes or functions; {len(self.lines):,} lines)"
+        lines = []
+        for symbol in self.symbols:
+            if symbol.in_function:
+                continue
+            signature = symbol.signature
+            if len(signature) > _MAX_SIGNATURE:
+                signature = signature[:_MAX_SIGNATURE - 4] + "...)"
+            lines.append(f"{'    ' * symbol.depth}{symbol.kind} {signature}  # lines {symbol.start}-{symbol.end}")
+        lines.append(f"({len(self.lines):,} lines)")
+        return "\n".join(lines)
+
+    def find(self, name: str) -> Optional[Symbol]:
+        """Find a symbol by its qualified name, or by its own name if that is unique."""
+        symbol = self._by_name.get(name)
+        if symbol is not None:
+            return symbol
+        matches = [symbol for symbol in self.symbols if symbol.name.rsplit(".", 1)[-1] == name]
+        return matches[0] if len(matches) == 1 else None
+
+    def source(self, symbol: Symbol) -> str:
+        """The source lines of a symbol, decorators included."""
+        return "".join(self.lines[symbol.start - 1:symbol.end])
+
+    def similar(self, name: str) -> List[str]:
+        """Qualified names resembling `name`, to suggest when it is not found."""
+        names = [symbol.name for symbol in self.symbols]
+        suffix = [candidate for candidate in names if candidate.endswith("." + name.rsplit(".", 1)[-1])]
+        return suffix or difflib.get_close_matches(name, names, n=3, cutoff=0.8)
+
+
+def module_index(path: Union[str, Path]) -> ModuleIndex:
+    """Return the index of a Python file, parsing it again only if its mtime or size changed.
+
+    Raises:
+        OSError: If the file cannot be read
+        SyntaxError: If it is not valid Python
+    """
+    path = str(Path(path).resolve())
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _indexes_lock:
+        cached = _indexes.get(path)
+        if cached is not None and cached[0] == key:
+            _indexes.move_to_end(path)
+            return cached[1]
+    with open(path, "rb") as f:
+        data = f.read()
+    index = ModuleIndex(data.decode("utf-8", errors="replace"), path)
+    with _indexes_lock:
+        _indexes[path] = (key, index)
+        _indexes.move_to_end(path)
+        while len(_indexes) > _CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _unsupported(path: Union[str, Path]) -> Optional[str]:
+    if Path(path).suffix not in PYTHON_SUFFIXES:
+        return f"Error: only Python files can be outlined, not {Path(path).name}; use read_file or search instead"
+    return None
+
+
+def _index_or_error(path: Union[str, Path]) -> Union[ModuleIndex, str]:
+    """The index of a Python file, or an error for the model if it cannot be indexed."""
+    error = _unsupported(path)
+    if error is not None:
+        return error
+    try:
+        return module_index(path)
+    except SyntaxError as e:
+        return f"Error: cannot parse {Path(path).name} as Python (line {e.lineno}: {e.msg}); use read_file instead"
+    except Exception as e:
+        # Like the repository map, any other failure leaves the file to read_file
+        return f"Error: cannot outline {Path(path).name} ({type(e).__name__}: {e}); use read_file instead"
+
+
+def outline(path: Union[str, Path]) -> str:
+    """Outline a Python file for the model, or explain why it cannot be outlined."""
+    index = _index_or_error(path)
+    return index if isinstance(index, str) else index.outline()
+
+
+def read_symbol(path: Union[str, Path], name: str) -> str:
+    """The source of one class or function of a Python file, with its line range."""
+    index = _index_or_error(path)
+    if isinstance(index, str):
+        return index
+    symbol = index.find(name)
+    if symbol is None:
+        similar = index.similar(name)
+        hint = f"; did you mean {', '.join(similar)}?" if similar else "; call outline to list the symbols"
+        return f"Error: no class or function named '{name}' in {Path(path).name}{hint}"
+    return f"# {symbol.name}, lines {symbol.start}-{symbol.end} of {len(index.lines):,}\n{index.source(symbol)}"
@@ -14,6 +14,9 @@ class PlaywrightTool(llm.Toolbox):
         pip install nbllm[browser]
     """
     
+    # Playwright's sync API is bound to the thread that started it
+    run_serially = True
+    
     def __init__(self, headless: bool = False, browser_type: str = "chromium"):
         self.headless = headless
         self.browser_type = browser_type
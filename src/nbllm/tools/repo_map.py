@@ -0,0 +1,335 @@
+"""A ranked summary of the source files of a working tree, kept up to date in a cache on disk."""
+
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
+import ast
+import hashlib
+import json
+import os
+import re
+import stat as stat_module
+import threading
+
+from ..gitignore import walk
+from .editing import write_atomic
+from .file_reading import CHARS_PER_TOKEN
+from .outline import PYTHON_SUFFIXES, signature
+from .sniff import SNIFF_BYTES, sniff
+
+
+# Cached maps of all working trees, one file per tree
+CACHE_DIRECTORY = Path.home() / ".nbllm" / "repo_maps"
+
+# Every map starts with this
+MAP_TITLE = "Repository map of "
+
+# Token budget of a map, unless given
+DEFAULT_TOKENS = 1024
+
+# Larger files are left out of the map
+MAX_FILE_SIZE = 512 * 1024
+
+# Indexing stops after this many source files
+MAX_FILES = 20_000
+
+# Symbols listed per file; the others are counted
+MAX_SYMBOLS_PER_FILE = 20
+
+# Symbols are shortened to this many characters
+_MAX_SYMBOL = 100
+
+# Changes to the cache format make older caches be rebuilt
+_CACHE_VERSION = 1
+
+# Suffixes of the files mapped with the definitions regex, besides Python files
+SOURCE_SUFFIXES = frozenset([
+    ".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".go", ".rs", ".java", ".kt", ".scala", ".swift",
+    ".rb", ".php", ".lua", ".c", ".h", ".cc", ".cpp", ".hpp", ".cs", ".ex", ".exs", ".jl", ".r", ".R",
+])
+
+# A definition at the start of a line, i.e. at the top level of the file
+_DEFINITION = re.compile(
+    r"^(?:(?:export|default|public|private|protected|internal|static|abstract|final|sealed|data|"
+    r"async|pub(?:\([\w:]+\))?|unsafe|extern|inline|open|override|declare)\s+)*"
+    r"(?:class|interface|struct|enum|trait|type|fn|func|function\*?|def|defmodule|module|object|union)\s+"
+    r"(?:\([^)\n]*\)\s*)?([A-Za-z_$][\w$]*)",
+    re.MULTILINE,
+)
+
+# Names counted as references
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w+")
+
+# Languages whose files use the names of their whole directory without naming the file
+_PACKAGE_SUFFIXES = frozenset([".go"])
+
+
+class _Symbol(NamedTuple):
+    """A definition listed in the map."""
+
+    name: str
+    depth: int   # 0 for top-level definitions, 1 for methods
+    line: int
+    text: str    # e.g. "def outline(path: Union[str, Path]) -> str"
+
+
+class _FileEntry(NamedTuple):
+    """What the map keeps of a source file, with the stat data it was read with."""
+
+    mtime: int
+    size: int
+    symbols: List[_Symbol]
+    identifiers: str   # Names used in the file, separated by spaces
+
+
+def _shorten(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= _MAX_SYMBOL else text[:_MAX_SYMBOL - 3] + "..."
+
+
+def _python_symbols(source: str, filename: str) -> List[_Symbol]:
+    """Public top-level classes and functions, and the public methods of the classes."""
+    symbols = []
+
+    def add(nodes, depth):
+        for node in nodes:
+            if not isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            if node.name.startswith("_") and not (depth and node.name == "__init__"):
+                continue
+            kind = "class" if isinstance(node, ast.ClassDef) else "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+            symbols.append(_Symbol(node.name, depth, node.lineno, _shorten(f"{kind} {signature(node)}")))
+            if kind == "class" and depth == 0:
+                add(node.body, 1)
+
+    add(ast.parse(source, filename).body, 0)
+    return symbols
+
+
+def _regex_symbols(source: str) -> List[_Symbol]:
+    """Definitions starting a line, with the line as their text."""
+    symbols = []
+    # Count the lines from the previous definition on, not from the start of the file
+    line, counted = 1, 0
+    for match in _DEFINITION.finditer(source):
+        line_end = source.find("\n", match.start())
+        text = source[match.start():line_end if line_end >= 0 else len(source)].rstrip().rstrip("{").rstrip()
+        line += source.count("\n", counted, match.start())
+        counted = match.start()
+        symbols.append(_Symbol(match.group(1), 0, line, _shorten(text)))
+    return symbols
+
+
+def parse_file(path: Union[str, Path], data: bytes) -> Optional[Tuple[List[_Symbol], str]]:
+    """The symbols of a source file and the names it uses, or None for a binary file."""
+    if sniff(data[:SNIFF_BYTES], len(data)).binary:
+        return None
+    source = data.decode("utf-8", errors="replace")
+    symbols = None
+    if Path(path).suffix in PYTHON_SUFFIXES:
+        # Any failure, e.g. invalid syntax or a deeply nested expression, falls back to the regex
+        try:
+            symbols = _python_symbols(source, str(path))
+        except Exception:
+            pass
+    if symbols is None:
+        symbols = _regex_symbols(source)
+    return symbols, " ".join(sorted(set(_IDENTIFIER.findall(source))))
+
+
+def _format_file(path: str, symbols: List[_Symbol]) -> str:
+    lines = [f"{path}:"]
+    for symbol in symbols[:MAX_SYMBOLS_PER_FILE]:
+        lines.append(f"{'    ' * (symbol.depth + 1)}{symbol.text} [{symbol.line}]")
+    if len(symbols) > MAX_SYMBOLS_PER_FILE:
+        lines.append(f"    ... {len(symbols) - MAX_SYMBOLS_PER_FILE} more")
+    return "\n".join(lines)
+
+
+def _default_cache_path(root: Path) -> Path:
+    digest = hashlib.blake2b(str(root).encode("utf-8", errors="surrogatepass"), digest_size=8).hexdigest()
+    return CACHE_DIRECTORY / f"{root.name or 'root'}-{digest}.json"
+
+
+class RepoMap:
+    """A summary of the source files of a tree, most referenced first, within a token budget.
+
+    Each file is listed with its top-level classes and functions (and the
+    public methods of Python classes) and their signatures. A file ranks
+    higher the more other files use the names it defines. What was read of
+    each file is cached on disk with its mtime and size, so after the first
+    map only the files that changed are read again.
+
+    Args:
+        root: Root of the tree, whose `.gitignore` files apply
+        cache_path: JSON file keeping the map between sessions
+            (default: a file per tree in `CACHE_DIRECTORY`; False: none)
+    """
+
+    def __init__(self, root: Union[str, Path] = ".", cache_path: Union[str, Path, None, bool] = None):
+        self.root = Path(root).resolve()
+        if cache_path is None:
+            cache_path = _default_cache_path(self.root)
+        self.cache_path = Path(cache_path) if cache_path is not False else None
+        self._files: Optional[Dict[str, _FileEntry]] = None
+        self._ranking: Optional[List[Tuple[str, float]]] = None
+        self._lock = threading.Lock()
+
+    def update(self) -> int:
+        """Read the files that are new or changed since the last update and forget removed ones.
+
+        Returns:
+            Number of files read
+        """
+        with self._lock:
+            if self._files is None:
+                self._files = self._load()
+            seen, read = set(), 0
+            for directory, _, files in walk(self.root):
+                prefix = directory + "/" if directory else ""
+                for entry in files:
+                    suffix = os.path.splitext(entry.name)[1]
+                    if suffix not in PYTHON_SUFFIXES and suffix not in SOURCE_SUFFIXES:
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if not stat_module.S_ISREG(stat.st_mode) or stat.st_size > MAX_FILE_SIZE:
+                        continue
+                    relative = prefix + entry.name
+                    seen.add(relative)
+                    cached = self._files.get(relative)
+                    if cached is None or (cached.mtime, cached.size) != (stat.st_mtime_ns, stat.st_size):
+                        read += self._read(relative, stat)
+                    if len(seen) >= MAX_FILES:
+                        break
+                if len(seen) >= MAX_FILES:
+                    break
+            removed = [path for path in self._files if path not in seen]
+            for path in removed:
+                del self._files[path]
+            if read or removed:
+                self._ranking = None
+                self._save()
+            return read
+
+    def _read(self, relative: str, stat: os.stat_result) -> int:
+        try:
+            with open(self.root / relative, "rb") as f:
+                data = f.read(MAX_FILE_SIZE + 1)
+        except OSError:
+            return 0
+        parsed = parse_file(relative, data)
+        symbols, identifiers = parsed if parsed is not None else ([], "")
+        self._files[relative] = _FileEntry(stat.st_mtime_ns, stat.st_size, symbols, identifiers)
+        return 1
+
+    def _load(self) -> Dict[str, _FileEntry]:
+        if self.cache_path is None:
+            return {}
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != _CACHE_VERSION or data.get("root") != str(self.root):
+                return {}
+            return {
+                path: _FileEntry(mtime, size, [_Symbol(*symbol) for symbol in symbols], identifiers)
+                for path, (mtime, size, symbols, identifiers) in data["files"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            # A missing or damaged cache is rebuilt
+            return {}
+
+    def _save(self) -> None:
+        if self.cache_path is None:
+            return
+        data = {"version": _CACHE_VERSION, "root": str(self.root), "files": self._files}
+        try:
+            write_atomic(self.cache_path, json.dumps(data, separators=(",", ":")))
+        except OSError:
+            pass
+
+    def ranked(self) -> List[Tuple[str, float]]:
+        """Paths of the files with symbols and their scores, highest first.
+
+        Another file refers to a top-level symbol if it uses the symbol's
+        name and names the module defining it (the file's stem, or its
+        directory for a package `__init__` or a Go file). A symbol scores
+        its number of referring files, divided among the files defining
+        the same name, and a file the sum of its symbols; so a name that
+        many unrelated files happen to use counts only where it is imported.
+        """
+        return self._ranked_snapshot()[1]
+
+    def _ranked_snapshot(self) -> Tuple[Dict[str, _FileEntry], List[Tuple[str, float]]]:
+        """The files and their ranking, which is computed again only after files changed."""
+        with self._lock:
+            files = dict(self._files or {})
+            if self._ranking is None:
+                self._ranking = self._rank(files)
+            return files, self._ranking
+
+    @staticmethod
+    def _rank(files: Dict[str, _FileEntry]) -> List[Tuple[str, float]]:
+        top_level = {
+            path: {symbol.name for symbol in entry.symbols if symbol.depth == 0}
+            for path, entry in files.items() if entry.symbols
+        }
+        defined = Counter(name for names in top_level.values() for name in names)
+        module_names: Dict[str, Set[str]] = {}
+        directories: Dict[str, Set[str]] = {}
+        for path in top_level:
+            directory, _, filename = path.rpartition("/")
+            stem, suffix = os.path.splitext(filename)
+            module_names[path] = {stem}
+            if stem == "__init__" or suffix in _PACKAGE_SUFFIXES:
+                module_names[path].add(directory.rpartition("/")[2])
+            directories.setdefault(directory, set()).add(path)
+        # Only the files using a defined name or a module name are looked up
+        wanted = set(defined).union(*module_names.values())
+        users: Dict[str, Set[str]] = {}
+        for path, entry in files.items():
+            for name in wanted.intersection(entry.identifiers.split()):
+                users.setdefault(name, set()).add(path)
+
+        scores = []
+        for path, names in top_level.items():
+            directory, _, filename = path.rpartition("/")
+            suffix = os.path.splitext(filename)[1]
+            referring = set().union(*(users.get(name, ()) for name in module_names[path]))
+            if suffix in _PACKAGE_SUFFIXES:
+                referring |= directories[directory]
+            referring.discard(path)
+            score = sum(len(users.get(name, set()) & referring) / defined[name] for name in names)
+            scores.append((path, score))
+        scores.sort(key=lambda item: (-item[1], item[0].count("/"), item[0]))
+        return scores
+
+    def render(self, max_tokens: int = DEFAULT_TOKENS) -> str:
+        """Update the map and format it in about `max_tokens` tokens."""
+        self.update()
+        files, ranked = self._ranked_snapshot()
+        if not ranked:
+            return f"{MAP_TITLE}{self.root.name}: no source files found"
+        budget = max_tokens * CHARS_PER_TOKEN
+        header = (
+            f"{MAP_TITLE}{self.root.name}: {len(ranked):,} source files, the most used first, "
+            f"with their classes and functions (line numbers in brackets):"
+        )
+        # Room kept for the line counting the files left out
+        used = len(header) + 60
+        blocks = []
+        for path, _ in ranked:
+            block = _format_file(path, files[path].symbols)
+            if used + len(block) + 1 > budget:
+                # Without its symbols, the file may still fit
+                block = f"{path} ({len(files[path].symbols)} symbols)"
+                if used + len(block) + 1 > budget:
+                    break
+            blocks.append(block)
+            used += len(block) + 1
+        lines = [header, *blocks]
+        if len(blocks) < len(ranked):
+            lines.append(f"... {len(ranked) - len(blocks):,} more files; use search, glob or outline to find them")
+        return "\n".join(lines)
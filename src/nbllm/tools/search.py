@@ -0,0 +1,252 @@
+"""Regex search over a working tree."""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple, Union
+import itertools
+import os
+import re
+import threading
+
+from ..gitignore import glob_regex, walk
+from .sniff import SNIFF_BYTES, sniff
+
+
+# Most matching lines returned by one search
+MAX_RESULTS = 50
+
+# Larger files are skipped
+MAX_FILE_SIZE = 10 * 1024 * 1024
+
+# Files searched by one task of the thread pool
+_BATCH_SIZE = 16
+
+# Longer lines are shortened around the match
+_MAX_LINE_CHARS = 200
+
+# Lines that define something, listed first
+_DEFINITION = re.compile(
+    r"\s*(?:export\s+)?(?:async\s+)?(?:def|class|function|fn|func|interface|struct|enum|type|const|let|var)\b"
+)
+
+
+class _FileMatches(NamedTuple):
+    """The matching lines of one file, plus the lines around them."""
+
+    path: str
+    matches: List[int]                # 0-based line numbers
+    lines: List[Tuple[int, str]]      # (line number, text), matches and context in order
+    definitions: bool
+
+
+def _shorten(line: str, column: int) -> str:
+    if len(line) <= _MAX_LINE_CHARS:
+        return line
+    start = max(0, min(column - _MAX_LINE_CHARS // 4, len(line) - _MAX_LINE_CHARS))
+    return ("..." if start else "") + line[start:start + _MAX_LINE_CHARS] + "..."
+
+
+def _required_literal(regex: "re.Pattern") -> Optional[bytes]:
+    """Return the longest text that every match contains, or None.
+
+    Files without it are skipped before being decoded and searched, which
+    matters for patterns such as `\\bname` that the regex engine cannot
+    look for by their first characters.
+    """
+    if regex.flags & re.IGNORECASE:
+        return None
+    try:
+        from re import _parser as parser
+    except ImportError:  # Python < 3.11
+        import sre_parse as parser
+    try:
+        parsed = parser.parse(regex.pattern, regex.flags)
+    except Exception:
+        return None
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+
+    best = ""
+
+    def visit(items):
+        # Runs of literals in a sequence, and in groups and repeats that must match
+        nonlocal best
+        run = []
+        for op, argument in items:
+            if op == parser.LITERAL:
+                run.append(chr(argument))
+                continue
+            best = max(best, "".join(run), key=len)
+            run = []
+            if op == parser.SUBPATTERN:
+                # A group with its own flags, e.g. (?i:...), need not match its literals as written
+                add_flags = argument[1]
+                if not add_flags & re.IGNORECASE:
+                    visit(argument[-1])
+            elif op in (parser.MAX_REPEAT, parser.MIN_REPEAT) and argument[0] >= 1:
+                visit(argument[2])
+        best = max(best, "".join(run), key=len)
+
+    visit(parsed)
+    return best.encode("utf-8") if best else None
+
+
+def _may_contain(data: bytes, literal: bytes, encoding: str) -> bool:
+    """Whether `data` may hold the UTF-8 `literal`; False only if it surely does not."""
+    # Other encodings spell the literal with other bytes, so only decoding tells
+    if encoding in ("utf-8", "utf-8-sig") or (encoding in ("cp1252", "latin-1") and literal.isascii()):
+        return literal in data
+    return True
+
+
+def _search_file(root: str, path: str, regex: "re.Pattern", literal: Optional[bytes], context: int,
+                 limit: int, stop: threading.Event) -> Optional[_FileMatches]:
+    """Search one file; None if it is binary, unreadable or has no match."""
+    if stop.is_set():
+        return None
+    try:
+        with open(os.path.join(root, path), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size > MAX_FILE_SIZE:
+                return None
+            head = f.read(SNIFF_BYTES)
+            file_type = sniff(head, size)
+            if file_type.binary:
+                return None
+            encoding = file_type.encoding or "utf-8"
+            data = head + f.read()
+    except OSError:
+        return None
+    if literal is not None and not _may_contain(data, literal, encoding):
+        return None
+    text = data.decode(encoding, errors="replace")
+    # One search over the whole file; lines are only split when it matches
+    match = regex.search(text)
+    if match is None:
+        return None
+
+    matches, columns = [], {}
+    line_number, counted = 0, 0
+    while match is not None and len(matches) < limit:
+        start = text.rfind("\n", 0, match.start()) + 1
+        line_number += text.count("\n", counted, start)
+        counted = start
+        matches.append(line_number)
+        columns[line_number] = match.start() - start
+        end = text.find("\n", match.start())
+        if end == -1:
+            break
+        # Continue on the next line, so each line is listed once
+        match = regex.search(text, end + 1)
+
+    all_lines = text.split("\n")
+    shown = sorted({
+        number
+        for line in matches
+        for number in range(max(0, line - context), min(len(all_lines), line + context + 1))
+    })
+    lines = [(number, _shorten(all_lines[number].rstrip("\r"), columns.get(number, 0))) for number in shown]
+    definitions = any(_DEFINITION.match(all_lines[line]) for line in matches)
+    return _FileMatches(path, matches, lines, definitions)
+
+
+def _search_files(root: str, paths: List[str], regex: "re.Pattern", literal: Optional[bytes], context: int,
+                  limit: int, stop: threading.Event) -> List[Optional[_FileMatches]]:
+    """Search a batch of files, so that the pool's overhead is paid once per batch."""
+    return [_search_file(root, path, regex, literal, context, limit, stop) for path in paths]
+
+
+def _files(root: str, path: str, glob: Optional[str]):
+    """Relative paths of the files to search below `path`, leaving out ignored ones."""
+    if os.path.isfile(os.path.join(root, path)):
+        yield path
+        return
+    pattern = glob_regex(glob) if glob else None
+    for directory, _, files in walk(root, start=path):
+        prefix = directory + "/" if directory else ""
+        for entry in files:
+            relative = prefix + entry.name
+            if pattern is None or pattern.fullmatch(relative):
+                yield relative
+
+
+def search_tree(root: Union[str, Path], pattern: str, path: str = "", glob: Optional[str] = None,
+                context: int = 0, max_results: int = MAX_RESULTS, ignore_case: bool = False,
+                workers: Optional[int] = None) -> str:
+    """Search the files below `root` for a regex and format the matching lines.
+
+    Files are read and searched in batches by a thread pool, in the order
+    of the walk, and the search stops once `max_results` lines matched.
+    Binary files, files over `MAX_FILE_SIZE` and what `.gitignore` excludes
+    are skipped. Files with a matching definition (`def`, `class`, ...)
+    come first, then shallower files. Lines are listed as `path:line: text`,
+    context lines as `path-line- text`.
+
+    Args:
+        root: Directory to search
+        pattern: Python regular expression
+        path: File or directory below `root` to limit the search to
+        glob: Only search files matching this glob (e.g. "*.py")
+        context: Number of lines to show around each match
+        max_results: Maximum number of matching lines
+        ignore_case: Match regardless of case
+        workers: Number of threads (default: up to 8, one per CPU)
+    """
+    regex = re.compile(pattern, re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+    literal = _required_literal(regex)
+    root = str(root)
+    path = path.strip("/")
+    workers = workers or min(8, os.cpu_count() or 1)
+    stop = threading.Event()
+    found: List[_FileMatches] = []
+    total = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Batches are submitted a few ahead of the results being collected,
+        # so that stopping early leaves little work behind
+        pending = []
+        files = _files(root, path, glob)
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < workers * 2:
+                batch = list(itertools.islice(files, _BATCH_SIZE))
+                exhausted = len(batch) < _BATCH_SIZE
+                if batch:
+                    pending.append(executor.submit(
+                        _search_files, root, batch, regex, literal, context, max_results, stop
+                    ))
+            if not pending:
+                break
+            for result in pending.pop(0).result():
+                if result is None:
+                    continue
+                if total + len(result.matches) > max_results:
+                    # Drop the matches over the limit and the lines shown around them
+                    kept = result.matches[:max_results - total]
+                    lines = [line for line in result.lines if line[0] <= kept[-1] + context]
+                    result = result._replace(matches=kept, lines=lines)
+                found.append(result)
+                total += len(result.matches)
+                if total >= max_results:
+                    stop.set()
+                    break
+            if stop.is_set():
+                break
+
+    if not found:
+        return f"No matches for {pattern!r}"
+    found.sort(key=lambda result: (not result.definitions, result.path.count("/")))
+    blocks = []
+    for result in found:
+        matches = set(result.matches)
+        block, previous = [], None
+        for number, text in result.lines:
+            if context and previous is not None and number > previous + 1:
+                block.append("--")
+            separator = ":" if number in matches else "-"
+            block.append(f"{result.path}{separator}{number + 1}{separator} {text}")
+            previous = number
+        blocks.append("\n".join(block))
+    summary = f"{total} matching lines in {len(found)} files"
+    if stop.is_set():
+        summary += f" (stopped at {max_results}; narrow the search with path or glob to see more)"
+    return ("\n--\n" if context else "\n").join(blocks) + "\n" + summary
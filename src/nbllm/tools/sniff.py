@@ -0,0 +1,172 @@
+"""Telling text from binary files, and their encoding, from the first bytes."""
+
+from typing import NamedTuple, Optional
+import codecs
+
+
+# Bytes read to decide what a file is
+SNIFF_BYTES = 8192
+
+# Bytes shown in the hexdump of a binary file
+HEXDUMP_BYTES = 256
+
+# Share of control characters above which a file without a known type is binary
+_CONTROL_RATIO = 0.1
+
+# Control characters that text files commonly contain
+_TEXT_CONTROLS = frozenset(b"\t\n\r\f\b\x1b")
+
+# File signatures at offset 0, most specific first
+_MAGIC = [
+    (b"\x89PNG\r\n\x1a\n", "PNG image"),
+    (b"\xff\xd8\xff", "JPEG image"),
+    (b"GIF87a", "GIF image"),
+    (b"GIF89a", "GIF image"),
+    (b"%PDF-", "PDF document"),
+    (b"PK\x03\x04", "ZIP archive (or docx, xlsx, jar, wheel)"),
+    (b"PK\x05\x06", "empty ZIP archive"),
+    (b"\x1f\x8b", "gzip archive"),
+    (b"\xfd7zXZ\x00", "xz archive"),
+    (b"\x28\xb5\x2f\xfd", "zstd archive"),
+    (b"7z\xbc\xaf\x27\x1c", "7z archive"),
+    (b"Rar!\x1a\x07", "RAR archive"),
+    (b"PAR1", "Parquet file"),
+    (b"ORC", "ORC file"),
+    (b"Obj\x01", "Avro file"),
+    (b"ARROW1", "Arrow file"),
+    (b"\x89HDF\r\n\x1a\n", "HDF5 file"),
+    (b"\x93NUMPY", "NumPy array"),
+    (b"SQLite format 3\x00", "SQLite database"),
+    (b"\x7fELF", "ELF executable"),
+    (b"\xcf\xfa\xed\xfe", "Mach-O executable"),
+    (b"\xca\xfe\xba\xbe", "Java class or Mach-O universal binary"),
+    (b"MZ", "Windows executable"),
+    (b"\x00asm", "WebAssembly module"),
+    (b"wOFF", "WOFF font"),
+    (b"wOF2", "WOFF2 font"),
+    (b"OggS", "Ogg media"),
+    (b"fLaC", "FLAC audio"),
+    (b"ID3", "MP3 audio"),
+    (b"\x1aE\xdf\xa3", "Matroska/WebM video"),
+    (b"\x80\x04\x95", "Python pickle"),
+]
+
+# Byte order marks and the encodings they stand for, longest first
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+class FileType(NamedTuple):
+    """What the first bytes of a file say about it."""
+
+    binary: bool
+    description: str              # e.g. "PNG image" or "UTF-8 text"
+    encoding: Optional[str]       # Python codec for text files
+    long_lines: bool = False      # No line break in the first SNIFF_BYTES, e.g. minified code
+
+
+def _signature(head: bytes) -> Optional[str]:
+    """The type of a binary file given by its signature, or None."""
+    # Signatures such as "PAR1" could also start a text file: trust them only in binary data
+    binary = b"\x00" in head or any(byte < 0x20 and byte not in _TEXT_CONTROLS for byte in head[:64])
+    for magic, description in _MAGIC:
+        if head.startswith(magic) and (binary or not _printable(magic)):
+            return description
+    if not binary:
+        return None
+    if head[:3] == b"BZh" and head[4:10] == b"1AY&SY":
+        return "bzip2 archive"
+    if head[:2] == b"BM" and head[6:10] == b"\x00\x00\x00\x00":
+        return "BMP image"
+    if head[4:8] == b"ftyp":
+        return "MP4/QuickTime media (or HEIC image)"
+    riff = {b"WAVE": "WAV audio", b"AVI ": "AVI video", b"WEBP": "WebP image"}
+    if head[:4] == b"RIFF" and head[8:12] in riff:
+        return riff[head[8:12]]
+    return None
+
+
+def _printable(data: bytes) -> bool:
+    return all(0x20 <= byte < 0x7f for byte in data)
+
+
+def _utf16_without_bom(head: bytes) -> Optional[str]:
+    """Guess UTF-16 text without a byte order mark from where its NUL bytes are."""
+    if len(head) < 4:
+        return None
+    even, odd = head[0::2].count(0), head[1::2].count(0)
+    for encoding, zeros, others in (("utf-16-le", odd, even), ("utf-16-be", even, odd)):
+        if zeros >= len(head) // 2 * 0.7 and others == 0:
+            try:
+                codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+            except UnicodeDecodeError:
+                return None
+            return encoding
+    return None
+
+
+def sniff(head: bytes, size: int) -> FileType:
+    """Tell what a file is from its first bytes.
+
+    Args:
+        head: The first `SNIFF_BYTES` bytes of the file (or all of it, if shorter)
+        size: Size of the whole file, to know whether `head` ends in the middle
+    """
+    complete = len(head) >= size
+    long_lines = len(head) >= SNIFF_BYTES and b"\n" not in head
+
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            name = {"utf-8-sig": "UTF-8 text with BOM", "utf-16": "UTF-16 text", "utf-32": "UTF-32 text"}[encoding]
+            return FileType(False, name, encoding, long_lines and encoding == "utf-8-sig")
+
+    signature = _signature(head)
+    if signature is not None:
+        return FileType(True, signature, None)
+
+    if b"\x00" in head:
+        encoding = _utf16_without_bom(head)
+        if encoding is not None:
+            return FileType(False, "UTF-16 text", encoding)
+        return FileType(True, "binary data", None)
+
+    controls = sum(1 for byte in head if byte < 0x20 and byte not in _TEXT_CONTROLS)
+    if head and controls / len(head) > _CONTROL_RATIO:
+        return FileType(True, "binary data", None)
+
+    try:
+        # The head may end in the middle of a multi-byte character
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=complete)
+        return FileType(False, "ASCII text" if head.isascii() else "UTF-8 text", "utf-8", long_lines)
+    except UnicodeDecodeError:
+        pass
+    try:
+        head.decode("cp1252")
+        return FileType(False, "Windows-1252 text", "cp1252", long_lines)
+    except UnicodeDecodeError:
+        return FileType(False, "Latin-1 text", "latin-1", long_lines)
+
+
+def hexdump(data: bytes, offset: int = 0) -> str:
+    """Format bytes like `xxd`: offset, 16 bytes in hex and the printable characters."""
+    lines = []
+    for start in range(0, len(data), 16):
+        row = data[start:start + 16]
+        hex_part = " ".join(row[i:i + 2].hex() for i in range(0, len(row), 2))
+        text = "".join(chr(byte) if 0x20 <= byte < 0x7f else "." for byte in row)
+        lines.append(f"{offset + start:08x}: {hex_part:<39}  {text}")
+    return "\n".join(lines)
+
+
+def describe_binary(file_type: FileType, head: bytes, size: int) -> str:
+    """A short summary of a binary file for the model: its type, size and first bytes."""
+    shown = head[:HEXDUMP_BYTES]
+    return (
+        f"(binary file: {file_type.description}, {size:,} bytes; not shown as text. "
+        f"First {len(shown)} bytes:)\n{hexdump(shown)}"
+    )
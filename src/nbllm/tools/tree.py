@@ -0,0 +1,182 @@
+"""Compact listings of directory trees."""
+
+from pathlib import Path
+from typing import List, Tuple, Union
+import os
+
+from ..gitignore import GitIgnore, glob_regex, walk
+
+
+# Most characters of one listing
+MAX_CHARS = 6_000
+
+# Files, and subdirectories, listed per directory; the others are counted
+MAX_ENTRIES_PER_DIRECTORY = 25
+
+# Most paths listed by `glob_files`
+MAX_GLOB_RESULTS = 200
+
+# Counting the files of a skipped directory stops here
+_COUNT_LIMIT = 10_000
+
+
+class _Directory:
+    """A directory read for a tree listing: its entries, or only their numbers past the depth limit."""
+
+    __slots__ = ("name", "files", "directories", "skipped", "file_count", "directory_count")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.files: List[str] = []
+        self.directories: List["_Directory"] = []
+        self.skipped: List[Tuple[str, int]] = []   # Ignored directories and their number of files
+        self.file_count = 0
+        self.directory_count = 0
+
+
+def _count_files(path: str) -> int:
+    """Count the files below `path`, stopping at `_COUNT_LIMIT`."""
+    count = 0
+    stack = [path]
+    while stack and count < _COUNT_LIMIT:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            count += 1
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return min(count, _COUNT_LIMIT)
+
+
+def _read(root: str, relative: str, ignore: GitIgnore, depth: int, name: str) -> _Directory:
+    """Read a directory and, `depth` levels deep, the directories below it."""
+    node = _Directory(name)
+    prefix = relative + "/" if relative else ""
+    subdirectories = []
+    try:
+        with os.scandir(os.path.join(root, relative)) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    # DirEntry knows the type from the directory listing, without a stat call
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if ignore.ignored(prefix + entry.name, is_dir):
+                    if is_dir:
+                        node.skipped.append((entry.name, _count_files(entry.path)))
+                    continue
+                if is_dir:
+                    subdirectories.append(entry.name)
+                else:
+                    node.files.append(entry.name)
+    except OSError:
+        pass
+    node.files.sort()
+    node.skipped.sort()
+    node.file_count = len(node.files)
+    node.directory_count = len(subdirectories)
+    if depth > 0:
+        node.directories = [
+            _read(root, prefix + name, ignore, depth - 1, name) for name in sorted(subdirectories)
+        ]
+    return node
+
+
+def _render(node: _Directory, depth: int, indent: str = "") -> List[str]:
+    """Lines for the entries of `node`, showing `depth` levels below it."""
+    lines = []
+    for child in node.directories[:MAX_ENTRIES_PER_DIRECTORY]:
+        if depth > 0:
+            lines.append(f"{indent}{child.name}/")
+            lines.extend(_render(child, depth - 1, indent + "  "))
+        else:
+            lines.append(f"{indent}{child.name}/ ({_counts(child)})")
+    if len(node.directories) > MAX_ENTRIES_PER_DIRECTORY:
+        lines.append(f"{indent}... {_plural(len(node.directories) - MAX_ENTRIES_PER_DIRECTORY, 'more dir')}")
+    for name, count in node.skipped:
+        files = f"{count:,}+ files" if count >= _COUNT_LIMIT else _plural(count, "file")
+        lines.append(f"{indent}{name}/ {files}, skipped")
+    shown = node.files[:MAX_ENTRIES_PER_DIRECTORY]
+    lines.extend(indent + name for name in shown)
+    if len(node.files) > len(shown):
+        lines.append(f"{indent}... {_plural(len(node.files) - len(shown), 'more file')}")
+    return lines
+
+
+def _plural(count: int, word: str) -> str:
+    return f"{count:,} {word}" + ("" if count == 1 else "s")
+
+
+def _counts(node: _Directory) -> str:
+    parts = [_plural(node.file_count, "file")]
+    if node.directory_count:
+        parts.append(_plural(node.directory_count, "dir"))
+    return ", ".join(parts)
+
+
+def render_tree(root: Union[str, Path], path: str = "", depth: int = 3, max_chars: int = MAX_CHARS) -> str:
+    """List the layout of a directory as an indented tree.
+
+    Directories are read with `os.scandir`, whose entries know their type
+    without a stat call. Directories past `depth` levels show their number
+    of files and directories, directories excluded by `.gitignore` their
+    number of files, and only the first `MAX_ENTRIES_PER_DIRECTORY` files
+    and subdirectories of a directory are named. When the listing is longer
+    than `max_chars`, it is shown less deep until it fits.
+
+    Args:
+        root: Root of the tree, whose `.gitignore` files apply
+        path: Directory below `root` to list
+        depth: Number of directory levels to show
+        max_chars: Maximum length of the listing
+    """
+    root = str(root)
+    path = path.strip("/")
+    depth = max(1, depth)
+    tree = _read(root, path, GitIgnore(root), depth, path or ".")
+    header = (path or ".") + "/"
+    for shown_depth in range(depth, 0, -1):
+        lines = _render(tree, shown_depth - 1, "  ")
+        text = "\n".join([header, *lines])
+        if len(text) <= max_chars:
+            if shown_depth < depth:
+                text += f"\n(shown {_plural(shown_depth, 'level')} deep to stay short; list a subdirectory to see more)"
+            return text
+    # Even one level is too long: cut it
+    text = text[:max_chars].rsplit("\n", 1)[0]
+    return text + f"\n... (cut at {max_chars:,} characters)"
+
+
+def glob_files(root: Union[str, Path], pattern: str, path: str = "", max_results: int = MAX_GLOB_RESULTS) -> str:
+    """List the files matching a glob, with the rules of `.gitignore` patterns.
+
+    Args:
+        root: Root of the tree, whose `.gitignore` files apply
+        pattern: Glob such as `*.py` (any directory) or `src/**/test_*.py`
+        path: Directory below `root` to search, which the pattern is relative to
+        max_results: Maximum number of paths to list
+    """
+    root = str(root)
+    path = path.strip("/")
+    regex = glob_regex(pattern)
+    offset = len(path) + 1 if path else 0
+    matches = []
+    for directory, _, files in walk(root, start=path):
+        prefix = directory + "/" if directory else ""
+        matches.extend(
+            prefix + entry.name for entry in files if regex.fullmatch((prefix + entry.name)[offset:])
+        )
+    if not matches:
+        return f"No files match {pattern!r}"
+    lines = matches[:max_results]
+    if len(matches) > max_results:
+        lines.append(f"... {_plural(len(matches) - max_results, 'more file')} (narrow the pattern to see them)")
+    return "\n".join(lines)
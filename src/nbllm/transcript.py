@@ -0,0 +1,132 @@
+"""Append-only transcript sink for `Chat(history_callback=...)`."""
+
+from pathlib import Path
+from typing import Optional, Union
+import atexit
+import gzip
+import json
+import os
+import threading
+
+
+def response_record(response, text: Optional[str] = None) -> dict:
+    """Return the transcript record for an llm response.
+
+    Uses the provider's raw `response_json` when available and falls back to a
+    minimal assistant message for models that don't set it.
+
+    Args:
+        response: A finished llm response
+        text: Its text, needed for an `llm.AsyncResponse`, whose `text()` must be awaited
+    """
+    if response.response_json:
+        return response.response_json
+    return {
+        "id": f"msg_{response.id}",
+        "role": "assistant",
+        "content": [{"text": response.text() if text is None else text, "type": "text"}],
+    }
+
+
+def _open_zstd(raw):
+    """Wrap a binary file in a zstd stream writer."""
+    try:
+        import zstandard
+    except ImportError:
+        raise ModuleNotFoundError(
+            "zstd compression needs the zstandard package, install it via:\n\n"
+            "uvx --with git+https://github.com/mse11/nbllm[zstd]\n"
+        ) from None
+    return zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+
+
+class TranscriptWriter:
+    """Write conversation records to a JSONL file, each record exactly once.
+
+    Use an instance as `history_callback`. Records whose "id" was already
+    written are skipped, new ones are buffered and appended in batches. A
+    background timer flushes and fsyncs the buffer every `flush_interval`
+    seconds, and `close()` (also run at exit) writes whatever is left.
+
+    Args:
+        path: Transcript file, opened for appending
+        compression: None, "gzip" or "zstd"; inferred from a .gz/.zst suffix when None
+        flush_interval: Seconds between flushes to disk
+    """
+
+    def __init__(self, path: Union[str, Path], compression: Optional[str] = None, flush_interval: float = 1.0):
+        self.path = Path(path)
+        if compression is None:
+            compression = {".gz": "gzip", ".zst": "zstd"}.get(self.path.suffix)
+        if compression not in (None, "gzip", "zstd"):
+            raise ValueError(f"Unknown compression: {compression}")
+        self.compression = compression
+        self.flush_interval = flush_interval
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._raw = open(self.path, "ab")
+        if compression == "gzip":
+            # Appending a new gzip member keeps earlier sessions readable
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="ab")
+        elif compression == "zstd":
+            self._stream = _open_zstd(self._raw)
+        else:
+            self._stream = self._raw
+
+        self._written_ids = set()
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, name="nbllm-transcript", daemon=True)
+        self._timer.start()
+        # Don't lose the last batch when the chat exits without closing us
+        atexit.register(self.close)
+
+    def __call__(self, records: list) -> None:
+        """Buffer the records that have not been written yet."""
+        with self._lock:
+            for record in records:
+                record_id = record.get("id")
+                if record_id is not None:
+                    if record_id in self._written_ids:
+                        continue
+                    self._written_ids.add(record_id)
+                self._buffer.append(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered records and fsync the file."""
+        with self._lock:
+            if not self._buffer or self._raw.closed:
+                return
+            lines, self._buffer = self._buffer, []
+            self._stream.write("".join(lines).encode("utf-8"))
+            if self.compression == "zstd":
+                import zstandard
+                self._stream.flush(zstandard.FLUSH_BLOCK)
+            else:
+                self._stream.flush()
+            self._raw.flush()
+            os.fsync(self._raw.fileno())
+
+    def close(self) -> None:
+        """Flush remaining records and close the file."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        atexit.unregister(self.close)
+        self._timer.join()
+        self.flush()
+        with self._lock:
+            if self._stream is not self._raw:
+                self._stream.close()
+            self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
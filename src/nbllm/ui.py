@@ -1,19 +1,19 @@
 """User interface utilities for consistent formatting in nbllm."""
 
-from typing import List, Any, Optional
+from typing import TYPE_CHECKING, List, Any, Optional, Callable, Iterable, Sequence, Tuple, Union
+import inspect
+
 from rich.console import Console
-from rich.prompt import Prompt, Confirm
+from rich.prompt import Confirm
+from rich.text import Text
+
+from .streaming import StreamRenderer
+from .version import get_version
 
-from prompt_toolkit import prompt
-from prompt_toolkit.completion import WordCompleter, FuzzyCompleter
-from prompt_toolkit.styles import Style
-from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
-from prompt_toolkit.history import InMemoryHistory
-from prompt_toolkit.formatted_text import HTML
-from prompt_toolkit.key_binding import KeyBindings
-from prompt_toolkit.keys import Keys
-import questionary
-from .file_completer import create_completer
+# prompt_toolkit and questionary take long to import; they are imported when
+# the first prompt or choice is shown, after the banner
+if TYPE_CHECKING:
+    from .history import PromptHistory
 
 
 # Global padding configuration
@@ -33,16 +33,7 @@ _DEFAULT_ASCII_ART = """
 ╚═╝  ╚═══╝╚═════╝ ╚══════╝╚══════╝╚═╝     ╚═╝
 """
 
-# Get version dynamically to avoid circular import
-def _get_version():
-    """Get version without circular import."""
-    try:
-        import importlib.metadata
-        return importlib.metadata.version("nbllm")
-    except:
-        return "unknown"
-
-_DEFAULT_SUBTITLE = f"""[dim]nbllm v{_get_version()} - A terminal chat experience that you can configure yourself.[/dim]"""
+_DEFAULT_SUBTITLE = """[dim]nbllm v{version} - A terminal chat experience that you can configure yourself.[/dim]"""
 
 # Custom ASCII art storage
 _custom_ascii_art = None
@@ -51,17 +42,14 @@ _custom_subtitle = None
 # Trust settings for tools
 _trusted_tools = set()
 
-# Command history for prompt_toolkit
-_command_history = InMemoryHistory()
+# Answer policy for confirmations in non-interactive runs (None = ask the user)
+_confirm_policy = None
+
+# Command history for prompt_toolkit (in memory unless a session brings its own), created on first use
+_command_history = None
 
-# Global streaming state
-_streaming_state = {
-    'current_position': 0,
-    'word_buffer': '',
-    'at_line_start': True,
-    'terminal_width': 0,
-    'max_line_width': 0
-}
+# Renderer behind start_streaming / stream_chunk / end_streaming
+_stream_renderer = StreamRenderer(_console, indent=LEFT_PADDING, right_padding=RIGHT_PADDING)
 
 
 def print(text: str, indent: int = LEFT_PADDING) -> None:
@@ -77,6 +65,21 @@ def print(text: str, indent: int = LEFT_PADDING) -> None:
         _console.print(" " * indent + line)
 
 
+def print_lines(lines: Iterable[Sequence[Tuple[str, str]]], indent: int = LEFT_PADDING) -> None:
+    """Print many styled lines in one write, e.g. a long diff.
+    
+    Each line is a sequence of (text, style) parts. The text is not parsed
+    as markup, so it needs no escaping.
+    """
+    text = Text()
+    padding = " " * indent
+    for number, line in enumerate(lines):
+        text.append(("\n" if number else "") + padding)
+        for part, style in line:
+            text.append(part, style=style or None)
+    _console.print(text)
+
+
 def print_empty_line(indent: int = LEFT_PADDING) -> None:
     """Print an empty line with padding to maintain consistent left margin."""
     _console.print(" " * indent)
@@ -84,10 +87,8 @@ def print_empty_line(indent: int = LEFT_PADDING) -> None:
 
 def print_neutral(text: str, indent: int = LEFT_PADDING) -> None:
     """Print text in neutral gray color with proper padding and wrapping."""
-    # Use the streaming infrastructure to handle padding correctly
-    start_streaming(indent)
-    stream_chunk(text, indent)
-    end_streaming(indent)
+    # Use a renderer of its own so a reply streaming at the same time is not disturbed
+    stream([text], indent)
     print_empty_line(indent)  # Add newline after the text with padding
 
 
@@ -123,182 +124,261 @@ def tool_warning(message: str, indent: int = LEFT_PADDING) -> None:
     _console.print(f"{' ' * indent}[yellow]{message}[/yellow]")
 
 
-def start_streaming(indent: int = LEFT_PADDING) -> None:
-    """Initialize streaming state."""
-    global _streaming_state
-    _streaming_state['current_position'] = 0
-    _streaming_state['word_buffer'] = ''
-    _streaming_state['at_line_start'] = True
-    _streaming_state['terminal_width'] = _console.width
-    _streaming_state['max_line_width'] = _streaming_state['terminal_width'] - indent - RIGHT_PADDING
+def stream_renderer(indent: int = LEFT_PADDING, wrap: bool = True, markdown: bool = False) -> StreamRenderer:
+    """Create a renderer streaming to the terminal with the global padding.
+    
+    Each reply or tool output gets its own renderer, so several can stream at once.
+    
+    Args:
+        indent: Left padding of the streamed text
+        wrap: Wrap words at the right margin
+        markdown: Render the text as Markdown, block by block, instead of dim plain text
+    """
+    return StreamRenderer(_console, indent=indent, wrap=wrap, markdown=markdown, right_padding=RIGHT_PADDING)
 
 
-def stream_chunk(chunk: str, indent: int = LEFT_PADDING, wrap: bool = True) -> None:
-    """Stream a single chunk while maintaining state."""
-    global _streaming_state
+def start_streaming(indent: int = LEFT_PADDING, markdown: bool = False) -> None:
+    """Start streaming with the shared module renderer.
     
-    # Process chunk character by character
-    for char in chunk:
-        if _streaming_state['at_line_start']:
-            # Add padding at start of line
-            _console.print(" " * indent, end="", highlight=False)
-            _streaming_state['at_line_start'] = False
-            _streaming_state['current_position'] = 0
-        
-        if char == '\n':
-            # Print any buffered word
-            if _streaming_state['word_buffer']:
-                _console.print(f"[dim]{_streaming_state['word_buffer']}[/dim]", end="", highlight=False)
-                _streaming_state['word_buffer'] = ""
-            # New line
-            _console.print()
-            _streaming_state['at_line_start'] = True
-        elif char in ' \t' and wrap:
-            # End of word, check if it fits
-            if _streaming_state['word_buffer']:
-                word_length = len(_streaming_state['word_buffer'])
-                if _streaming_state['current_position'] + word_length > _streaming_state['max_line_width']:
-                    # Word doesn't fit, wrap to new line
-                    _console.print()
-                    _streaming_state['at_line_start'] = True
-                    _console.print(" " * indent, end="", highlight=False)
-                    _streaming_state['current_position'] = 0
-                    _streaming_state['at_line_start'] = False
-                # Print the word
-                _console.print(f"[dim]{_streaming_state['word_buffer']}[/dim]", end="", highlight=False)
-                _streaming_state['current_position'] += word_length
-                _streaming_state['word_buffer'] = ""
-            # Print the space
-            _console.print(f"[dim]{char}[/dim]", end="", highlight=False)
-            _streaming_state['current_position'] += 1
-        else:
-            # Add to word buffer
-            _streaming_state['word_buffer'] += char
+    Args:
+        indent: Left padding of the streamed text
+        markdown: Render the reply as Markdown, block by block, instead of dim plain text
+    """
+    _stream_renderer.indent = indent
+    _stream_renderer.start(markdown)
+
+
+def stream_chunk(chunk: str, indent: int = LEFT_PADDING, wrap: bool = True) -> None:
+    """Stream a single chunk with the shared module renderer."""
+    _stream_renderer.indent = indent
+    _stream_renderer.wrap = wrap
+    _stream_renderer.feed(chunk)
 
 
 def end_streaming(indent: int = LEFT_PADDING, wrap: bool = True) -> None:
     """Finish streaming and print any remaining buffered word."""
-    global _streaming_state
-    
-    # Print any remaining buffered word
-    if _streaming_state['word_buffer']:
-        if wrap and _streaming_state['current_position'] + len(_streaming_state['word_buffer']) > _streaming_state['max_line_width']:
-            _console.print()
-            _streaming_state['at_line_start'] = True
-            _console.print(" " * indent, end="", highlight=False)
-        _console.print(f"[dim]{_streaming_state['word_buffer']}[/dim]", end="", highlight=False)
+    _stream_renderer.indent = indent
+    _stream_renderer.wrap = wrap
+    _stream_renderer.end()
 
 
 def stream(chunks, indent: int = LEFT_PADDING, wrap: bool = True) -> None:
     """Stream text chunks with word-aware wrapping and padding."""
-    # State for word-aware wrapping
-    current_position = 0
-    word_buffer = ""
-    terminal_width = _console.width
-    max_line_width = terminal_width - indent - RIGHT_PADDING
-    at_line_start = True
+    with stream_renderer(indent, wrap) as renderer:
+        for chunk in chunks:
+            renderer.feed(chunk)
+
+
+def _default_history() -> "PromptHistory":
+    global _command_history
+    if _command_history is None:
+        from .history import PromptHistory
+        _command_history = PromptHistory()
+    return _command_history
+
+
+class InputSession:
+    """A prompt_toolkit session that lives across turns.
     
-    for chunk in chunks:
-        # Process chunk character by character
-        for char in chunk:
-            if at_line_start:
-                # Add padding at start of line
-                _console.print(" " * indent, end="", highlight=False)
-                at_line_start = False
-                current_position = 0
-            
-            if char == '\n':
-                # Print any buffered word
-                if word_buffer:
-                    _console.print(f"[dim]{word_buffer}[/dim]", end="", highlight=False)
-                    word_buffer = ""
-                # New line
-                _console.print()
-                at_line_start = True
-            elif char in ' \t' and wrap:
-                # End of word, check if it fits
-                if word_buffer:
-                    word_length = len(word_buffer)
-                    if current_position + word_length > max_line_width:
-                        # Word doesn't fit, wrap to new line
-                        _console.print()
-                        at_line_start = True
-                        _console.print(" " * indent, end="", highlight=False)
-                        current_position = 0
-                        at_line_start = False
-                    # Print the word
-                    _console.print(f"[dim]{word_buffer}[/dim]", end="", highlight=False)
-                    current_position += word_length
-                    word_buffer = ""
-                # Print the space
-                _console.print(f"[dim]{char}[/dim]", end="", highlight=False)
-                current_position += 1
-            else:
-                # Add to word buffer
-                word_buffer += char
+    The session, its layout, style, key bindings, completers and auto-suggest
+    are built once, on the first prompt. Later prompts only update the
+    commands and modes in place, so the next prompt appears right away.
     
-    # Print any remaining buffered word
-    if word_buffer:
-        if wrap and current_position + len(word_buffer) > max_line_width:
-            _console.print()
-            at_line_start = True
-            _console.print(" " * indent, end="", highlight=False)
-        _console.print(f"[dim]{word_buffer}[/dim]", end="", highlight=False)
-
-
-def input(prompt_text: str, indent: int = LEFT_PADDING, completions: Optional[List[str]] = None, 
-          mode_switcher_callback = None, available_modes: Optional[List[str]] = None) -> str:
-    """Get input with left padding and optional completions."""
-    padded_prompt = " " * indent + prompt_text
+    Args:
+        history: Prompt history to suggest from and search (default: shared in-memory history)
+        history_search: Search the history fuzzily on Ctrl+R
+    """
+    
+    def __init__(self, history: Optional["PromptHistory"] = None, history_search: bool = True):
+        self._history = history
+        self.history_search = history_search
+        self._searching = False
+        self._search_completer = None
+        self._session = None
+        self._completer = None
+        self._commands = []
+        self._mode_switcher_callback = None
+        self._available_modes = []
+    
+    def update(self, completions: Optional[List[str]] = None, mode_switcher_callback = None,
+               available_modes: Optional[List[str]] = None) -> None:
+        """Set the commands to complete and the mode switching used by the next prompts."""
+        completions = list(completions or [])
+        if completions != self._commands:
+            self._commands = completions
+            if self._completer is not None:
+                self._completer.commands = completions
+        self._mode_switcher_callback = mode_switcher_callback
+        self._available_modes = list(available_modes or [])
+    
+    @property
+    def history(self) -> "PromptHistory":
+        """History the prompts are suggested from, searched and added to."""
+        if self._history is None:
+            self._history = _default_history()
+        return self._history
     
-    # Use combined completer for commands and file paths
-    completer = create_completer(completions) if completions else None
+    def prompt(self, prompt_text: Union[str, Callable[[], str]], indent: int = LEFT_PADDING) -> str:
+        """Read one line of input."""
+        self._searching = False
+        return self._get_session().prompt(self._message(prompt_text, indent))
     
-    # Create key bindings for mode switching
-    bindings = KeyBindings()
+    async def prompt_async(self, prompt_text: Union[str, Callable[[], str]], indent: int = LEFT_PADDING) -> str:
+        """Read one line of input without blocking the event loop."""
+        self._searching = False
+        return await self._get_session().prompt_async(self._message(prompt_text, indent))
     
-    if mode_switcher_callback and available_modes:
-        @bindings.add('s-tab')  # Shift+Tab
-        def _(event):
-            """Switch to next mode on Shift+Tab"""
-            try:
-                next_mode = mode_switcher_callback()
-                if next_mode:
-                    # Show mode switch feedback
-                    _console.print(f"{' ' * indent}[dim]→ Switched to {next_mode} mode[/dim]")
-            except Exception:
-                pass  # Ignore errors in mode switching
+    def _message(self, prompt_text, indent: int):
+        if callable(prompt_text):
+            return lambda: " " * indent + prompt_text()
+        return " " * indent + prompt_text
     
-    # Create a style with auto-suggestion preview in gray
-    style = Style.from_dict({
-        # Default text style
-        '': '#ffffff',
-        # Auto-suggestions in gray
-        'auto-suggest': 'fg:#666666',
-        # Selected completion in menu
-        'completion-menu.completion.current': 'bg:#00aaaa #000000',
-        'completion-menu.completion': 'bg:#008888 #ffffff',
-    })
+    def _get_session(self):
+        if self._session is None:
+            from prompt_toolkit import PromptSession
+            from prompt_toolkit.completion import DynamicCompleter
+            from prompt_toolkit.filters import Condition
+            from prompt_toolkit.key_binding import KeyBindings
+            from prompt_toolkit.styles import Style
+            from .history import HistoryAutoSuggest
+            
+            # Create key bindings for mode switching
+            bindings = KeyBindings()
+            
+            @bindings.add('s-tab', filter=Condition(lambda: bool(self._mode_switcher_callback and self._available_modes)))
+            def _(event):
+                """Queue a switch to the next mode on Shift+Tab"""
+                try:
+                    self._switch_mode(event.app)
+                except Exception:
+                    pass  # Ignore errors in mode switching
+            
+            @bindings.add('c-r', filter=Condition(lambda: self.history_search))
+            def _(event):
+                """Toggle fuzzy history search on Ctrl+R"""
+                self._searching = not self._searching
+                buffer = event.current_buffer
+                if self._searching:
+                    buffer.start_completion(select_first=False)
+                else:
+                    buffer.cancel_completion()
+            
+            self._session = PromptSession(
+                # Complete history entries while searching, otherwise commands and file paths
+                completer=DynamicCompleter(self._current_completer),
+                # Auto-suggestion preview in gray
+                style=Style.from_dict({
+                    # Default text style
+                    '': '#ffffff',
+                    # Auto-suggestions in gray
+                    'auto-suggest': 'fg:#666666',
+                    # Selected completion in menu
+                    'completion-menu.completion.current': 'bg:#00aaaa #000000',
+                    'completion-menu.completion': 'bg:#008888 #ffffff',
+                }),
+                complete_while_typing=True,  # Show completions as you type
+                auto_suggest=HistoryAutoSuggest(self.history),  # Suggest from history via its prefix index
+                history=self.history,  # Enable history with up/down arrows
+                enable_history_search=False,  # Up/down walk the history instead of searching it
+                key_bindings=bindings,  # Add custom key bindings
+            )
+        return self._session
+    
+    def _switch_mode(self, app) -> None:
+        """Call the mode switcher for Shift+Tab."""
+        callback = self._mode_switcher_callback
+        if _accepts_on_done(callback):
+            # Redraw the prompt once the background switch has finished
+            callback(on_done=app.invalidate)
+            return
+        # A switcher without `on_done` switches at once and returns the new mode
+        next_mode = callback()
+        if next_mode:
+            from prompt_toolkit.application import run_in_terminal
+            run_in_terminal(lambda: _console.print(f"{' ' * LEFT_PADDING}[dim]→ Switched to {next_mode} mode[/dim]"))
+    
+    def _current_completer(self):
+        if self._searching:
+            if self._search_completer is None:
+                from .history import HistorySearchCompleter
+                self._search_completer = HistorySearchCompleter(self.history)
+            return self._search_completer
+        if not self._commands:
+            return None
+        if self._completer is None:
+            from .file_completer import create_completer
+            self._completer = create_completer(self._commands)
+        return self._completer
+
+
+def _accepts_on_done(callback: Callable) -> bool:
+    """Whether a mode switcher takes the `on_done` callback."""
+    try:
+        parameters = inspect.signature(callback).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(parameter.name == "on_done" or parameter.kind == parameter.VAR_KEYWORD for parameter in parameters)
+
+
+# Session behind `input` calls that don't bring their own
+_input_session = InputSession()
+
+
+def input(prompt_text: Union[str, Callable[[], str]], indent: int = LEFT_PADDING, completions: Optional[List[str]] = None, 
+          mode_switcher_callback = None, available_modes: Optional[List[str]] = None,
+          session: Optional[InputSession] = None) -> str:
+    """Get input with left padding and optional completions.
     
+    `prompt_text` may be a callable, in which case the prompt is re-evaluated on
+    every redraw (used to show a pending mode switch). `mode_switcher_callback`
+    is called on Shift+Tab with an `on_done` callback and should return quickly,
+    doing the actual switch in the background and calling `on_done()` once it
+    finished. A callback without an `on_done` parameter, as before background
+    switches, still works: it is called without arguments, switches at once
+    and returns the new mode, which is printed. `session` is reused across
+    calls, e.g. one per chat; by default a module-wide session is used.
+    """
+    session = session or _input_session
+    session.update(completions, mode_switcher_callback, available_modes)
     try:
         # Use prompt_toolkit with completer and auto-suggestions
-        result = prompt(
-            padded_prompt,
-            completer=completer,
-            style=style,
-            complete_while_typing=True,  # Show completions as you type
-            auto_suggest=AutoSuggestFromHistory(),  # Suggest from history
-            history=_command_history,  # Enable history with up/down arrows
-            enable_history_search=False,  # Disable Ctrl+R search
-            key_bindings=bindings,  # Add custom key bindings
-        )
-        return result
+        return session.prompt(prompt_text, indent)
     except (KeyboardInterrupt, EOFError):
         raise KeyboardInterrupt()
 
 
+async def input_async(prompt_text: Union[str, Callable[[], str]], indent: int = LEFT_PADDING, completions: Optional[List[str]] = None, 
+                      mode_switcher_callback = None, available_modes: Optional[List[str]] = None,
+                      session: Optional[InputSession] = None) -> str:
+    """Async version of `input` that does not block the event loop."""
+    session = session or _input_session
+    session.update(completions, mode_switcher_callback, available_modes)
+    try:
+        return await session.prompt_async(prompt_text, indent)
+    except (KeyboardInterrupt, EOFError):
+        raise KeyboardInterrupt()
+
+
+def set_quiet(quiet: bool) -> None:
+    """Suppress (or restore) all console output, e.g. for batch runs."""
+    _console.quiet = quiet
+
+
+def set_confirm_policy(policy: Union[None, bool, Callable[[str], bool]]) -> None:
+    """Answer confirmations from a policy instead of asking the user.
+    
+    `policy` is None to ask interactively, a bool used as the answer to every
+    confirmation, or a callable that receives the prompt text and returns a bool.
+    """
+    global _confirm_policy
+    _confirm_policy = policy
+
+
 def confirm(prompt: str, indent: int = LEFT_PADDING, default: bool = True) -> bool:
     """Ask for confirmation with left padding."""
+    if _confirm_policy is not None:
+        return _confirm_policy(prompt) if callable(_confirm_policy) else bool(_confirm_policy)
+    
     # Add padding to the prompt
     padded_prompt = " " * indent + prompt
     return Confirm.ask(padded_prompt, default=default, console=_console)
@@ -312,6 +392,8 @@ def choice(prompt_text: str, choices: List[str], indent: int = LEFT_PADDING) ->
     # Add padding to the prompt
     padded_prompt = " " * indent + prompt_text
     
+    import questionary
+    
     try:
         result = questionary.select(
             padded_prompt,
@@ -335,7 +417,7 @@ def show_banner() -> None:
     """Display the ASCII art banner with padding."""
     # Determine which art and subtitle to use
     ascii_art = _custom_ascii_art if _custom_ascii_art is not None else _DEFAULT_ASCII_ART
-    subtitle = _custom_subtitle if _custom_subtitle is not None else _DEFAULT_SUBTITLE
+    subtitle = _custom_subtitle if _custom_subtitle is not None else _DEFAULT_SUBTITLE.format(version=get_version())
     
     padding = " " * LEFT_PADDING
     
@@ -0,0 +1,13 @@
+"""Version of the installed nbllm package."""
+
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def get_version() -> str:
+    """Return the installed version, reading the package metadata only once."""
+    try:
+        import importlib.metadata
+        return importlib.metadata.version("nbllm")
+    except Exception:
+        return "unknown"
@@ -0,0 +1,223 @@
+"""Tests for the asyncio based AsyncChat."""
+
+import asyncio
+import json
+import threading
+import time
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+
+import llm
+
+from nbllm import AsyncChat, TranscriptWriter, ui
+
+
+class EchoTool(llm.Toolbox):
+    """Tool used by the fake model."""
+
+    def __init__(self):
+        self.calls = []
+
+    def echo(self, text: str) -> str:
+        """Echo the text back."""
+        self.calls.append(text)
+        return text.upper()
+
+
+class LoopTools(llm.Toolbox):
+    """Tools recording where they ran."""
+
+    def __init__(self):
+        self.loops = []
+        self.threads = []
+        self.prepared = 0
+
+    async def prepare_async(self):
+        self.prepared += 1
+
+    async def where(self) -> str:
+        """Record the running event loop."""
+        self.loops.append(asyncio.get_running_loop())
+        return "loop"
+
+    def blocking(self) -> str:
+        """Record the thread."""
+        self.threads.append(threading.current_thread())
+        return "thread"
+
+
+class AsyncFakeModel(llm.AsyncModel):
+    """Async model that streams the prompt back, calling `echo` when asked."""
+
+    model_id = "nbllm-async-fake"
+    can_stream = True
+    supports_tools = True
+
+    async def execute(self, prompt, stream, response, conversation):
+        response.response_json = {"id": response.id}
+        if prompt.tool_results:
+            yield f"tool said {prompt.tool_results[0].output}"
+            return
+        if prompt.prompt.startswith("echo "):
+            response.add_tool_call(llm.ToolCall(name="EchoTool_echo", arguments={"text": prompt.prompt[5:]}))
+            return
+        for word in prompt.prompt.split():
+            await asyncio.sleep(0)
+            yield word + " "
+
+
+class AsyncPlainModel(llm.AsyncModel):
+    """Async model that streams a reply without setting response_json."""
+
+    model_id = "nbllm-async-plain"
+    can_stream = True
+
+    async def execute(self, prompt, stream, response, conversation):
+        yield "plain "
+        yield "reply"
+
+
+def make_chat(model=None, **kwargs):
+    with patch('llm.get_async_model', return_value=model or AsyncFakeModel()):
+        return AsyncChat(show_banner=False, **kwargs)
+
+
+def capture(coro):
+    """Run a coroutine and return what it printed through ui."""
+    output = StringIO()
+    original_file = ui._console.file
+    ui._console.file = output
+    try:
+        asyncio.run(coro)
+    finally:
+        ui._console.file = original_file
+    return output.getvalue()
+
+
+def test_send_streams_reply_and_persists_history():
+    """The reply is rendered and history records reach the callback."""
+    records = []
+    chat = make_chat(history_callback=records.extend)
+
+    async def go():
+        await chat.send("hello async world")
+        await asyncio.gather(*chat._persist_tasks)
+
+    output = capture(go())
+
+    assert "hello async world" in output
+    assert records[0]["role"] == "user"
+    assert len(chat.conversation.responses) == 1
+
+
+def test_tool_calls_run_in_chain():
+    """Tool calls are executed and their results sent back to the model."""
+    tool = EchoTool()
+    chat = make_chat(tools=[tool])
+
+    output = capture(chat.send("echo shout"))
+
+    assert tool.calls == ["shout"]
+    assert "tool said SHOUT" in output
+    assert len(chat.conversation.responses) == 2
+
+
+def test_independent_sessions_share_one_loop():
+    """Several sessions can stream concurrently on one event loop."""
+    chats = [make_chat() for _ in range(3)]
+
+    async def go():
+        await asyncio.gather(*(chat.send(f"session {i}") for i, chat in enumerate(chats)))
+
+    capture(go())
+
+    assert all(len(chat.conversation.responses) == 1 for chat in chats)
+
+
+def test_history_batches_are_persisted_in_order():
+    """A slow write of the user record is not overtaken by the reply."""
+    batches = []
+
+    def slow_callback(records):
+        is_user = records[0].get("role") == "user"
+        if is_user:
+            time.sleep(0.05)
+        batches.append("user" if is_user else "reply")
+
+    chat = make_chat(history_callback=slow_callback)
+
+    async def go():
+        await chat.send("hello")
+        await asyncio.gather(*chat._persist_tasks)
+
+    capture(go())
+
+    assert batches == ["user", "reply"]
+
+
+def test_cancelled_session_still_ends():
+    """Ctrl+C under asyncio.run cancels arun; the session is still ended."""
+    chat = make_chat()
+
+    with patch("nbllm.ui.input_async", side_effect=asyncio.CancelledError), \
+            patch.object(chat, "_end_session") as end_session:
+        with pytest.raises(asyncio.CancelledError):
+            capture(chat.arun())
+
+    end_session.assert_called_once()
+
+
+def test_tool_calls_run_on_the_running_loop():
+    """Async tools run on the chat's loop and sync tools in worker threads."""
+    tools = LoopTools()
+    chat = make_chat(tools=[tools])
+    calls = [llm.ToolCall(name="LoopTools_where", arguments={}), llm.ToolCall(name="LoopTools_blocking", arguments={})]
+
+    async def go():
+        response = chat.conversation.prompt("hi", tools=chat.conversation.tools)
+        await response.text()
+        await chat._run_tool_calls(response, calls)
+        results = await chat._run_tool_calls(response, calls)
+        return asyncio.get_running_loop(), results
+
+    loop, results = asyncio.run(go())
+
+    assert [result.output for result in results] == ["loop", "thread"]
+    assert tools.loops == [loop, loop]
+    assert tools.threads[0] is not threading.main_thread()
+    assert results[0].instance is tools and results[1].instance is tools
+    # The toolbox is prepared once, by the chat
+    assert tools.prepared == 1
+
+
+def test_history_of_models_without_response_json(tmp_path):
+    """Records of async responses hold their text, so they can be written as JSON."""
+    path = tmp_path / "history.jsonl"
+    with TranscriptWriter(path) as writer:
+        chat = make_chat(AsyncPlainModel(), history_callback=writer)
+
+        async def go():
+            await chat.send("hi")
+            await asyncio.gather(*chat._persist_tasks)
+
+        output = capture(go())
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records[1]["content"][0]["text"] == "plain reply"
+    assert "Error" not in output
+
+
+def test_history_errors_are_reported():
+    """A failing history_callback is reported instead of silently dropped."""
+    def broken(records):
+        raise OSError("disk full")
+
+    chat = make_chat(history_callback=broken)
+
+    async def go():
+        await chat.send("hi")
+        await asyncio.gather(*chat._persist_tasks)
+
+    assert "Error saving the conversation history: disk full" in capture(go())
@@ -0,0 +1,84 @@
+"""Test the non-blocking Shift+Tab mode switch."""
+
+from unittest.mock import patch, MagicMock
+
+from nbllm import Chat
+from nbllm.ui import InputSession
+
+
+def make_chat():
+    """Create a Chat with three modes and a mocked model."""
+    mock_model = MagicMock()
+    mock_model.conversation.side_effect = lambda tools: MagicMock(responses=[], tools=tools)
+
+    with patch('llm.get_model', return_value=mock_model):
+        chat = Chat(
+            tools={"development": [], "review": [], "planning": []},
+            initial_mode="development",
+            show_banner=False,
+        )
+    return chat, mock_model
+
+
+def test_request_returns_immediately_and_shows_status():
+    """The prompt shows the target mode while the switch is pending."""
+    chat, _ = make_chat()
+
+    assert chat.request_next_mode() == "review"
+    assert chat._prompt_text() == "[review switching…] > "
+
+    chat._wait_for_mode_switch()
+    assert chat.current_mode == "review"
+    assert chat._prompt_text() == "[review] > "
+
+
+def test_rapid_requests_merge_into_one_switch():
+    """Several quick presses cycle the target but only apply the final mode."""
+    chat, mock_model = make_chat()
+    done = MagicMock()
+
+    mock_model.conversation.reset_mock()
+
+    assert chat.request_next_mode(on_done=done) == "review"
+    assert chat.request_next_mode(on_done=done) == "planning"
+    assert chat.request_next_mode(on_done=done) == "development"
+    assert chat.request_next_mode(on_done=done) == "review"
+    chat._wait_for_mode_switch()
+
+    assert mock_model.conversation.call_count == 1
+    assert chat.current_mode == "review"
+    done.assert_called_once()
+
+
+def test_request_back_to_current_mode_is_a_no_op():
+    """Cycling all the way round does not rebuild the conversation."""
+    chat, _ = make_chat()
+    conversation = chat.conversation
+
+    for _ in chat.available_modes:
+        chat.request_next_mode()
+    chat._wait_for_mode_switch()
+
+    assert chat.current_mode == "development"
+    assert chat.conversation is conversation
+
+
+def test_shift_tab_calls_either_switcher_signature():
+    """Switchers taking `on_done` run in the background; older ones switch at once."""
+    chat, _ = make_chat()
+    session = InputSession()
+    app = MagicMock()
+
+    session.update(mode_switcher_callback=chat.request_next_mode, available_modes=chat.available_modes)
+    session._switch_mode(app)
+    chat._wait_for_mode_switch()
+    assert chat.current_mode == "review"
+    app.invalidate.assert_called_once()
+
+    old_style = MagicMock(spec=lambda: None, return_value="planning")
+    session.update(mode_switcher_callback=old_style, available_modes=chat.available_modes)
+    with patch("prompt_toolkit.application.run_in_terminal", side_effect=lambda function: function()), \
+            patch("nbllm.ui._console") as console:
+        session._switch_mode(app)
+    old_style.assert_called_once_with()
+    assert "Switched to planning mode" in console.print.call_args[0][0]
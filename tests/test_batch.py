@@ -0,0 +1,114 @@
+"""Tests for the headless batch runner."""
+
+import json
+from unittest.mock import patch
+
+import llm
+import pytest
+
+from nbllm import ui
+from nbllm.batch import run_batch
+
+
+class BatchFakeModel(llm.Model):
+    """Model that answers with the uppercased prompt and counts its calls."""
+
+    model_id = "nbllm-batch-fake"
+    can_stream = True
+    supports_tools = True
+
+    def __init__(self):
+        self.prompts = []
+
+    def execute(self, prompt, stream, response, conversation):
+        self.prompts.append(prompt.prompt)
+        if prompt.prompt == "fail":
+            raise RuntimeError("model failed")
+        yield prompt.prompt.upper()
+
+
+@pytest.fixture
+def model():
+    fake = BatchFakeModel()
+    with patch('llm.get_model', return_value=fake):
+        yield fake
+
+
+def write_prompts(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+
+def read_results(path):
+    return {record["id"]: record for record in map(json.loads, path.read_text().splitlines())}
+
+
+def test_batch_writes_results(model, tmp_path):
+    """Every prompt gets a result line, errors are recorded per prompt."""
+    prompts = tmp_path / "prompts.jsonl"
+    output = tmp_path / "results.jsonl"
+    write_prompts(prompts, [{"id": "a", "prompt": "hello"}, {"prompt": "fail"}, {"prompt": "bye", "mode": "x"}])
+
+    stats = run_batch(prompts, output, workers=2)
+
+    results = read_results(output)
+    assert stats == {"completed": 1, "failed": 2, "skipped": 0}
+    assert results["a"]["response"] == "HELLO"
+    assert results["prompt-1"]["error"] == "RuntimeError: model failed"
+    assert results["prompt-2"]["error"] == "ValueError: Unknown mode: x"
+
+
+def test_batch_reports_invalid_lines(model, tmp_path):
+    """A malformed line or record fails on its own; the other prompts still run."""
+    prompts = tmp_path / "prompts.jsonl"
+    output = tmp_path / "results.jsonl"
+    prompts.write_text('{"id": "a", "prompt": "one"}\n\n{"id": "b", "prom\n{"id": "c"}\n[1]\n{"prompt": "two"}\n')
+
+    stats = run_batch(prompts, output, workers=2)
+
+    results = read_results(output)
+    assert stats == {"completed": 2, "failed": 3, "skipped": 0}
+    assert results["a"]["response"] == "ONE"
+    assert results["prompt-4"]["response"] == "TWO"
+    assert results["prompt-1"]["error"].startswith("JSONDecodeError: line 3: ")
+    assert results["prompt-2"]["error"] == 'ValueError: line 4: "prompt" must be a string'
+    assert results["prompt-3"]["error"] == "ValueError: line 5: expected an object, got list"
+
+
+def test_batch_resumes_after_crash(model, tmp_path):
+    """Answered prompts are skipped and a partial trailing line is discarded."""
+    prompts = tmp_path / "prompts.jsonl"
+    output = tmp_path / "results.jsonl"
+    write_prompts(prompts, [{"id": "a", "prompt": "one"}, {"id": "b", "prompt": "two"}])
+    # "gone" was answered in an earlier run but is no longer among the prompts
+    output.write_text(
+        json.dumps({"id": "gone", "response": "OLD", "error": None}) + "\n"
+        + json.dumps({"id": "a", "response": "ONE", "error": None}) + '\n{"id": "b", "resp'
+    )
+
+    stats = run_batch(prompts, output)
+
+    assert stats == {"completed": 1, "failed": 0, "skipped": 1}
+    assert model.prompts == ["two"]
+    assert set(read_results(output)) == {"gone", "a", "b"}
+
+
+def test_batch_mode_selects_tools_and_message(model, tmp_path):
+    """A record's mode picks its tool set and prefixes the mode message."""
+    prompts = tmp_path / "prompts.jsonl"
+    output = tmp_path / "results.jsonl"
+    write_prompts(prompts, [{"id": "a", "prompt": "hi", "mode": "plan"}])
+
+    run_batch(prompts, output, modes={"plan": ["todo"]}, mode_switch_messages={"plan": "Plan only."})
+
+    assert model.prompts == ["Plan only.\n\nhi"]
+    assert read_results(output)["a"]["error"] is None
+
+
+def test_confirm_policy_replaces_prompt():
+    """With a policy set, ui.confirm answers without asking."""
+    ui.set_confirm_policy(lambda prompt: "safe" in prompt)
+    try:
+        assert ui.confirm("Is this safe?") is True
+        assert ui.confirm("Delete everything?") is False
+    finally:
+        ui.set_confirm_policy(None)
@@ -0,0 +1,63 @@
+"""Tests for the diffs shown before file edits."""
+
+import difflib
+import io
+from unittest.mock import patch
+
+from rich.console import Console
+
+from nbllm import ui
+from nbllm.tools.editing import Edit, apply_edits, diff_hunks, replace_all, show_diff
+
+
+def unified_body(original, new):
+    """Lines of `difflib.unified_diff` without the file headers."""
+    return list(difflib.unified_diff(original.splitlines(True), new.splitlines(True), n=3))[2:]
+
+
+def hunks_body(original, new, spans):
+    lines = []
+    for hunk in diff_hunks(original, new, spans):
+        old_count = sum(tag != "+" for tag, _ in hunk.lines)
+        new_count = sum(tag != "-" for tag, _ in hunk.lines)
+        lines.append(f"@@ -{hunk.old_start + 1},{old_count} +{hunk.new_start + 1},{new_count} @@\n")
+        lines.extend(tag + text for tag, text in hunk.lines)
+    return lines
+
+
+def test_hunks_match_a_whole_file_diff():
+    original = "".join(f"line {i}\n" for i in range(100))
+    for old, new in [("line 50\n", "changed\n"), ("line 1", "x"), ("line 9", "nine\nlines"), ("line 99\n", "")]:
+        content, spans = replace_all(original, old, new)
+        assert hunks_body(original, content, spans) == unified_body(original, content)
+
+
+def test_close_changes_share_a_hunk():
+    original = "".join(f"line {i}\n" for i in range(40))
+    content, spans = apply_edits(original, [Edit("line 1\n", "one\n"), Edit("line 7\n", "seven\n")])
+    assert len(diff_hunks(original, content, spans)) == 1
+    content, spans = replace_all(original, "line 2", "x")
+    # Line 2, then lines 20-29 and 32
+    assert [hunk.old_start for hunk in diff_hunks(original, content, spans)] == [0, 17]
+
+
+@patch("nbllm.ui.confirm", return_value=False)
+def test_large_diffs_are_collapsed(mock_confirm):
+    output = io.StringIO()
+    original = "".join(f"value = {i}\n\n\n\n\n\n\n\n" for i in range(100))
+    content, spans = replace_all(original, "value", "total")
+    with patch.object(ui, "_console", Console(file=output, width=200)):
+        assert show_diff(original, content, spans, "big.py", max_lines=50)
+    text = output.getvalue()
+    assert "@@ -1,4 +1,4 @@" in text
+    assert "... 95 more hunks (-95 +95 lines) not shown" in text
+    assert mock_confirm.call_args[0][0] == "Show the whole diff (100 hunks, 897 lines)?"
+
+
+def test_markup_in_files_is_shown_as_is():
+    output = io.StringIO()
+    original = "print('[red]x[/red]')\n[/bold]\n"
+    content, spans = replace_all(original, "x", "y")
+    with patch.object(ui, "_console", Console(file=output, width=200)):
+        show_diff(original, content, spans, "markup.py")
+    assert "+print('[red]y[/red]')" in output.getvalue()
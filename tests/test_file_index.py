@@ -0,0 +1,133 @@
+"""Tests for the gitignore-aware file index behind @ completion."""
+
+import os
+import time
+from unittest.mock import patch
+
+from prompt_toolkit.document import Document
+
+from nbllm.file_completer import FilePathCompleter
+from nbllm.file_index import FileIndex
+from nbllm.gitignore import GitIgnore, IgnoreRules
+
+
+def make_tree(root, paths):
+    for path in paths:
+        target = root / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text("")
+
+
+def test_ignore_rules_follow_git():
+    rules = IgnoreRules(["*.pyc", "build/", "/top.txt", "!keep.pyc", "docs/**/*.md"])
+    assert rules.match("pkg/mod.pyc") is True
+    assert rules.match("keep.pyc") is False
+    assert rules.match("pkg/build", is_dir=True) is True
+    assert rules.match("pkg/build") is None  # "build/" only matches directories
+    assert rules.match("top.txt") is True
+    assert rules.match("pkg/top.txt") is None  # Anchored to the ignore file's directory
+    assert rules.match("docs/a/b/c.md") is True
+
+
+def test_nested_ignore_files(tmp_path):
+    make_tree(tmp_path, ["sub/a.log", "sub/b.log", "c.log"])
+    (tmp_path / ".gitignore").write_text("*.log\n")
+    (tmp_path / "sub" / ".gitignore").write_text("!b.log\n")
+    ignore = GitIgnore(tmp_path)
+    assert ignore.is_ignored("c.log")
+    assert ignore.is_ignored("sub/a.log")
+    assert not ignore.is_ignored("sub/b.log")
+    assert ignore.is_ignored(".git/config")
+
+
+def test_index_leaves_out_ignored_and_hidden_files(tmp_path):
+    make_tree(tmp_path, ["src/app.py", "node_modules/lib/index.js", ".git/HEAD", ".env", "build/out.txt"])
+    (tmp_path / ".gitignore").write_text("node_modules/\nbuild/\n")
+    index = FileIndex(tmp_path)
+    index.refresh()
+    assert index.paths == ["src/app.py"]
+    hidden = FileIndex(tmp_path, include_hidden=True)
+    hidden.refresh()
+    assert hidden.paths == [".env", ".gitignore", "src/app.py"]
+
+
+def test_refresh_lists_only_changed_directories(tmp_path):
+    make_tree(tmp_path, ["a/one.py", "b/two.py"])
+    index = FileIndex(tmp_path)
+    index.refresh()
+    scanned = []
+    scandir = os.scandir
+
+    def recording_scandir(path):
+        scanned.append(os.path.relpath(path, tmp_path))
+        return scandir(path)
+
+    with patch("nbllm.file_index.os.scandir", side_effect=recording_scandir):
+        assert not index.refresh()
+        assert scanned == []
+        (tmp_path / "a" / "three.py").write_text("")
+        assert index.refresh()
+        assert scanned == ["a"]
+    assert index.paths == ["a/one.py", "a/three.py", "b/two.py"]
+
+    # A changed .gitignore applies to the directories below it
+    (tmp_path / ".gitignore").write_text("two.py\n")
+    assert index.refresh()
+    assert index.paths == ["a/one.py", "a/three.py"]
+
+
+def test_searches_refresh_the_index(tmp_path):
+    make_tree(tmp_path, ["old.py"])
+    index = FileIndex(tmp_path, refresh_interval=0).start()
+    assert index.wait(5)
+    with patch.object(index, "_refresh", wraps=index._refresh) as refresh:
+        # An index nobody searches stays idle
+        time.sleep(0.1)
+        assert refresh.call_count == 0
+        (tmp_path / "new.py").write_text("")
+        for _ in range(500):
+            if index.search("new"):
+                break
+            time.sleep(0.01)
+        assert index.search("new") == ["new.py"]
+    index.stop()
+
+
+def test_fuzzy_search_ranks_whole_tree(tmp_path):
+    make_tree(tmp_path, [
+        "tests/test_chat_class.py",
+        "tests/test_async_chat.py",
+        "src/nbllm/chat/client.py",
+        "docs/cats.md",
+        "src/nbllm/ui.py",
+    ])
+    index = FileIndex(tmp_path)
+    index.refresh()
+    assert index.search("chatcls")[0] == "tests/test_chat_class.py"
+    assert index.search("CHATCLS")[0] == "tests/test_chat_class.py"
+    assert index.search("ui")[0] == "src/nbllm/ui.py"
+    assert index.search("xyz") == []
+    # No query lists the shallowest files first
+    assert index.search("", limit=2) == ["docs/cats.md", "tests/test_async_chat.py"]
+
+
+def test_search_stops_when_cancelled(tmp_path):
+    make_tree(tmp_path, [f"dir{i}/file{j}.py" for i in range(10) for j in range(100)])
+    index = FileIndex(tmp_path)
+    index.refresh()
+    assert len(index.search("file", limit=2000)) == 1000
+    found = index.search("file", limit=2000, cancelled=lambda: True)
+    assert 0 < len(found) < 1000
+    assert len(index.search("file", limit=2000, deadline=0.0)) == len(found)
+
+
+def test_completer_replaces_the_query(tmp_path):
+    make_tree(tmp_path, ["tests/test_chat_class.py", "README.md"])
+    index = FileIndex(tmp_path)
+    index.refresh()
+    completer = FilePathCompleter(tmp_path, index=index)
+    completions = list(completer.get_completions(Document("explain @chatcls"), None))
+    assert completions[0].text == "tests/test_chat_class.py"
+    assert completions[0].start_position == -len("chatcls")
+    assert list(completer.get_completions(Document("explain @chatcls now"), None)) == []
+    index.stop()
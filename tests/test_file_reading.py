@@ -0,0 +1,121 @@
+"""Tests for line-range reads of large files."""
+
+import os
+import random
+from unittest.mock import patch
+
+import pytest
+
+from nbllm import Chat
+from nbllm.tools import FileSystem, FileTool
+from nbllm.tools import file_reading
+from nbllm.tools.file_reading import ReadCache, read_lines
+
+
+@pytest.fixture
+def numbered(tmp_path):
+    path = tmp_path / "log.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1, 1001)))
+    return path
+
+
+def test_small_file_is_returned_as_is(tmp_path):
+    path = tmp_path / "small.txt"
+    path.write_text("a\nb")
+    assert read_lines(path) == "a\nb"
+    (tmp_path / "empty.txt").write_text("")
+    assert read_lines(tmp_path / "empty.txt") == ""
+
+
+def test_offset_and_limit(numbered):
+    assert read_lines(numbered, offset=10, limit=2) == (
+        "line 11\nline 12\n... (lines 11-12 of 1,000; continue with offset=12)"
+    )
+    assert read_lines(numbered, offset=998) == "line 999\nline 1000\n... (lines 999-1,000 of 1,000)"
+    assert "past the end" in read_lines(numbered, offset=5000)
+
+
+def test_tail(numbered):
+    assert read_lines(numbered, tail=2) == "line 999\nline 1000\n... (lines 999-1,000 of 1,000)"
+    assert read_lines(numbered, tail=5000) == numbered.read_text()
+
+
+def test_long_output_is_cut_at_a_line(numbered):
+    text = read_lines(numbered, max_chars=100)
+    assert text.endswith("... (lines 1-13 of 1,000; continue with offset=13)")
+    assert text.splitlines()[-2] == "line 13"
+
+    numbered.write_text("x" * 500)
+    assert read_lines(numbered, max_chars=100).endswith("; line 1 is cut after 100 bytes)")
+
+
+def test_ranges_match_a_full_read(tmp_path):
+    random.seed(3)
+    lines = ["".join(random.choices("abc", k=random.randint(0, 40))) for _ in range(2000)]
+    path = tmp_path / "random.txt"
+    path.write_text("\n".join(lines))
+    # Small blocks, so that ranges start and end in different blocks
+    with patch.object(file_reading, "BLOCK_SIZE", 256):
+        for _ in range(50):
+            offset, limit = random.randint(0, 2100), random.randint(1, 300)
+            expected = lines[offset:offset + limit]
+            text = read_lines(path, offset, limit, max_chars=10**6)
+            if expected:
+                assert text.rsplit("\n... (", 1)[0].split("\n") == expected
+
+
+def test_index_is_reused_until_the_file_changes(numbered):
+    file_reading._indexes.clear()
+    with patch.object(file_reading, "LineIndex", wraps=file_reading.LineIndex) as built:
+        read_lines(numbered, offset=10, limit=1)
+        read_lines(numbered, tail=1)
+        assert built.call_count == 1
+        with open(numbered, "a") as f:
+            f.write("line 1001\n")
+        os.utime(numbered, ns=(0, 0))
+        assert read_lines(numbered, tail=1).endswith("(lines 1,001-1,001 of 1,001)")
+        assert built.call_count == 2
+
+
+def test_tools_read_ranges(numbered):
+    assert FileSystem(str(numbered.parent)).read_file("log.txt", tail=1).startswith("line 1000\n")
+    assert FileTool(str(numbered)).read_file(offset=1, limit=1).startswith("line 2\n")
+
+
+def test_unchanged_reads_return_a_marker(numbered):
+    tools = FileSystem(str(numbered.parent))
+    full = tools.read_file("log.txt", limit=5)
+    assert tools.read_file("log.txt", limit=5).startswith("(unchanged: log.txt")
+    assert tools.read_file("log.txt", limit=5, force=True) == full
+    # Another range is new to the model
+    assert tools.read_file("log.txt", offset=5, limit=5).startswith("line 6")
+
+    # Same text with a new mtime: read again, but still not sent
+    os.utime(numbered, ns=(0, 0))
+    assert tools.read_file("log.txt", limit=5).startswith("(unchanged")
+    numbered.write_text("new\n")
+    assert tools.read_file("log.txt", limit=5) == "new\n"
+
+    cache = tools.read_cache
+    assert (cache.reads, cache.unchanged) == (6, 2)
+    assert cache.bytes_not_read == len(full)
+    assert cache.summary().startswith("2 of 6 reads unchanged")
+
+
+def test_chat_shares_one_read_cache(numbered):
+    file_system = FileSystem(str(numbered.parent))
+    file_tool = FileTool(str(numbered))
+    with patch("llm.get_model"):
+        chat = Chat(tools={"plan": [file_system], "build": [file_tool]}, initial_mode="plan", show_banner=False)
+    assert file_tool.read_cache is file_system.read_cache is chat.read_cache
+
+    file_system.read_file("log.txt")
+    assert file_tool.read_file().startswith("(unchanged")
+
+
+def test_forget_sends_the_text_again(numbered):
+    cache = ReadCache()
+    text, unchanged = cache.read(numbered)
+    assert not unchanged
+    cache.forget(numbered)
+    assert cache.read(numbered) == (text, False)
@@ -0,0 +1,72 @@
+"""Tests for the disk-backed, indexed prompt history."""
+
+import random
+import time
+
+from nbllm import PromptHistory
+
+
+def linear_suggest(history, prefix):
+    """Newest entry with the prefix, the way a plain scan finds it."""
+    return next((entry for entry in reversed(history.get_strings()) if entry.startswith(prefix)), None)
+
+
+def test_duplicates_move_to_the_front(tmp_path):
+    history = PromptHistory(tmp_path / "history.jsonl")
+    for text in ["a", "b", "a"]:
+        history.append_string(text)
+    assert history.get_strings() == ["b", "a"]
+    assert PromptHistory(tmp_path / "history.jsonl").get_strings() == ["b", "a"]
+
+
+def test_size_is_capped_and_file_compacted(tmp_path):
+    path = tmp_path / "history.jsonl"
+    history = PromptHistory(path, max_entries=5)
+    for i in range(30):
+        history.append_string(f"prompt {i}")
+    assert history.get_strings() == [f"prompt {i}" for i in range(25, 30)]
+    assert len(path.read_text().splitlines()) <= 10
+    assert PromptHistory(path, max_entries=5).get_strings() == history.get_strings()
+
+
+def test_multiline_entries_and_damaged_lines(tmp_path):
+    path = tmp_path / "history.jsonl"
+    PromptHistory(path).append_string("first line\nsecond line")
+    with open(path, "a") as f:
+        f.write("not json\n")
+    assert PromptHistory(path).get_strings() == ["first line\nsecond line"]
+
+
+def test_suggest_matches_a_linear_scan():
+    random.seed(3)
+    history = PromptHistory(max_entries=500)
+    words = ["git", "grep", "go", "help", "hello", "/mode", "/modes"]
+    for _ in range(2000):
+        history.append_string(" ".join(random.choices(words, k=random.randint(1, 3))))
+    prefixes = ["g", "gi", "git g", "h", "hello h", "/mo", "/modes", "x", "go go go go"]
+    for prefix in prefixes:
+        assert history.suggest(prefix) == linear_suggest(history, prefix), prefix
+
+
+def test_suggest_is_fast_with_many_entries(tmp_path):
+    path = tmp_path / "history.jsonl"
+    path.write_text("".join(f'"command {i % 97} with argument {i}"\n' for i in range(100_000)))
+    history = PromptHistory(path, max_entries=100_000)
+    history.append_string("command 5 newest")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        suggestion = history.suggest("command 5")
+    elapsed = (time.perf_counter() - start) / 1000
+    assert suggestion == "command 5 newest"
+    assert elapsed < 0.001
+
+
+def test_fuzzy_search_is_newest_first():
+    history = PromptHistory()
+    for text in ["git status", "grep todo", "git stash", "echo hi"]:
+        history.append_string(text)
+    assert history.search("gst") == ["git stash", "git status"]
+    assert history.search("GTD") == ["grep todo"]
+    assert history.search("", limit=2) == ["echo hi", "git stash"]
+    assert history.search("zzz") == []
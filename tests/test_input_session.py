@@ -0,0 +1,76 @@
+"""Tests for the prompt session reused across turns."""
+
+import pytest
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.document import Document
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+from nbllm import PromptHistory, ui
+
+
+@pytest.fixture
+def pipe():
+    with create_pipe_input() as pipe, create_app_session(input=pipe, output=DummyOutput()):
+        yield pipe
+
+
+def completions(session, text):
+    return [c.display_text for c in session._completer.get_completions(Document(text), None)]
+
+
+def test_session_is_built_once(pipe):
+    session = ui.InputSession()
+    pipe.send_text("first\r")
+    assert ui.input("> ", completions=["/help"], session=session) == "first"
+    prompt_session = session._session
+    pipe.send_text("second\r")
+    assert ui.input("> ", completions=["/help"], session=session) == "second"
+    assert session._session is prompt_session
+
+
+def test_commands_update_in_place(pipe):
+    session = ui.InputSession()
+    pipe.send_text("x\r")
+    ui.input("> ", completions=["/help"], session=session)
+    completer = session._completer
+    session.update(["/help", "/mode"])
+    assert session._completer is completer
+    assert completions(session, "/m") == ["/mode"]
+
+
+def test_shift_tab_uses_the_current_mode_switcher(pipe):
+    session = ui.InputSession()
+    calls = []
+    pipe.send_text("\x1b[Z\r")  # Shift+Tab, then Enter
+    ui.input("> ", session=session, mode_switcher_callback=lambda on_done: calls.append("old"),
+             available_modes=["plan", "build"])
+    pipe.send_text("\x1b[Z\r")
+    ui.input("> ", session=session, mode_switcher_callback=lambda on_done: calls.append("new"),
+             available_modes=["plan", "build"])
+    pipe.send_text("\x1b[Z\r")
+    ui.input("> ", session=session)  # No modes: Shift+Tab does nothing
+    assert calls == ["old", "new"]
+
+
+def test_interrupt_raises_keyboard_interrupt(pipe):
+    pipe.send_text("\x03")  # Ctrl+C
+    with pytest.raises(KeyboardInterrupt):
+        ui.input("> ", session=ui.InputSession())
+
+
+def test_ctrl_r_searches_the_history(pipe):
+    history = PromptHistory()
+    for text in ["git status", "help me", "other"]:
+        history.append_string(text)
+    session = ui.InputSession(history)
+    assert session._current_completer() is None
+    session._searching = True
+    found = session._current_completer().get_completions(Document("gst"), None)
+    assert [c.text for c in found] == ["git status"]
+
+    # Every prompt starts outside the search and adds to the history
+    pipe.send_text("next\r")
+    ui.input("> ", session=session)
+    assert not session._searching
+    assert history.get_strings()[-1] == "next"
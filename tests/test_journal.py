@@ -0,0 +1,109 @@
+"""Tests for undoing and redoing file edits."""
+
+from unittest.mock import patch
+
+import pytest
+
+from nbllm import Chat
+from nbllm.tools import FileSystem, FileTool
+from nbllm.tools.editing import EditError, replace_all
+from nbllm.tools.journal import EditJournal
+
+
+def test_undo_and_redo_restore_both_versions(tmp_path):
+    path = tmp_path / "notes.txt"
+    original = "".join(f"line {i}\n" for i in range(1000))
+    path.write_text(original)
+    content, spans = replace_all(original, "line 5\n", "five\n")
+    path.write_text(content)
+    journal = EditJournal()
+    journal.record(path, original, content, spans, "replace_in_file")
+
+    entry = journal.history()[0][0]
+    assert sum(len(change.old_text) + len(change.new_text) for change in entry.changes) == len("line 5\n") + len("five\n")
+    assert journal.undo().description == "replace_in_file"
+    assert path.read_text() == original
+    journal.redo()
+    assert path.read_text() == content
+    with pytest.raises(EditError, match="nothing to redo"):
+        journal.redo()
+
+
+def test_whole_file_writes_are_stored_as_one_change(tmp_path):
+    path = tmp_path / "config.ini"
+    journal = EditJournal()
+    journal.record(path, None, "a = 1\n")
+    journal.record(path, "a = 1\n", "a = 2\n")
+    assert journal.history()[0][1].changes[0][1:] == ("1", "2")
+    path.write_text("a = 2\n")
+    journal.undo()
+    assert path.read_text() == "a = 1\n"
+    journal.undo()
+    assert not path.exists()
+    journal.redo()
+    assert path.read_text() == "a = 1\n"
+
+
+def test_undo_refuses_after_outside_changes(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("new")
+    journal = EditJournal()
+    journal.record(path, "old", "new")
+    path.write_text("changed by hand")
+    with pytest.raises(EditError, match="changed outside this session"):
+        journal.undo()
+    assert path.read_text() == "changed by hand"
+    assert len(journal.history()[0]) == 1
+
+
+def test_a_new_edit_clears_redo(tmp_path):
+    journal = EditJournal()
+    (tmp_path / "a").write_text("2")
+    journal.record(tmp_path / "a", "1", "2")
+    journal.undo()
+    journal.record(tmp_path / "b", None, "x")
+    assert journal.history()[1] == []
+
+
+@patch("nbllm.ui.confirm", return_value=True)
+@patch("builtins.print")
+def test_file_system_undo_last_edit(mock_print, mock_confirm, tmp_path):
+    tools = FileSystem(str(tmp_path))
+    tools.write_file("module.py", "x = 1\ny = 2\n")
+    tools.replace_in_file("module.py", "y = 2", "y = 3")
+    assert tools.undo_last_edit() == "Reverted the replace_in_file of 'module.py' (-0 +0 lines)"
+    assert (tmp_path / "module.py").read_text() == "x = 1\ny = 2\n"
+    assert tools.undo_last_edit("module.py") == "Reverted the write_file of 'module.py' (-2 +0 lines)"
+    assert not (tmp_path / "module.py").exists()
+    assert tools.undo_last_edit().startswith("Error: nothing to undo")
+
+
+@patch("builtins.print")
+def test_file_tool_undo_declined(mock_print, tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text("x = 1\n")
+    tool = FileTool(str(path))
+    with patch("nbllm.ui.confirm", return_value=True):
+        tool.replace_in_file("x = 1", "x = 2")
+    with patch("nbllm.ui.confirm", return_value=False):
+        assert "user declined" in tool.undo_last_edit()
+    assert path.read_text() == "x = 2\n"
+
+
+@patch("builtins.print")
+def test_chat_slash_commands(mock_print, tmp_path):
+    file_system = FileSystem(str(tmp_path))
+    (tmp_path / "a.txt").write_text("one")
+    file_tool = FileTool(str(tmp_path / "a.txt"))
+    with patch("llm.get_model"):
+        chat = Chat(tools={"plan": [file_system], "build": [file_tool]}, initial_mode="plan", show_banner=False)
+    assert file_tool.journal is file_system.journal is chat.edit_journal
+    assert "/undo" in chat._get_builtin_commands()
+
+    with patch("nbllm.ui.confirm", return_value=True):
+        file_tool.replace_in_file("one", "two")
+    chat._handle_input("/undo", {})
+    assert (tmp_path / "a.txt").read_text() == "one"
+    chat._handle_input("/redo", {})
+    assert (tmp_path / "a.txt").read_text() == "two"
+    assert chat._handle_input("/history", {}) == "HANDLED"
@@ -0,0 +1,79 @@
+"""Tests for incremental Markdown rendering while streaming."""
+
+from io import StringIO
+
+import pytest
+from rich.console import Console
+from rich.markdown import Markdown
+
+from nbllm import streaming, ui
+
+REPLY = """# Title
+
+Some *text* here
+continues.
+
+- one
+- two
+
+```python
+def f():
+    return 1
+```
+Last paragraph"""
+
+
+@pytest.fixture
+def output():
+    original_file, original_width = ui._console.file, ui._console.width
+    ui._console.file = StringIO()
+    ui._console.width = 60
+    try:
+        yield ui._console.file
+    finally:
+        ui._console.file = original_file
+        ui._console.width = original_width
+
+
+def stream(text, chunk_size=3, indent=0):
+    ui.start_streaming(indent, markdown=True)
+    for i in range(0, len(text), chunk_size):
+        ui.stream_chunk(text[i:i + chunk_size], indent)
+    ui.end_streaming(indent)
+
+
+def lines(text):
+    return [line.rstrip() for line in text.strip("\n").splitlines()]
+
+
+def test_matches_rendering_the_whole_reply(output):
+    stream(REPLY)
+    console = Console(file=StringIO(), width=60)
+    console.print(Markdown(REPLY))
+    assert lines(output.getvalue()) == lines(console.file.getvalue())
+
+
+def test_finished_blocks_leave_the_tail(output):
+    ui.start_streaming(0, markdown=True)
+    ui.stream_chunk("First paragraph.\n\nSecond")
+    assert ui._stream_renderer._markdown._tail() == "Second"
+    assert "First paragraph." in output.getvalue()
+    ui.end_streaming(0)
+    assert output.getvalue().count("First paragraph.") == 1
+
+
+def test_code_blocks_are_highlighted_once(output):
+    block = "```python\nx = 1\n```\n"
+    stream(block)
+    hits = streaming._highlight_code.cache_info().hits
+    stream(block)
+    assert streaming._highlight_code.cache_info().hits == hits + 1
+
+
+def test_falls_back_to_plain_text_above_limit(output, monkeypatch):
+    monkeypatch.setattr(streaming, "MARKDOWN_STREAM_LIMIT", 20)
+    stream("Short *start*\n\nthen a much longer **tail** follows")
+    text = output.getvalue()
+    assert "Short start" in text
+    assert "**tail**" in text
+    assert ui._stream_renderer._markdown is None
@@ -0,0 +1,61 @@
+"""Test that mode switches transfer the conversation instead of replaying it."""
+
+from unittest.mock import patch, MagicMock
+
+from nbllm import Chat
+
+
+def make_chat():
+    """Create a Chat whose model hands out a fresh mock conversation per call."""
+    read_tool = MagicMock()
+    write_tool = MagicMock()
+
+    mock_model = MagicMock()
+    mock_model.conversation.side_effect = lambda tools: MagicMock(responses=[], tools=tools)
+
+    with patch('llm.get_model', return_value=mock_model):
+        chat = Chat(
+            tools={
+                "development": [read_tool, write_tool],
+                "review": [read_tool],
+            },
+            mode_switch_messages={"review": "You are now in review mode."},
+            initial_mode="development",
+            show_banner=False,
+        )
+    return chat, read_tool
+
+
+def test_switch_transfers_responses_without_model_calls():
+    """Responses move to the new conversation and nothing is sent to the model."""
+    chat, read_tool = make_chat()
+    old_conversation = chat.conversation
+    old_conversation.responses = ["response-1", "response-2"]
+
+    assert chat.switch_to_next_mode() == "review"
+
+    assert chat.conversation is not old_conversation
+    assert chat.conversation.responses == ["response-1", "response-2"]
+    assert chat.conversation.tools == [read_tool]
+    assert not old_conversation.chain.called
+    assert not chat.conversation.chain.called
+
+
+def test_mode_message_is_sent_with_next_prompt():
+    """The mode switch message is queued and prefixed to the next user message."""
+    chat, _ = make_chat()
+
+    chat.switch_mode("review")
+
+    assert chat._with_mode_message("hello") == "You are now in review mode.\n\nhello"
+    assert chat._with_mode_message("again") == "again"
+
+
+def test_switch_to_mode_without_message():
+    """Switching to a mode without a configured message leaves prompts untouched."""
+    chat, _ = make_chat()
+
+    chat.switch_mode("review")
+    chat.switch_mode("development")
+
+    assert chat._with_mode_message("hello") == "hello"
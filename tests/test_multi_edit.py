@@ -0,0 +1,94 @@
+"""Tests for applying several edits to a file at once."""
+
+from unittest.mock import patch
+
+import pytest
+
+from nbllm.tools import FileSystem, FileTool
+from nbllm.tools.editing import DECLINED, Edit, EditError, apply_edits, write_atomic
+
+
+SOURCE = "def a():\n    return 1\n\ndef b():\n    return 1\n\nx = a() + b()\n"
+
+
+def test_apply_edits_in_one_pass():
+    new, spans = apply_edits(SOURCE, [
+        Edit("def b():\n    return 1", "def b():\n    return 2"),
+        Edit("x = a()", "x = first()"),
+        Edit("def a", "def first"),
+    ])
+    assert new == "def first():\n    return 1\n\ndef b():\n    return 2\n\nx = first() + b()\n"
+    assert [SOURCE[start:end] for start, end, _ in spans] == ["def a", "def b():\n    return 1", "x = a()"]
+
+
+@pytest.mark.parametrize("edits, message", [
+    ([Edit("missing", "x")], "not found"),
+    ([Edit("return 1", "return 2")], "found 2 times, expected 1"),
+    ([Edit("return 1", "return 2", 3)], "found 2 times, expected 3"),
+    ([Edit("def a():", "x"), Edit("a():\n    return", "y")], "edits 1 and 2 overlap"),
+    ([Edit("", "x")], "empty old_string"),
+])
+def test_apply_edits_rejects(edits, message):
+    with pytest.raises(EditError, match=message):
+        apply_edits(SOURCE, edits)
+
+
+def test_write_atomic_keeps_mode_and_line_endings(tmp_path):
+    path = tmp_path / "script.sh"
+    path.write_text("old")
+    path.chmod(0o755)
+    write_atomic(path, "a\r\nb\n")
+    assert path.read_bytes() == b"a\r\nb\n"
+    assert path.stat().st_mode & 0o777 == 0o755
+    assert [p.name for p in tmp_path.iterdir()] == ["script.sh"]
+
+
+@patch("nbllm.ui.confirm", return_value=True)
+@patch("builtins.print")
+def test_multi_edit_asks_once(mock_print, mock_confirm, tmp_path):
+    (tmp_path / "module.py").write_text(SOURCE)
+    tools = FileSystem(str(tmp_path))
+    result = tools.multi_edit("module.py", [
+        {"old_string": "return 1", "new_string": "return 0", "expected_count": 2},
+        {"old_string": "x = ", "new_string": "total = "},
+    ])
+    assert result == "Applied changes to 'module.py'"
+    assert mock_confirm.call_count == 1
+    assert (tmp_path / "module.py").read_text() == SOURCE.replace("return 1", "return 0").replace("x = ", "total = ")
+
+
+@patch("nbllm.ui.confirm", return_value=True)
+@patch("builtins.print")
+def test_multi_edit_writes_nothing_on_error(mock_print, mock_confirm, tmp_path):
+    (tmp_path / "module.py").write_text(SOURCE)
+    tools = FileSystem(str(tmp_path))
+    result = tools.multi_edit("module.py", [
+        {"old_string": "x = ", "new_string": "total = "},
+        {"old_string": "return 1", "new_string": "return 0"},
+    ])
+    assert result.startswith("Error: edit 2: old_string found 2 times, expected 1")
+    assert result.endswith("No changes were written.")
+    assert not mock_confirm.called
+    assert (tmp_path / "module.py").read_text() == SOURCE
+    assert tools.multi_edit("module.py", [{"old": "x"}]).startswith("Error: edit 1 needs old_string")
+
+
+@patch("nbllm.ui.confirm", return_value=False)
+@patch("builtins.print")
+def test_file_tool_multi_edit_declined(mock_print, mock_confirm, tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text(SOURCE)
+    tool = FileTool(str(path))
+    assert tool.multi_edit([{"old_string": "x = ", "new_string": "total = "}]) == DECLINED
+    assert path.read_text() == SOURCE
+
+
+def test_file_tool_descriptions(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text(SOURCE)
+    tool = FileTool(str(path))
+    descriptions = {t.name.split("_", 2)[-1]: t.description for t in tool.tools()}
+    assert all(descriptions.values())
+    assert descriptions["multi_edit"].startswith("Apply several replacements to module.py at once")
+    assert '{"old_string": ..., "new_string": ..., "expected_count": 1}' in descriptions["multi_edit"]
+    assert "module.py" in tool.__doc__
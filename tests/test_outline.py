@@ -0,0 +1,92 @@
+"""Tests for outlining Python files and reading single symbols."""
+
+import os
+
+import pytest
+
+from nbllm.tools import FileSystem, FileTool
+from nbllm.tools.outline import module_index, outline, read_symbol
+
+SOURCE = '''\
+import functools
+
+
+class Greeter(object):
+    """Say hello."""
+
+    @functools.lru_cache()
+    def greet(self, name: str = "world") -> str:
+        def shout(text):
+            return text.upper()
+        return shout(f"hello {name}")
+
+    async def wait(self):
+        pass
+
+
+def greet(names):
+    return [Greeter().greet(name) for name in names]
+'''
+
+
+@pytest.fixture
+def module(tmp_path):
+    path = tmp_path / "greeter.py"
+    path.write_text(SOURCE)
+    return path
+
+
+def test_outline(module):
+    assert outline(module) == "\n".join([
+        "class Greeter(object)  # lines 4-14",
+        "    def greet(self, name: str='world') -> str  # lines 7-11",
+        "    async def wait(self)  # lines 13-14",
+        "def greet(names)  # lines 17-18",
+        "(18 lines)",
+    ])
+
+
+def test_read_symbol(module):
+    assert read_symbol(module, "Greeter.greet").splitlines()[:3] == [
+        "# Greeter.greet, lines 7-11 of 18",
+        "    @functools.lru_cache()",
+        "    def greet(self, name: str = \"world\") -> str:",
+    ]
+    assert read_symbol(module, "wait").startswith("# Greeter.wait, lines 13-14")
+    assert read_symbol(module, "Greeter.greet.shout").startswith("# Greeter.greet.shout, lines 9-10")
+    # A qualified name comes before a method of the same name
+    assert read_symbol(module, "greet") == "# greet, lines 17-18 of 18\ndef greet(names):\n    return [Greeter().greet(name) for name in names]\n"
+    assert read_symbol(module, "Greeter.gret").endswith("did you mean Greeter.greet?")
+
+
+def test_index_is_cached_until_the_file_changes(module):
+    index = module_index(module)
+    assert module_index(module) is index
+    module.write_text(SOURCE + "\n\ndef more():\n    pass\n")
+    os.utime(module, ns=(1, 1))
+    assert module_index(module) is not index
+    assert read_symbol(module, "more").startswith("# more, lines 21-22")
+
+
+def test_errors(tmp_path, module):
+    (tmp_path / "broken.py").write_text("def broken(:\n")
+    assert outline(tmp_path / "broken.py").startswith("Error: cannot parse broken.py as Python (line 1")
+    (tmp_path / "notes.md").write_text("# Notes\n")
+    assert outline(tmp_path / "notes.md").startswith("Error: only Python files")
+    assert read_symbol(tmp_path / "missing.py", "f").startswith("Error: cannot outline missing.py (FileNotFoundError: ")
+
+
+def test_form_feeds_do_not_split_lines(tmp_path):
+    path = tmp_path / "paged.py"
+    path.write_text("def f():\n    pass\n\x0c\ndef g():\n    x = '\u2028'\n    return x\n", encoding="utf-8")
+    assert read_symbol(path, "g") == "# g, lines 4-6 of 6\ndef g():\n    x = '\u2028'\n    return x\n"
+
+
+def test_tools(module):
+    tools = FileSystem(str(module.parent))
+    assert tools.outline("greeter.py").startswith("class Greeter(object)")
+    assert tools.read_symbol("greeter.py", "Greeter").startswith("# Greeter, lines 4-14")
+    assert tools.outline("missing.py").startswith("Error:")
+    file_tool = FileTool(str(module))
+    assert file_tool.outline() == tools.outline("greeter.py")
+    assert file_tool.read_symbol("Greeter.wait").startswith("# Greeter.wait")
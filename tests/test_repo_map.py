@@ -0,0 +1,112 @@
+"""Tests for the repository map."""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from nbllm import Chat
+from nbllm.tools import FileSystem
+from nbllm.tools.repo_map import MAP_TITLE, RepoMap, parse_file
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "project"
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "engine.py").write_text(
+        "class Engine:\n    def start(self, speed: int) -> None:\n        pass\n\n    def _reset(self):\n        pass\n"
+        "\n\nclass _Hidden:\n    def shown(self):\n        pass\n"
+    )
+    (root / "pkg" / "helpers.py").write_text("def run():\n    pass\n\ndef _private():\n    pass\n")
+    for name in ("a", "b", "c"):
+        (root / "pkg" / f"use_{name}.py").write_text("from .engine import Engine\n\ndef main():\n    Engine().start(1)\n")
+    # Uses the name "run" without importing it from helpers
+    (root / "pkg" / "tasks.py").write_text("def task(run):\n    return run\n")
+    (root / "web.ts").write_text("export default class App {\n}\nexport async function render(app: App) {\n}\n")
+    (root / "ignored").mkdir()
+    (root / "ignored" / "skip.py").write_text("def skipped():\n    pass\n")
+    (root / ".gitignore").write_text("ignored/\n")
+    return root
+
+
+def test_files_rank_by_imports(tree, tmp_path):
+    repo_map = RepoMap(tree, tmp_path / "map.json")
+    repo_map.update()
+    scores = dict(repo_map.ranked())
+    assert list(scores)[0] == "pkg/engine.py"
+    assert scores["pkg/engine.py"] == 3
+    assert scores["pkg/helpers.py"] == 0
+    assert "ignored/skip.py" not in scores
+
+    text = repo_map.render()
+    assert text.startswith(MAP_TITLE + "project: 7 source files")
+    assert "pkg/engine.py:\n    class Engine [1]\n        def start(self, speed: int) -> None [2]\n" in text
+    assert "_reset" not in text and "_private" not in text and "shown" not in text
+    assert "export default class App [1]" in text
+
+
+def test_cache_is_updated_incrementally(tree, tmp_path):
+    cache_path = tmp_path / "map.json"
+    assert RepoMap(tree, cache_path).update() == 7
+    assert cache_path.exists()
+
+    repo_map = RepoMap(tree, cache_path)
+    assert repo_map.update() == 0
+    helpers = tree / "pkg" / "helpers.py"
+    helpers.write_text("def run():\n    pass\n\ndef walk():\n    pass\n")
+    os.utime(helpers, ns=(0, 0))
+    (tree / "pkg" / "tasks.py").unlink()
+    assert repo_map.update() == 1
+    assert "def walk() [4]" in repo_map.render()
+    assert "pkg/tasks.py" not in dict(repo_map.ranked())
+    assert RepoMap(tree, cache_path).update() == 0
+
+
+def test_damaged_cache_is_rebuilt(tree, tmp_path):
+    cache_path = tmp_path / "map.json"
+    cache_path.write_text("{not json")
+    assert RepoMap(tree, cache_path).update() == 7
+
+
+def test_map_fits_the_token_budget(tmp_path):
+    for i in range(200):
+        (tmp_path / f"module_{i:03}.py").write_text("".join(f"def function_{j}(argument):\n    pass\n" for j in range(10)))
+    text = RepoMap(tmp_path, cache_path=False).render(max_tokens=200)
+    assert len(text) <= 200 * 4
+    assert text.endswith("more files; use search, glob or outline to find them")
+
+
+def test_parse_file():
+    symbols, identifiers = parse_file("main.go", b"package main\n\nfunc (s *Server) Serve(port int) error {\n}\n")
+    assert [(symbol.name, symbol.text) for symbol in symbols] == [("Serve", "func (s *Server) Serve(port int) error")]
+    assert "Server" in identifiers.split()
+    # Invalid Python falls back to definitions starting a line
+    symbols, _ = parse_file("broken.py", b"def ok():\n    pass\ndef broken(:\n")
+    assert [(symbol.name, symbol.line) for symbol in symbols] == [("ok", 1), ("broken", 3)]
+    assert parse_file("data.py", b"\x00\x01\x02binary") is None
+
+
+def test_parse_failures_fall_back_to_the_regex(tree, tmp_path):
+    with patch("nbllm.tools.repo_map.signature", side_effect=AttributeError("unparse")):
+        symbols, _ = parse_file("ok.py", b"def ok(value):\n    pass\n")
+        assert [symbol.text for symbol in symbols] == ["def ok(value):"]
+        repo_map = RepoMap(tree, tmp_path / "map.json")
+        assert repo_map.update() == 7
+    assert "pkg/engine.py:\n    class Engine:" in repo_map.render()
+
+
+@patch("builtins.print")
+def test_tool_and_system_prompt(mock_print, tree, tmp_path):
+    with patch("nbllm.tools.repo_map.CACHE_DIRECTORY", tmp_path / "maps"):
+        file_system = FileSystem(str(tree))
+        assert file_system.repo_map().startswith(MAP_TITLE + "project")
+        assert len(list((tmp_path / "maps").iterdir())) == 1
+
+        with patch("llm.get_model"):
+            chat = Chat(tools=[file_system], system_prompt="Be brief.", show_banner=False, repo_map_tokens=500)
+        assert chat.system_prompt.startswith("Be brief.\n\n" + MAP_TITLE + "project")
+        assert file_system._repo_map.root == tree
+        # A resumed session's map is replaced, not repeated
+        chat._add_repo_map(500)
+        assert chat.system_prompt.count(MAP_TITLE) == 1
@@ -0,0 +1,94 @@
+"""Tests for the regex search of the FileSystem tool."""
+
+import re
+
+import pytest
+
+from nbllm.tools import FileSystem
+from nbllm.tools.search import _required_literal, search_tree
+
+
+@pytest.fixture
+def tree(tmp_path):
+    files = {
+        "src/app.py": "import os\n\ndef handle_request(request):\n    return request\n",
+        "src/util.py": "from app import handle_request\nhandle_request(None)\n",
+        "tests/test_app.py": "def test_handle_request():\n    assert handle_request\n",
+        "build/generated.py": "handle_request = 1\n",
+        "image.bin": "handle_request\0\x01\x02",
+        ".gitignore": "build/\n",
+    }
+    for path, content in files.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(content)
+    return tmp_path
+
+
+def test_lists_matching_lines(tree):
+    result = search_tree(tree, r"return \w+")
+    assert result == "src/app.py:4:     return request\n1 matching lines in 1 files"
+
+
+def test_skips_binary_and_ignored_files(tree):
+    result = search_tree(tree, "handle_request")
+    assert "image.bin" not in result
+    assert "build/" not in result
+    assert result.endswith("5 matching lines in 3 files")
+
+
+def test_definitions_come_first(tree):
+    lines = search_tree(tree, "handle_request").splitlines()
+    assert lines[0] == "src/app.py:3: def handle_request(request):"
+    assert lines[1].startswith("tests/test_app.py:1:")
+
+
+def test_context_lines(tree):
+    result = search_tree(tree, "def handle", context=1)
+    assert result.splitlines()[:3] == [
+        "src/app.py-2- ",
+        "src/app.py:3: def handle_request(request):",
+        "src/app.py-4-     return request",
+    ]
+
+
+def test_path_and_glob_filters(tree):
+    assert "tests/" not in search_tree(tree, "handle_request", path="src")
+    assert search_tree(tree, "handle_request", glob="test_*.py").endswith("2 matching lines in 1 files")
+    assert search_tree(tree, "handle_request", path="src/util.py").endswith("2 matching lines in 1 files")
+
+
+def test_stops_at_the_limit(tmp_path):
+    for i in range(100):
+        (tmp_path / f"file{i:03}.txt").write_text("match\n" * 10)
+    result = search_tree(tmp_path, "match", max_results=25, workers=2)
+    lines = result.splitlines()
+    assert len(lines) == 26
+    assert lines[-1].startswith("25 matching lines in 3 files (stopped at 25")
+
+
+def test_required_literal():
+    assert _required_literal(re.compile(r"\bname\w+")) == b"name"
+    assert _required_literal(re.compile(r"(foo)+x?yz")) == b"foo"
+    assert _required_literal(re.compile(r"a|bc")) is None
+    assert _required_literal(re.compile("abc", re.IGNORECASE)) is None
+    # A case-insensitive group does not require its literals as written
+    assert _required_literal(re.compile("(?i:foo)bar")) == b"bar"
+    assert _required_literal(re.compile("(?i:foobar)x")) == b"x"
+
+
+def test_scoped_ignore_case_group(tmp_path):
+    (tmp_path / "a.txt").write_text("FOObar\n")
+    assert search_tree(tmp_path, "(?i:foo)bar").startswith("a.txt:1: FOObar")
+
+
+def test_other_text_encodings(tmp_path):
+    (tmp_path / "wide.txt").write_bytes("caf\u00e9 = 1\n".encode("utf-16"))
+    (tmp_path / "legacy.txt").write_bytes("caf\u00e9 = 2\n".encode("cp1252"))
+    assert search_tree(tmp_path, "caf\u00e9 =").splitlines()[:2] == ["legacy.txt:1: caf\u00e9 = 2", "wide.txt:1: caf\u00e9 = 1"]
+
+
+def test_file_system_search(tree):
+    tools = FileSystem(str(tree))
+    assert tools.search("return", path="src").startswith("src/app.py:4:")
+    assert tools.search("(unclosed").startswith("Error: invalid regular expression")
+    assert tools.search("x", path="missing").startswith("Error:")
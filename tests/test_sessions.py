@@ -0,0 +1,167 @@
+"""Tests for the SQLite session store and resuming chats from it."""
+
+from io import StringIO
+from unittest.mock import patch
+
+import llm
+import pytest
+import typer
+from typer.testing import CliRunner
+
+from nbllm import Chat, SessionStore, ui
+from nbllm.__main__ import app
+
+
+class Notes(llm.Toolbox):
+    """Toolbox used by the fake model."""
+
+    def add(self, text: str) -> str:
+        """Add a note."""
+        return f"noted {text}"
+
+
+class NotesModel(llm.Model):
+    """Model that calls `add` for "note ..." prompts and reports what it has seen."""
+
+    model_id = "nbllm-notes-fake"
+    can_stream = True
+    supports_tools = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def execute(self, prompt, stream, response, conversation):
+        self.calls += 1
+        if prompt.tool_results:
+            yield prompt.tool_results[0].output
+            return
+        if prompt.prompt.startswith("note "):
+            response.add_tool_call(llm.ToolCall(name="Notes_add", arguments={"text": prompt.prompt[5:]}, tool_call_id="call_1"))
+            return
+        previous = len(conversation.responses) if conversation else 0
+        yield f"{previous} earlier responses"
+
+
+def make_chat(model, **kwargs):
+    with patch('llm.get_model', return_value=model):
+        return Chat(tools=[Notes()], show_banner=False, **kwargs)
+
+
+def send(chat, text):
+    output = StringIO()
+    original_file = ui._console.file
+    ui._console.file = output
+    try:
+        return "".join(chat._chain(text))
+    finally:
+        ui._console.file = original_file
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(tmp_path / "sessions.db")
+    yield store
+    store.close()
+
+
+def test_responses_and_tools_are_saved_as_they_happen(store):
+    chat = make_chat(NotesModel(), session_store=store, system_prompt="Be brief")
+    assert send(chat, "note milk") == "noted milk"
+
+    session = store.get_session(chat.session_id)
+    assert session["turns"] == 2
+    assert session["title"] == "note milk"
+    assert session["system_prompt"] == "Be brief"
+    assert len(store.load_responses(chat.session_id)) == 2
+    assert [(e["kind"], e["name"]) for e in store.tool_events(chat.session_id)] == [
+        ("call", "Notes_add"),
+        ("result", "Notes_add"),
+    ]
+
+
+def test_resume_rebuilds_chat_without_model_calls(store):
+    chat = make_chat(NotesModel(), session_store=store, system_prompt="Be brief")
+    send(chat, "note milk")
+
+    model = NotesModel()
+    resumed = make_chat(model, session_store=store, session_id=chat.session_id[:6])
+    assert model.calls == 0
+    assert resumed.session_id == chat.session_id
+    assert resumed.system_prompt == "Be brief"
+    assert [r.text() for r in resumed.conversation.responses] == ["", "noted milk"]
+
+    # The resumed conversation continues where it stopped and keeps saving
+    assert send(resumed, "hello") == "2 earlier responses"
+    assert store.get_session(chat.session_id)["turns"] == 3
+
+
+def test_resume_restores_mode(store):
+    tools = {"plan": [], "build": [Notes()]}
+    chat = make_chat(NotesModel(), session_store=store, initial_mode="plan")
+    chat.mode_tools = tools
+    chat.available_modes = list(tools)
+    chat._apply_mode("build")
+    send(chat, "hello")
+
+    with patch('llm.get_model', return_value=NotesModel()):
+        resumed = Chat(tools=tools, initial_mode="plan", show_banner=False,
+                       session_store=store, session_id=chat.session_id)
+    assert resumed.current_mode == "build"
+
+
+def test_unknown_session(store):
+    with pytest.raises(typer.Exit):
+        make_chat(NotesModel(), session_store=store, session_id="missing")
+
+
+def test_list_sessions_filters(store):
+    first = store.create_session(model="a", mode="plan")
+    second = store.create_session(model="b", mode="build")
+
+    assert [s["id"] for s in store.list_sessions()] == [second, first]
+    assert [s["id"] for s in store.list_sessions(model="a")] == [first]
+    assert [s["id"] for s in store.list_sessions(mode="build")] == [second]
+    assert store.list_sessions(since="2999-01-01") == []
+
+
+def test_lookups_use_indexes(store):
+    plans = {
+        query: " ".join(row[-1] for row in store._db.execute("EXPLAIN QUERY PLAN " + query, params))
+        for query, params in [
+            ("SELECT * FROM sessions WHERE mode = ? ORDER BY updated_at DESC", ("plan",)),
+            ("SELECT * FROM sessions WHERE model = ? ORDER BY updated_at DESC", ("a",)),
+            ("SELECT * FROM sessions ORDER BY updated_at DESC LIMIT 20", ()),
+        ]
+    }
+    for query, plan in plans.items():
+        assert "USING INDEX" in plan or "USING COVERING INDEX" in plan, query
+        assert "TEMP B-TREE" not in plan, query
+
+
+def test_ambiguous_prefix(store):
+    store.create_session(session_id="abc1")
+    store.create_session(session_id="abc2")
+    assert store.get_session("abc") is None
+    assert store.get_session("abc2")["id"] == "abc2"
+
+
+def test_resume_without_saving(store):
+    chat = make_chat(NotesModel(), session_store=store)
+    send(chat, "note milk")
+
+    resumed = make_chat(NotesModel(), session_store=store, session_id=chat.session_id, save_session=False)
+    assert send(resumed, "note eggs") == "noted eggs"
+    assert len(store.load_responses(chat.session_id)) == 2
+    assert store.get_session(chat.session_id)["turns"] == 2
+
+
+def test_no_save_cli_option_is_passed_on(store, tmp_path):
+    chat = make_chat(NotesModel(), session_store=store)
+    send(chat, "hello")
+    with patch("nbllm.__main__.chat") as run_chat:
+        result = CliRunner().invoke(app, [
+            "--resume", chat.session_id, "--no-save", "--history", "off", "--sessions-db", str(tmp_path / "sessions.db"),
+        ])
+    assert result.exit_code == 0, result.output
+    assert run_chat.call_args.kwargs["session_id"] == chat.session_id
+    assert run_chat.call_args.kwargs["save_session"] is False
@@ -0,0 +1,63 @@
+"""Tests for reading binary files and text in other encodings."""
+
+import gzip
+
+import pytest
+
+from nbllm.tools.file_reading import LONG_LINE_PREVIEW, read_lines
+from nbllm.tools.sniff import SNIFF_BYTES, hexdump, sniff
+
+
+@pytest.mark.parametrize("head, description, encoding", [
+    (b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR", "PNG image", None),
+    (gzip.compress(b"data"), "gzip archive", None),
+    (b"PAR1\x15\x04\x15\x00\x15", "Parquet file", None),
+    (b"\x00\x01\x02\x03\x04", "binary data", None),
+    (b"PAR1 is not a signature in text\n", "ASCII text", "utf-8"),
+    ("naïve\n".encode("utf-8"), "UTF-8 text", "utf-8"),
+    ("naïve\n".encode("cp1252"), "Windows-1252 text", "cp1252"),
+    ("text\n".encode("utf-16"), "UTF-16 text", "utf-16"),
+    ("text\n".encode("utf-16-le"), "UTF-16 text", "utf-16-le"),
+    ("text\n".encode("utf-8-sig"), "UTF-8 text with BOM", "utf-8-sig"),
+])
+def test_sniff(head, description, encoding):
+    file_type = sniff(head, len(head))
+    assert (file_type.description, file_type.encoding) == (description, encoding)
+    assert file_type.binary == (encoding is None)
+
+
+def test_utf8_cut_in_the_middle_of_a_character():
+    head = ("é" * SNIFF_BYTES).encode("utf-8")[:SNIFF_BYTES - 1]
+    assert sniff(head, SNIFF_BYTES * 2).encoding == "utf-8"
+
+
+def test_hexdump():
+    assert hexdump(b"\x89PNG\r\n\x1a\nabc") == "00000000: 8950 4e47 0d0a 1a0a 6162 63              .PNG....abc"
+
+
+def test_binary_files_are_summarized(tmp_path):
+    path = tmp_path / "image.png"
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 100)
+    text = read_lines(path)
+    assert text.startswith("(binary file: PNG image, 25,608 bytes; not shown as text. First 256 bytes:)\n")
+    assert len(text.splitlines()) == 17
+
+
+def test_text_in_other_encodings(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes("café\nnaïve\n".encode("utf-16"))
+    assert read_lines(path) == "café\nnaïve\n\n(decoded from UTF-16 text)"
+    path.write_bytes("café\nnaïve\n".encode("cp1252"))
+    assert read_lines(path, offset=1) == "naïve\n... (lines 2-2 of 2)\n(decoded from Windows-1252 text)"
+    path.write_bytes("café\n".encode("utf-8-sig"))
+    assert read_lines(path) == "café\n"
+
+
+def test_large_minified_files_are_previewed(tmp_path):
+    path = tmp_path / "bundle.min.js"
+    path.write_bytes(b"var a=function(b){return b+1};" * 50_000)
+    text = read_lines(path)
+    assert text.startswith("var a=function")
+    assert f"{path.stat().st_size:,} bytes, with lines too long to read by line" in text
+    assert len(text) < LONG_LINE_PREVIEW + 300
+    assert "showing the last 2,000 bytes" in read_lines(path, tail=5)
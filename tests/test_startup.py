@@ -0,0 +1,77 @@
+"""Startup budget: `import nbllm` and the time until the banner is shown."""
+
+import subprocess
+import sys
+import time
+
+# Seconds on top of a bare interpreter start; generous so slow CI machines pass
+IMPORT_BUDGET = 0.25
+BANNER_BUDGET = 2.0
+
+# Modules only needed once a prompt, a choice, Markdown or a tool is used
+DEFERRED_MODULES = ["prompt_toolkit", "questionary", "rich.markdown", "rich.syntax", "requests", "bs4", "markdownify"]
+
+BANNER_SCRIPT = """
+import sys
+from unittest.mock import patch
+
+import llm
+
+
+class QuietModel(llm.Model):
+    model_id = "nbllm-startup-fake"
+    can_stream = True
+
+    def execute(self, prompt, stream, response, conversation):
+        yield "ok"
+
+
+from nbllm import Chat
+
+with patch("llm.get_model", return_value=QuietModel()):
+    chat = Chat()
+chat._start_session()
+sys.stdout.flush()
+deferred = [name for name in {deferred!r} if name in sys.modules]
+print("DEFERRED", ",".join(deferred))
+"""
+
+
+def run_python(code):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stdout
+
+
+def best_of(code, runs=3):
+    return min(run_python(code)[0] for _ in range(runs))
+
+
+def test_import_nbllm_is_fast():
+    baseline = best_of("pass")
+    elapsed = best_of("import nbllm")
+    assert elapsed - baseline < IMPORT_BUDGET
+
+
+def test_import_nbllm_loads_nothing_heavy():
+    _, output = run_python(
+        "import sys, nbllm\n"
+        "print(','.join(name for name in ['llm', 'typer', 'dotenv', *%r] if name in sys.modules))" % DEFERRED_MODULES
+    )
+    assert output.strip() == ""
+
+
+def test_tools_are_imported_on_first_use():
+    _, output = run_python(
+        "import sys\n"
+        "from nbllm.tools import FileSystem\n"
+        "print('requests' in sys.modules, 'markdownify' in sys.modules)"
+    )
+    assert output.split() == ["False", "False"]
+
+
+def test_time_to_banner():
+    elapsed, output = run_python(BANNER_SCRIPT.format(deferred=DEFERRED_MODULES))
+    assert "nbllm v" in output
+    assert output.strip().endswith("DEFERRED")
+    assert elapsed < BANNER_BUDGET
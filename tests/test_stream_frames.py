@@ -0,0 +1,86 @@
+"""Tests for the buffered, frame-coalesced streaming renderer."""
+
+import time
+from io import StringIO
+
+import pytest
+
+from nbllm import streaming, ui
+
+
+class CountingFile(StringIO):
+    """StringIO that counts how often the console writes to it."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+@pytest.fixture
+def output():
+    """Stream into a 20 column console."""
+    original_file, original_width = ui._console.file, ui._console.width
+    ui._console.file = CountingFile()
+    ui._console.width = 20
+    try:
+        yield ui._console.file
+    finally:
+        ui._console.file = original_file
+        ui._console.width = original_width
+
+
+def stream(chunks, indent=2):
+    ui.start_streaming(indent)
+    for chunk in chunks:
+        ui.stream_chunk(chunk, indent)
+    ui.end_streaming(indent)
+
+
+def test_wraps_words_with_padding(output):
+    stream(["The quick brown fox jumps over\nthe lazy dog"])
+    assert output.getvalue() == "  The quick brown \n  fox jumps over\n  the lazy dog"
+
+
+def test_output_does_not_depend_on_chunking(output):
+    text = "Streaming text wraps the same way however the model splits it.\n\nDone."
+    stream([text])
+    whole = output.getvalue()
+    output.seek(0)
+    output.truncate()
+    stream([text[i:i + 3] for i in range(0, len(text), 3)])
+    assert output.getvalue() == whole
+
+
+def test_markup_is_printed_literally(output):
+    stream(["use [red]x[/red] here"])
+    assert output.getvalue() == "  use [red]x[/red] \n  here"
+
+
+def test_writes_are_coalesced_per_frame(output):
+    chunks = ["word "] * 2000
+    stream(chunks)
+    assert output.getvalue().count("word") == 2000
+    assert output.writes < 100
+
+
+def test_pending_text_is_written_before_other_output(output):
+    ui.start_streaming(2)
+    ui.stream_chunk("first ")
+    ui.stream_chunk("second ")  # Within the same frame, so still pending
+    ui.tool_status("Running tool")
+    ui.end_streaming(2)
+    text = output.getvalue()
+    assert text.index("second") < text.index("Running tool")
+
+
+def test_pending_text_is_written_after_a_frame(output):
+    ui.start_streaming(2)
+    ui.stream_chunk("first ")
+    ui.stream_chunk("second ")
+    time.sleep(streaming.STREAM_FRAME_INTERVAL * 5)
+    assert "second" in output.getvalue()
+    ui.end_streaming(2)
@@ -0,0 +1,92 @@
+"""Tests for independent StreamRenderer instances."""
+
+import threading
+from io import StringIO
+
+import pytest
+from rich.console import Console
+
+from nbllm import StreamRenderer, ui
+
+TEXT = "Several renderers stream side by side without sharing any state.\nSecond line."
+
+
+def render(target, chunks, **kwargs):
+    renderer = StreamRenderer(target, **kwargs)
+    for chunk in chunks:
+        renderer.feed(chunk)
+    renderer.end()
+
+
+def expected(width=20, indent=2):
+    console = Console(file=StringIO(), width=width)
+    render(console, [TEXT], indent=indent)
+    return console.file.getvalue()
+
+
+def test_has_no_instance_dict():
+    renderer = StreamRenderer(StringIO())
+    with pytest.raises(AttributeError):
+        renderer.position = 1
+    assert not hasattr(renderer, "__dict__")
+
+
+def test_writes_to_a_plain_file():
+    output = StringIO()
+    render(output, ["hello ", "world"])
+    assert output.getvalue() == "hello world"
+
+
+def test_interleaved_renderers_keep_their_own_state():
+    first = Console(file=StringIO(), width=20)
+    second = Console(file=StringIO(), width=20)
+    a = StreamRenderer(first, indent=2)
+    b = StreamRenderer(second, indent=2)
+    for i in range(0, len(TEXT), 3):
+        a.feed(TEXT[i:i + 3])
+        b.feed(TEXT[i:i + 3])
+    a.end()
+    b.end()
+    assert first.file.getvalue() == second.file.getvalue() == expected()
+
+
+def test_renderers_stream_from_threads_at_once():
+    consoles = [Console(file=StringIO(), width=20) for _ in range(4)]
+    threads = [
+        threading.Thread(target=render, args=(console, [TEXT[i:i + 2] for i in range(0, len(TEXT), 2)]),
+                         kwargs={"indent": 2})
+        for console in consoles
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(console.file.getvalue() == expected() for console in consoles)
+
+
+def test_module_functions_match_a_renderer():
+    original_file, original_width = ui._console.file, ui._console.width
+    ui._console.file = StringIO()
+    ui._console.width = 20
+    try:
+        ui.start_streaming(2)
+        ui.stream_chunk(TEXT, 2)
+        ui.end_streaming(2)
+        assert ui._console.file.getvalue() == expected()
+    finally:
+        ui._console.file = original_file
+        ui._console.width = original_width
+
+
+def test_pending_text_of_every_renderer_precedes_other_output():
+    console = Console(file=StringIO(), width=40)
+    reply = StreamRenderer(console)
+    tool = StreamRenderer(console)
+    reply.feed("reply ")
+    tool.feed("tool ")
+    reply.feed("pending ")  # Within the same frame, so still buffered
+    console.print("status")
+    text = console.file.getvalue()
+    assert text.index("pending") < text.index("status")
+    reply.end()
+    tool.end()
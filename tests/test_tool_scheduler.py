@@ -0,0 +1,132 @@
+"""Tests for concurrent tool execution within one model turn."""
+
+import threading
+import time
+from io import StringIO
+from unittest.mock import patch
+
+import llm
+
+from nbllm import Chat, ui
+from nbllm.tool_scheduler import ToolScheduler, requires_confirmation
+
+
+class SlowTools(llm.Toolbox):
+    """Toolbox whose calls take a while and record the thread they ran on."""
+
+    def __init__(self):
+        self.threads = {}
+
+    def slow(self, name: str) -> str:
+        """Sleep briefly and return the name."""
+        time.sleep(0.2)
+        self.threads[name] = threading.current_thread()
+        return f"done {name}"
+
+    def screenshot(self, name: str) -> llm.ToolOutput:
+        """Return an image along with the text."""
+        return llm.ToolOutput(f"took {name}", attachments=[llm.Attachment(type="image/png", content=b"png")])
+
+    @requires_confirmation
+    def ask(self, name: str) -> str:
+        """Pretend to ask the user for confirmation."""
+        self.threads[name] = threading.current_thread()
+        return f"confirmed {name}"
+
+
+class ToolCallingModel(llm.Model):
+    """Model that requests the tool calls given in `calls`, then summarizes the results."""
+
+    model_id = "nbllm-tool-fake"
+    can_stream = True
+    supports_tools = True
+    attachment_types = {"image/png"}
+
+    def __init__(self, calls):
+        self.calls = calls
+        self.attachments = []
+
+    def execute(self, prompt, stream, response, conversation):
+        if prompt.tool_results:
+            self.attachments.extend(prompt.attachments)
+            yield ", ".join(result.output for result in prompt.tool_results)
+            return
+        for method, name in self.calls:
+            response.add_tool_call(llm.ToolCall(name=f"SlowTools_{method}", arguments={"name": name}))
+        yield "calling tools"
+
+
+def run_turn(calls, tools, max_tool_workers=4):
+    """Send one message through Chat._chain and return the streamed text."""
+    with patch('llm.get_model', return_value=ToolCallingModel(calls)):
+        chat = Chat(tools=[tools], show_banner=False, max_tool_workers=max_tool_workers)
+    output = StringIO()
+    original_file = ui._console.file
+    ui._console.file = output
+    try:
+        return "".join(chat._chain("go"))
+    finally:
+        ui._console.file = original_file
+
+
+def test_independent_calls_run_concurrently_in_order():
+    """Slow calls overlap but results keep the requested order."""
+    tools = SlowTools()
+    calls = [("slow", "a"), ("slow", "b"), ("slow", "c"), ("slow", "d")]
+
+    start = time.perf_counter()
+    text = run_turn(calls, tools)
+    elapsed = time.perf_counter() - start
+
+    assert text.endswith("done a, done b, done c, done d")
+    assert elapsed < 0.6  # Sequential execution would take at least 0.8s
+
+
+def test_sequential_when_single_worker():
+    """max_tool_workers=1 keeps the old one-after-another behaviour."""
+    tools = SlowTools()
+
+    text = run_turn([("slow", "a"), ("slow", "b")], tools, max_tool_workers=1)
+
+    assert text.endswith("done a, done b")
+    assert all(thread is threading.main_thread() for thread in tools.threads.values())
+
+
+def test_confirmation_calls_run_on_calling_thread():
+    """Calls that ask the user are not handed to the pool."""
+    tools = SlowTools()
+
+    text = run_turn([("slow", "a"), ("ask", "b"), ("slow", "c")], tools)
+
+    assert text.endswith("done a, confirmed b, done c")
+    assert tools.threads["b"] is threading.main_thread()
+    assert tools.threads["a"] is not threading.main_thread()
+
+
+def test_trusted_toolbox_runs_in_parallel():
+    """Confirmation tools of a trusted toolbox don't need to be serialized."""
+    tools = SlowTools()
+    tools.tool_name = "SlowTools"
+    scheduler = ToolScheduler()
+    tool = next(t for t in tools.tools() if t.name == "SlowTools_ask")
+
+    ui.trust_tool("SlowTools")
+    try:
+        calls = [llm.ToolCall(name="SlowTools_ask", arguments={"name": str(i)}) for i in range(3)]
+        scheduler.run_calls(calls, [tool], lambda call: tool.implementation(**call.arguments))
+    finally:
+        ui.untrust_tool("SlowTools")
+
+    assert any(thread is not threading.main_thread() for thread in tools.threads.values())
+
+
+def test_tool_attachments_are_sent_with_the_results():
+    """Attachments of tool results reach the next prompt, as with llm's chain."""
+    model = ToolCallingModel([("screenshot", "page")])
+    with patch('llm.get_model', return_value=model):
+        chat = Chat(tools=[SlowTools()], show_banner=False)
+
+    text = "".join(chat._chain("go"))
+
+    assert text.endswith("took page")
+    assert [attachment.content for attachment in model.attachments] == [b"png"]
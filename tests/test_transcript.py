@@ -0,0 +1,122 @@
+"""Tests for the append-only TranscriptWriter."""
+
+import gzip
+import json
+from unittest.mock import patch
+
+import llm
+import pytest
+
+from nbllm import Chat, TranscriptWriter
+
+
+class ReplyModel(llm.Model):
+    """Model replying with a fixed text, without a response_json."""
+
+    model_id = "nbllm-reply-fake"
+
+    def execute(self, prompt, stream, response, conversation):
+        yield f"reply to {prompt.prompt}"
+
+
+def read_jsonl(text):
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def test_writes_each_record_once(tmp_path):
+    path = tmp_path / "logs.jsonl"
+    with TranscriptWriter(path, flush_interval=60) as writer:
+        writer([{"id": "a", "role": "user"}])
+        writer([{"id": "a", "role": "user"}, {"id": "b", "role": "assistant"}])
+        writer([{"id": "b", "role": "assistant"}, {"id": "c", "role": "user"}])
+
+    assert [r["id"] for r in read_jsonl(path.read_text())] == ["a", "b", "c"]
+
+
+def test_records_are_buffered_until_flush(tmp_path):
+    path = tmp_path / "logs.jsonl"
+    writer = TranscriptWriter(path, flush_interval=60)
+    try:
+        writer([{"id": "a"}])
+        assert path.read_text() == ""
+        writer.flush()
+        assert read_jsonl(path.read_text()) == [{"id": "a"}]
+    finally:
+        writer.close()
+
+
+def test_timer_flushes_in_background(tmp_path):
+    path = tmp_path / "logs.jsonl"
+    writer = TranscriptWriter(path, flush_interval=0.01)
+    try:
+        writer([{"id": "a"}])
+        writer._closed.wait(0.2)
+        assert read_jsonl(path.read_text()) == [{"id": "a"}]
+    finally:
+        writer.close()
+
+
+def test_appends_to_existing_file(tmp_path):
+    path = tmp_path / "logs.jsonl"
+    path.write_text('{"id": "old"}\n')
+    with TranscriptWriter(path) as writer:
+        writer([{"id": "new"}])
+
+    assert [r["id"] for r in read_jsonl(path.read_text())] == ["old", "new"]
+
+
+def test_gzip_sessions_stay_readable(tmp_path):
+    path = tmp_path / "logs.jsonl.gz"
+    for record_id in ["a", "b"]:
+        with TranscriptWriter(path) as writer:
+            writer([{"id": record_id}])
+            writer.flush()
+
+    with gzip.open(path, "rt") as f:
+        assert [r["id"] for r in read_jsonl(f.read())] == ["a", "b"]
+
+
+def test_zstd_round_trip(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    path = tmp_path / "logs.jsonl.zst"
+    with TranscriptWriter(path) as writer:
+        writer([{"id": "a"}])
+        writer.flush()
+        writer([{"id": "b"}])
+
+    with open(path, "rb") as f:
+        text = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True).read().decode()
+    assert [r["id"] for r in read_jsonl(text)] == ["a", "b"]
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        TranscriptWriter(tmp_path / "logs.jsonl", compression="lz4")
+
+
+def test_chat_passes_only_new_responses():
+    batches = []
+    with patch('llm.get_model', return_value=ReplyModel()):
+        chat = Chat(show_banner=False, history_callback=batches.append)
+
+    for text in ["one", "two"]:
+        "".join(chat._chain(text))
+        batches.append(chat._response_history_records())
+
+    assert [len(batch) for batch in batches] == [1, 1]
+    assert batches[1][0]["content"][0]["text"] == "reply to two"
+
+
+@patch("builtins.print")
+def test_history_records_the_mode_message_sent(mock_print):
+    batches = []
+    with patch('llm.get_model', return_value=ReplyModel()):
+        chat = Chat(show_banner=False, history_callback=batches.append)
+    chat._pending_mode_message = "Switched to plan mode."
+
+    with patch("nbllm.ui.input", side_effect=["hello", KeyboardInterrupt]):
+        chat.run()
+
+    sent = "Switched to plan mode.\n\nhello"
+    assert batches[0][0]["content"][0]["text"] == sent
+    assert batches[1][0]["content"][0]["text"] == f"reply to {sent}"
@@ -0,0 +1,76 @@
+"""Tests for the tree and glob listings of the FileSystem tool."""
+
+import pytest
+
+from nbllm.tools import FileSystem
+from nbllm.tools.tree import glob_files, render_tree
+
+
+@pytest.fixture
+def project(tmp_path):
+    paths = [
+        "README.md",
+        "src/pkg/__init__.py",
+        "src/pkg/core.py",
+        "src/pkg/deep/er/module.py",
+        "tests/test_core.py",
+        "node_modules/a/index.js",
+        "node_modules/b/index.js",
+        "node_modules/b/package.json",
+        ".git/HEAD",
+    ]
+    for path in paths:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("")
+    (tmp_path / ".gitignore").write_text("node_modules/\n")
+    return tmp_path
+
+
+def test_tree_summarizes_deep_and_ignored_directories(project):
+    assert render_tree(project, depth=2) == "\n".join([
+        "./",
+        "  src/",
+        "    pkg/ (2 files, 1 dir)",
+        "  tests/",
+        "    test_core.py",
+        "  node_modules/ 3 files, skipped",
+        "  README.md",
+    ])
+    assert render_tree(project, "src/pkg", depth=1).splitlines() == [
+        "src/pkg/", "  deep/ (0 files, 1 dir)", "  __init__.py", "  core.py",
+    ]
+
+
+def test_large_directories_are_counted(tmp_path):
+    for i in range(40):
+        (tmp_path / f"file{i:02}.txt").write_text("")
+    lines = render_tree(tmp_path).splitlines()
+    assert lines[-1] == "  ... 15 more files"
+    assert len(lines) == 27
+    for i in range(30):
+        (tmp_path / f"dir{i:02}").mkdir()
+    assert "  ... 5 more dirs" in render_tree(tmp_path, depth=1).splitlines()
+
+
+def test_tree_gets_shallower_to_fit(project):
+    text = render_tree(project, depth=5, max_chars=120)
+    assert len(text.rsplit("\n", 1)[0]) <= 120
+    assert "pkg/ (2 files, 1 dir)" in text
+    assert text.endswith("(shown 2 levels deep to stay short; list a subdirectory to see more)")
+
+
+def test_glob(project):
+    assert glob_files(project, "*.py").splitlines() == [
+        "src/pkg/__init__.py", "src/pkg/core.py", "src/pkg/deep/er/module.py", "tests/test_core.py",
+    ]
+    assert glob_files(project, "pkg/*.py", path="src").splitlines() == ["src/pkg/__init__.py", "src/pkg/core.py"]
+    assert glob_files(project, "*.js") == "No files match '*.js'"
+    assert glob_files(project, "*.py", max_results=1).endswith("... 3 more files (narrow the pattern to see them)")
+
+
+def test_file_system_tree_and_glob(project):
+    tools = FileSystem(str(project))
+    assert tools.tree("src", depth=1).startswith("src/\n  pkg/ (2 files, 1 dir)")
+    assert tools.tree("README.md").startswith("Error:")
+    assert tools.glob("test_*.py") == "tests/test_core.py"
+    assert "README.md (0 bytes)" in tools.list_files()